@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """
+    超出视图 query_budget 的请求直接让测试失败
+    """
+    settings.QUERY_BUDGET_RAISE = True
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    """
+    测试之间数据库回滚不会触发信号, 每个测试使用空的响应缓存和认证缓存
+    """
+    from drones.cache import clear_response_cache
+    from restful01.authentication import clear_credential_cache, clear_token_cache
+    clear_response_cache()
+    clear_token_cache()
+    clear_credential_cache()
+
+
+@pytest.fixture(autouse=True)
+def throttle_store(settings, tmp_path):
+    """
+    每个测试使用独立的限流状态文件
+    """
+    from restful01.throttling import reset_bucket_store
+    settings.THROTTLE_STORE = {'PATH': str(tmp_path / 'throttle.sqlite3')}
+    reset_bucket_store()
+    yield
+    reset_bucket_store()
+
+
+@pytest.fixture(autouse=True)
+def token_generation_store(settings, tmp_path):
+    """
+    每个测试使用独立的 Token 代存储文件
+    """
+    from restful01.authentication import reset_generation_store
+    settings.TOKEN_AUTH_CACHE = dict(settings.TOKEN_AUTH_CACHE, GENERATION_PATH=str(tmp_path / 'generations.sqlite3'))
+    reset_generation_store()
+    yield
+    reset_generation_store()
+
+
+@pytest.fixture(autouse=True)
+def response_generation_store(settings, tmp_path):
+    """
+    每个测试使用独立的模型代存储文件
+    """
+    from drones.cache import reset_generation_store
+    settings.DRONES_RESPONSE_CACHE = dict(settings.DRONES_RESPONSE_CACHE,
+                                          GENERATION_PATH=str(tmp_path / 'response_generations.sqlite3'))
+    reset_generation_store()
+    yield
+    reset_generation_store()
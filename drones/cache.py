@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+列表/详情响应缓存
+
+缓存键由 API 版本、完整 URL(含查询参数)、用户身份以及视图依赖模型的"代"组成.
+模型保存/删除时(drones.signals)更换该模型的代, 依赖它的缓存条目随之失效,
+例如无人机改名会使无人机类别和比赛的缓存失效.
+
+写入时立即更换代, 所在事务提交后再换一次: 提交前其他连接读到的仍是旧数据, 在这期间以新代缓存的
+响应在提交后作废.
+代保存在 DRONES_RESPONSE_CACHE['GENERATION_PATH'] 指向的 SQLite 文件(restful01.generations),
+同一台机器上的所有进程共享, 一个 worker 的写入使所有 worker 的缓存条目失效;
+响应数据保存在进程内 LRU(DRONES_RESPONSE_CACHE 配置大小和 TTL).
+绕过信号的写入(QuerySet.update、raw SQL)要自己调用 bump_generation.
+每个请求在读取数据之前只读一次代, 缓存键与 ETag(drones.conditional)都由这次读到的代计算.
+代存储不可用时每次给出随机的代: 不命中缓存, ETag 也不会匹配.
+写请求后被固定在主库的请求(restful01.routers)不读也不写缓存; 代记下更换时间,
+依赖的模型在 REPLICA_ROUTING['PIN_SECONDS'] 内有写入时, 从副本读出的响应(可能滞后)不写入缓存.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from restful01.generations import SQLiteGenerationStore
+from restful01.lru import LRUCache
+from restful01.metrics import registry
+from restful01.routers import current_replica, get_routing_options, pinned_to_primary
+
+registry.describe('response_generation_store_errors_total', 'Requests that bypassed the response cache because '
+                                                            'the generation store failed')
+
+_response_cache = None
+_generation_store = None
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def get_generation_store():
+    global _generation_store
+    if _generation_store is None:
+        options = getattr(settings, 'DRONES_RESPONSE_CACHE', {})
+        path = options.get('GENERATION_PATH') or os.path.join(settings.BASE_DIR, 'response_generations.sqlite3')
+        _generation_store = SQLiteGenerationStore(path, timeout=options.get('GENERATION_TIMEOUT', 1.0),
+                                                  table='model_generation')
+    return _generation_store
+
+
+def reset_generation_store():
+    global _generation_store
+    _generation_store = None
+
+
+def get_generations(models):
+    """
+    ['<代>:<更换时间>', ...], 从未更换过的模型为空字符串
+    """
+    labels = [model_label(model) for model in models]
+    try:
+        rows = get_generation_store().get_many(labels)
+    except sqlite3.Error:
+        registry.inc('response_generation_store_errors_total')
+        return [uuid.uuid4().hex for label in labels]
+    return ['{0}:{1!r}'.format(*rows[label]) if label in rows else '' for label in labels]
+
+
+def bump_generation(model):
+    """
+    立即更换代, 在当前事务提交后再换一次(不在事务中时立即执行); 代存储出错时异常照常抛出
+    """
+    labels = [model_label(model)]
+    get_generation_store().bump(labels)
+    transaction.on_commit(lambda: get_generation_store().bump(labels))
+
+
+def generation_time(generation):
+    """
+    更换代的时间(time.time()); 从未更换过的代为 None
+    """
+    head, sep, written_at = generation.rpartition(':')
+    return float(written_at) if sep else None
+
+
+def written_since(generations, seconds):
+    """
+    代在最近 seconds 秒内是否更换过(模型有写入)
+    """
+    since = time.time() - seconds
+    for generation in generations:
+        written_at = generation_time(generation)
+        if written_at is not None and written_at > since:
+            return True
+    return False
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        options = getattr(settings, 'DRONES_RESPONSE_CACHE', {})
+        _response_cache = LRUCache(max_entries=options.get('MAX_ENTRIES', 1024), ttl=options.get('TTL', 60))
+    return _response_cache
+
+
+def clear_response_cache():
+    global _response_cache
+    _response_cache = None
+
+
+def response_cache_enabled():
+    return getattr(settings, 'DRONES_RESPONSE_CACHE', {}).get('ENABLED', True)
+
+
+def make_response_key(request, generations):
+    user = request.user
+    identity = str(user.pk) if user and user.is_authenticated else 'anon'
+    parts = [str(request.version), request.build_absolute_uri(), identity] + list(generations)
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def detach(data):
+    """
+    ReturnDict/ReturnList 引用了序列化器和模型实例, 缓存前转换为普通容器
+    """
+    if isinstance(data, (ReturnDict, OrderedDict, dict)):
+        return OrderedDict((key, detach(value)) for key, value in data.items())
+    if isinstance(data, (ReturnList, list)):
+        return [detach(value) for value in data]
+    return data
+
+
+class CachedResponseMixin(object):
+    """
+    缓存 GET 列表/详情响应
+
+    cache_dependencies 列出响应内容所依赖的模型
+    """
+    cache_dependencies = ()
+
+    def get_dependency_generations(self):
+        """
+        依赖模型的代, 每个请求在读取数据之前读一次; 缓存键与 ETag 都用这次的结果
+        """
+        if getattr(self, '_dependency_generations', None) is None:
+            self._dependency_generations = get_generations(self.cache_dependencies)
+        return self._dependency_generations
+
+    def get_response_key(self, request):
+        return make_response_key(request, self.get_dependency_generations())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not response_cache_enabled() or not self.cache_dependencies or pinned_to_primary():
+            return handler(request, *args, **kwargs)
+        response_cache = get_response_cache()
+        key = self.get_response_key(request)
+        data = response_cache.get(key)
+        if data is not None:
+            registry.inc('response_cache_hits_total', endpoint=self.name)
+            return Response(data)
+        registry.inc('response_cache_misses_total', endpoint=self.name)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and not self.replica_may_lag():
+            response_cache.set(key, detach(response.data))
+        return response
+
+    def replica_may_lag(self):
+        if current_replica() is None:
+            return False
+        return written_since(self.get_dependency_generations(), get_routing_options()['PIN_SECONDS'])
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
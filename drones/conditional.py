@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+条件 GET: ETag / If-None-Match 与 Last-Modified / If-Modified-Since
+
+校验值不查询数据库, 也不序列化响应体: 由视图本次请求读到的依赖模型的代(drones.cache)计算.
+ETag 取自响应缓存键加上协商出的媒体类型, 缓存命中时返回的响应体与 ETag 对应同一次读取的代;
+代在读取数据之前读出, 响应体只可能比 ETag 新, 不会更旧.
+模型的每次写入(drones.signals、计数器、排行榜)都更换代, Last-Modified 取依赖模型最近一次更换代的时间.
+与 CachedResponseMixin 一起使用, 没有 cache_dependencies 的视图不返回校验值.
+    http :8000/v1/vehicles/ 'If-None-Match:"<ETag>"'
+    HTTP/1.0 304 Not Modified
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from drones.cache import generation_time
+
+
+class ConditionalGetMixin(object):
+    """
+    为 GET/HEAD 计算 ETag 与 Last-Modified, 客户端缓存未过期时返回 304
+    """
+
+    def get_validators(self, request):
+        if not self.cache_dependencies:
+            return None, None
+        parts = [self.get_response_key(request), str(request.accepted_media_type)]
+        etag = quote_etag(hashlib.md5('\n'.join(parts).encode('utf-8')).hexdigest())
+        timestamps = [generation_time(generation) for generation in self.get_dependency_generations()]
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(timestamps)) if timestamps else None
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = None
+        if etag is not None:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
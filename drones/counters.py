@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+Pilot.races_count 与 Drone.has_it_competed 由服务端维护
+
+比赛新增/删除/换人时用 F() 原子增减, 不读取计数本身, 并发写入不会互相覆盖;
+批量新增按驾驶员分组, 每段一条带 CASE 的 UPDATE. 由 drones.signals 调用,
+漂移后用 python manage.py reconcile_counters 分段重新计数.
+
+这些 UPDATE 不发送 post_save, 因此手动设置 updated_at 并更换响应缓存的代.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.utils import timezone
+
+from drones.cache import bump_generation
+from drones.models import Competition, Drone, Pilot
+
+CHUNK_SIZE = 500
+
+
+def _chunks(items, chunk_size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def add_races(pilot_counts):
+    """
+    pilot_counts: {pilot pk: 增量}, 增量可为负
+    """
+    pilot_counts = {pk: delta for pk, delta in pilot_counts.items() if pk is not None and delta}
+    for chunk in _chunks(sorted(pilot_counts)):
+        delta = Case(*[When(pk=pk, then=Value(pilot_counts[pk])) for pk in chunk],
+                     default=Value(0), output_field=IntegerField())
+        Pilot.objects.filter(pk__in=chunk).update(races_count=F('races_count') + delta, updated_at=timezone.now())
+    if pilot_counts:
+        bump_generation(Pilot)
+
+
+def mark_competed(drone_pks):
+    changed = 0
+    for chunk in _chunks(sorted(set(pk for pk in drone_pks if pk is not None))):
+        changed += Drone.objects.filter(pk__in=chunk, has_it_competed=False).update(
+            has_it_competed=True, updated_at=timezone.now())
+    if changed:
+        bump_generation(Drone)
+
+
+def unmark_competed(drone_pks):
+    """
+    没有剩余比赛的无人机改回未参赛
+    """
+    changed = 0
+    for chunk in _chunks(sorted(set(pk for pk in drone_pks if pk is not None))):
+        competed = Competition.objects.filter(drone__in=chunk).values('drone')
+        changed += Drone.objects.filter(pk__in=chunk, has_it_competed=True).exclude(pk__in=competed).update(
+            has_it_competed=False, updated_at=timezone.now())
+    if changed:
+        bump_generation(Drone)
+
+
+def competitions_added(competitions):
+    add_races(Counter(competition.pilot_id for competition in competitions))
+    mark_competed(competition.drone_id for competition in competitions)
+
+
+def competition_removed(competition):
+    add_races({competition.pilot_id: -1})
+    unmark_competed([competition.drone_id])
+
+
+def competition_moved(competition, previous):
+    """
+    previous: 修改前的 {'pilot': pk, 'drone': pk}
+    """
+    if previous['pilot'] != competition.pilot_id:
+        add_races({previous['pilot']: -1, competition.pilot_id: 1})
+    if previous['drone'] != competition.drone_id:
+        mark_competed([competition.drone_id])
+        unmark_competed([previous['drone']])
+
+
+def reconcile(chunk_size=CHUNK_SIZE):
+    """
+    按 pk 分段重新计数, 只更新不一致的行, 返回 (修正的驾驶员数, 修正的无人机数)
+    """
+    pilots_fixed = drones_fixed = 0
+    last_pk = 0
+    while True:
+        chunk = list(Pilot.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'races_count')[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        counts = dict(Competition.objects.filter(pilot__in=[pk for pk, races_count in chunk])
+                      .order_by().values('pilot').annotate(n=Count('pk')).values_list('pilot', 'n'))
+        wrong = [pk for pk, races_count in chunk if counts.get(pk, 0) != races_count]
+        if wrong:
+            races_count = Case(*[When(pk=pk, then=Value(counts.get(pk, 0))) for pk in wrong],
+                               output_field=IntegerField())
+            pilots_fixed += Pilot.objects.filter(pk__in=wrong).update(races_count=races_count,
+                                                                     updated_at=timezone.now())
+    last_pk = 0
+    while True:
+        chunk = list(Drone.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1]
+        competed = set(Competition.objects.filter(drone__in=chunk).values_list('drone', flat=True).distinct())
+        drones_fixed += Drone.objects.filter(pk__in=competed, has_it_competed=False).update(
+            has_it_competed=True, updated_at=timezone.now())
+        drones_fixed += Drone.objects.filter(pk__in=set(chunk) - competed, has_it_competed=True).update(
+            has_it_competed=False, updated_at=timezone.now())
+    if pilots_fixed:
+        bump_generation(Pilot)
+    if drones_fixed:
+        bump_generation(Drone)
+    return pilots_fixed, drones_fixed
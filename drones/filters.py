@@ -1,17 +1,71 @@
+from django import forms
+from django.utils.translation import ugettext_lazy as _
 from django_filters.rest_framework import FilterSet
 from rest_framework import filters
-from django_filters import AllValuesFilter, DateTimeFilter, NumberFilter
+from django_filters import CharFilter, DateTimeFilter, NumberFilter
 
 from drones.models import Competition
 
 
+class IndexedValueField(forms.CharField):
+    """
+    用 EXISTS 在(唯一)索引上校验取值, 不加载全部可选值
+    """
+    default_error_messages = {
+        'invalid_choice': _('Select a valid choice. %(value)s is not one of the available choices.'),
+    }
+
+    def __init__(self, queryset=None, lookup=None, *args, **kwargs):
+        self.queryset = queryset
+        self.lookup = lookup
+        super().__init__(*args, **kwargs)
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values or self.queryset is None:
+            return value
+        if not self.queryset.filter(**{self.lookup: value}).exists():
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return value
+
+
+class IndexedValueFilter(CharFilter):
+    """
+    AllValuesFilter 的替代
+
+    AllValuesFilter 每次构造表单都要 SELECT DISTINCT 整列来生成选项; 这里渲染为文本框,
+    只在传入取值时按 name 路径指向的关联模型字段做一次索引查找, 取值不存在时与
+    AllValuesFilter 一样是表单错误.
+    """
+    field_class = IndexedValueField
+
+    def get_target(self):
+        """
+        (关联模型, 字段名), 例如 drone__name -> (Drone, 'name')
+        """
+        model = self.model
+        parts = self.field_name.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model, parts[-1]
+
+    @property
+    def field(self):
+        if not hasattr(self, '_field'):
+            model, lookup = self.get_target()
+            self.extra['queryset'] = model._default_manager.all()
+            self.extra['lookup'] = lookup
+        return super().field
+
+
 class CompetitionFilter(FilterSet):
     from_achievement_date = DateTimeFilter(name='distance_achievement_date', lookup_expr='gte')
     to_achievement_date = DateTimeFilter(name='distance_achievement_date', lookup_expr='lte')
     min_distance_in_feet = NumberFilter(name='distance_in_feet', lookup_expr='gte')
     max_distance_in_feet = NumberFilter(name='distance_in_feet', lookup_expr='lte')
-    drone_name = AllValuesFilter(name='drone__name')
-    pilot_name = AllValuesFilter(name='pilot__name')
+    drone_name = IndexedValueFilter(name='drone__name')
+    pilot_name = IndexedValueFilter(name='pilot__name')
 
     class Meta:
         model = Competition
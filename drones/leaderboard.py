@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+排行榜维护
+
+每个驾驶员/无人机一行: 最远距离、比赛次数、最近一次成绩日期.
+    - 新增比赛: 一条 UPDATE 用 Greatest()/F() 原地合并, 不读取 Competition
+    - 修改/删除比赛: 最远距离可能变小, 按外键索引只重新聚合受影响的驾驶员/无人机
+    - 批量新增(bulk_created): 受影响的驾驶员/无人机分段重新聚合
+由 drones.signals 调用; 全量重建: python manage.py rebuild_leaderboard
+
+UPDATE / bulk_create 不发送信号, 写完条目后手动更换条目模型的代: 比赛/驾驶员的代在条目更新之前
+已经更换, 期间读到的旧排名会以新代缓存, 条目的代再换一次才会作废.
+"""
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, IntegerField, Max, Value
+from django.db.models.functions import Greatest
+
+from drones.cache import bump_generation
+from drones.models import Competition, DroneLeaderboardEntry, PilotLeaderboardEntry
+
+# (排行榜模型, Competition 上对应的外键)
+LEADERBOARDS = ((PilotLeaderboardEntry, 'pilot'), (DroneLeaderboardEntry, 'drone'))
+
+CHUNK_SIZE = 500
+
+
+def aggregate_competitions(key, queryset=None):
+    """
+    按外键分组的 values() 行: key, best_distance_in_feet, competitions_count, last_achievement_date
+    """
+    queryset = Competition.objects.all() if queryset is None else queryset
+    return queryset.order_by().values(key).annotate(
+        best_distance_in_feet=Max('distance_in_feet'),
+        competitions_count=Count('pk'),
+        last_achievement_date=Max('distance_achievement_date'))
+
+
+def entry_values(row):
+    return {'best_distance_in_feet': row['best_distance_in_feet'],
+            'competitions_count': row['competitions_count'],
+            'last_achievement_date': row['last_achievement_date']}
+
+
+def refresh(entry_model, key, pks):
+    """
+    重新聚合给定驾驶员/无人机的条目(没有比赛的不再有条目), 每段查询次数固定
+    """
+    pks = sorted(set(pk for pk in pks if pk is not None))
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            rows = list(aggregate_competitions(key, Competition.objects.filter(**{key + '__in': chunk})))
+            entry_model.objects.filter(pk__in=chunk).delete()
+            entry_model.objects.bulk_create([entry_model(pk=row[key], **entry_values(row)) for row in rows])
+    if pks:
+        bump_generation(entry_model)
+
+
+def competition_added(competition):
+    for entry_model, key in LEADERBOARDS:
+        pk = getattr(competition, key + '_id')
+        updated = entry_model.objects.filter(pk=pk).update(
+            best_distance_in_feet=Greatest('best_distance_in_feet',
+                                           Value(competition.distance_in_feet, output_field=IntegerField())),
+            competitions_count=F('competitions_count') + 1,
+            last_achievement_date=Greatest('last_achievement_date',
+                                           Value(competition.distance_achievement_date,
+                                                 output_field=DateTimeField())))
+        if updated:
+            bump_generation(entry_model)
+        else:
+            # 尚无条目(新的驾驶员/无人机, 或重建前已有的数据), 按现有比赛建立
+            refresh(entry_model, key, [pk])
+
+
+def competitions_changed(competitions, previous=None):
+    """
+    previous: 修改前的 {'pilot': pk, 'drone': pk}, 比赛换了驾驶员/无人机时两边都要更新
+    """
+    for entry_model, key in LEADERBOARDS:
+        pks = [getattr(competition, key + '_id') for competition in competitions]
+        if previous:
+            pks.append(previous[key])
+        refresh(entry_model, key, pks)
+
+
+@transaction.atomic
+def rebuild():
+    """
+    清空后按 Competition 全量重建, 返回 {排行榜模型: 条目数}
+    """
+    counts = {}
+    for entry_model, key in LEADERBOARDS:
+        # 全局的 post_delete 接收器使 delete() 逐行加载并发信号, 清空整表直接 DELETE
+        entry_model.objects.all()._raw_delete(entry_model.objects.db)
+        entries = []
+        counts[entry_model] = 0
+        for row in aggregate_competitions(key).iterator():
+            entries.append(entry_model(pk=row[key], **entry_values(row)))
+            if len(entries) >= CHUNK_SIZE:
+                entry_model.objects.bulk_create(entries)
+                counts[entry_model] += len(entries)
+                entries = []
+        entry_model.objects.bulk_create(entries)
+        counts[entry_model] += len(entries)
+        bump_generation(entry_model)
+    return counts
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+并发客户端下比较 WSGI 与 ASGI 入口的吞吐量和延迟
+
+    python manage.py bench_asgi --clients 32 --requests 2000 --workers 8
+
+两种入口都在进程内直接调用(不经过网络和 HTTP 服务器):
+    - WSGI: workers 个同步 worker(线程), clients 个客户端轮流占用
+    - ASGI: 一个事件循环, restful01.asgi 的线程池同样为 workers 个线程
+延迟包含排队时间. 请求只读, 使用当前数据库中的数据.
+限流照常执行(读写 THROTTLE_STORE 的 SQLite 文件), 只把各 scope 的速率换成 --throttle-rate, 不拒绝请求.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from restful01 import asgi
+
+DEFAULT_PATHS = '/v1/,/v1/vehicles/,/v1/vehicle-categories/,/v1/competitions/'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark requests/sec and latency of the WSGI and ASGI entry points under concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=asgi.get_asgi_options()['MAX_WORKERS'])
+        parser.add_argument('--paths', default=DEFAULT_PATHS)
+        parser.add_argument('--throttle-rate', default='1000000/second',
+                            help='rate of every throttle scope, high enough not to reject requests')
+        parser.add_argument('--json', dest='json_output', action='store_true', help='print the results as JSON')
+
+    def handle(self, *args, **options):
+        paths = [path for path in options['paths'].split(',') if path]
+        plan = [paths[i % len(paths)] for i in range(options['requests'])]
+        # THROTTLE_RATES 在导入时从设置中读出, 直接替换类属性
+        rates = {scope: options['throttle_rate'] for scope in SimpleRateThrottle.THROTTLE_RATES}
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', rates):
+            results = {
+                'wsgi': self.run_wsgi(plan, options['clients'], options['workers']),
+                'asgi': self.run_asgi(plan, options['clients'], options['workers']),
+            }
+        if options['json_output']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('{0:<6} {1:>10} {2:>10} {3:>10} {4:>8}'.format('entry', 'req/s', 'p50 ms', 'p99 ms',
+                                                                         'errors'))
+        for name, result in results.items():
+            self.stdout.write('{0:<6} {1:>10.0f} {2:>10.2f} {3:>10.2f} {4:>8}'.format(
+                name, result['requests_per_second'], result['p50_ms'], result['p99_ms'], result['errors']))
+
+    @staticmethod
+    def summarize(latencies, errors, elapsed):
+        return {'requests': len(latencies), 'errors': errors,
+                'requests_per_second': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000}
+
+    @staticmethod
+    def environ(path):
+        return asgi.build_environ(Command.scope(path), b'')
+
+    @staticmethod
+    def scope(path):
+        return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'http_version': '1.1',
+                'scheme': 'http', 'server': ('localhost', 8000), 'client': ('127.0.0.1', 5000),
+                'headers': [(b'host', b'localhost:8000'), (b'accept', b'application/json')]}
+
+    def run_wsgi(self, plan, clients, workers):
+        application = get_wsgi_application()
+        pool = ThreadPoolExecutor(workers)
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        pending = list(reversed(plan))
+
+        def call(path):
+            status = {}
+            body = b''.join(application(self.environ(path), lambda s, h, e=None: status.update(code=s)))
+            return status['code'], body
+
+        def client():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    path = pending.pop()
+                started = time.perf_counter()
+                code, body = pool.submit(call, path).result()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    if not code.startswith('200'):
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+        return self.summarize(latencies, errors[0], elapsed)
+
+    def run_asgi(self, plan, clients, workers):
+        application = asgi.TimingMiddleware(asgi.ConcurrencyLimitMiddleware(
+            asgi.DjangoASGIHandler(max_workers=workers), max_pending=clients))
+        latencies, errors = [], [0]
+        pending = list(reversed(plan))
+
+        async def call(path):
+            status = {}
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+
+            await application(self.scope(path), receive, send)
+            return status['code']
+
+        async def client():
+            while pending:
+                path = pending.pop()
+                started = time.perf_counter()
+                code = await call(path)
+                latencies.append(time.perf_counter() - started)
+                if code != 200:
+                    errors[0] += 1
+
+        loop = asyncio.new_event_loop()
+        try:
+            started = time.perf_counter()
+            loop.run_until_complete(asyncio.gather(*[client() for i in range(clients)], loop=loop))
+            elapsed = time.perf_counter() - started
+        finally:
+            loop.close()
+        return self.summarize(latencies, errors[0], elapsed)
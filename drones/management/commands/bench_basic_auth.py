@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+比较 BasicAuthentication 与 CachedBasicAuthentication 下认证写请求(POST 无人机)的 CPU 与耗时
+
+    python manage.py bench_basic_auth --requests 200
+
+请求经 URLconf 发给 DroneList(关闭限流), 数据在事务中生成, 结束后回滚.
+"""
+import base64
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.test import APIClient
+
+from drones.models import DroneCategory
+from drones.views import DroneList
+from restful01.authentication import CachedBasicAuthentication, clear_credential_cache
+
+USERNAME = 'bench-basic-auth'
+PASSWORD = 'bench-basic-auth-password'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark authenticated drone writes with and without the verified-credential cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with transaction.atomic():
+            User.objects.create_user(USERNAME, password=PASSWORD)
+            category = DroneCategory.objects.create(name='bench-basic-auth-category')
+            clear_credential_cache()
+            results = []
+            for authentication_class in (BasicAuthentication, CachedBasicAuthentication):
+                with mock.patch.object(DroneList, 'authentication_classes', (authentication_class,)), \
+                        mock.patch.object(DroneList, 'throttle_classes', ()):
+                    results.append((authentication_class.__name__,
+                                    self.run(authentication_class.__name__, category, count)))
+            transaction.set_rollback(True)
+
+        self.stdout.write('{0:<28} {1:>12} {2:>12} {3:>10}'.format('authentication', 'cpu ms/req', 'wall ms/req',
+                                                                     'req/s'))
+        for name, (cpu, wall) in results:
+            self.stdout.write('{0:<28} {1:>12.2f} {2:>12.2f} {3:>10.0f}'.format(
+                name, cpu / count * 1000, wall / count * 1000, count / wall))
+        (base_cpu, base_wall), (cached_cpu, cached_wall) = [result for name, result in results]
+        self.stdout.write('CPU saved per request: {0:.2f} ms'.format((base_cpu - cached_cpu) / count * 1000))
+
+    @staticmethod
+    def run(prefix, category, count):
+        client = APIClient(SERVER_NAME='localhost')
+        credentials = base64.b64encode('{0}:{1}'.format(USERNAME, PASSWORD).encode('utf-8')).decode('ascii')
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        for i in range(count):
+            response = client.post(reverse('v1:' + DroneList.name),
+                                   {'name': '{0} {1}'.format(prefix, i), 'drone_category': category.name,
+                                    'manufacturing_date': '2017-07-20T02:02:00.716312Z'},
+                                   format='json', HTTP_AUTHORIZATION='Basic ' + credentials)
+            if response.status_code != 201:
+                raise RuntimeError(response.data)
+        return time.process_time() - cpu_started, time.perf_counter() - wall_started
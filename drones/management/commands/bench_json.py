@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+比较 DRF 默认的 JSON 管线与 restful01.renderers / restful01.parsers(JSON 后端与 MessagePack / CBOR)
+
+    python manage.py bench_json --rows 10000 --repeat 3
+
+对 ToySerializer 和 PilotSerializer(每个驾驶员 10 场比赛)的列表分别计时:
+    serialize  serializer.data(DRF 管线中 datetime 字段逐个 isoformat(), 其余管线原样交给渲染器)
+    render     编码为字节
+    parse      解析 render 的结果
+    bytes      响应体大小(未压缩)
+drf 为 DRF 的 JSONRenderer/JSONParser 加 ISO 8601 的 DATETIME_FORMAT, 其余每行一个已安装的 JSON 后端
+或已注册的二进制格式(settings.BINARY_FORMATS).
+数据在事务中生成, 结束后回滚.
+"""
+import io
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import ISO_8601
+
+from drones.management.commands.bench_serializers import Command as SerializerBenchmark
+from drones.models import Competition, Drone, DroneCategory, Pilot
+from drones.serializers import PilotSerializer
+from restful01 import parsers, renderers
+from restful01.parsers import FastJSONParser
+from restful01.renderers import FastJSONRenderer, get_available_json_backends
+from toys.models import Toy
+from toys.serializers import ToySerializer
+
+COMPETITIONS_PER_PILOT = 10
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DRF JSON rendering and parsing against the fast JSON backends and the binary formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='toys, and competitions across the pilots')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['rows'])
+            context = {'request': SerializerBenchmark.make_request()}
+            cases = (
+                ('ToySerializer', ToySerializer, Toy.objects.all()),
+                ('PilotSerializer', PilotSerializer, PilotSerializer.setup_eager_loading(
+                    Pilot.objects.filter(name__startswith='bench-json-'))),
+            )
+            self.stdout.write('{0:<18}{1:<10}{2:>14}{3:>12}{4:>12}{5:>12}{6:>10}'.format(
+                'payload', 'pipeline', 'serialize (s)', 'render (s)', 'parse (s)', 'bytes', 'speedup'))
+            for label, serializer_class, queryset in cases:
+                baseline = None
+                for pipeline, renderer, parser, datetime_format in self.get_pipelines():
+                    rest_framework = dict(settings.REST_FRAMEWORK, DATETIME_FORMAT=datetime_format)
+                    with override_settings(REST_FRAMEWORK=rest_framework):
+                        timings, size = self.measure(serializer_class, queryset, context, renderer, parser,
+                                                     options['repeat'])
+                    total = sum(timings)
+                    baseline = baseline or total
+                    self.stdout.write('{0:<18}{1:<10}{2:>14.3f}{3:>12.3f}{4:>12.3f}{5:>12}{6:>9.1f}x'.format(
+                        label, pipeline, timings[0], timings[1], timings[2], size, baseline / total))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def get_pipelines():
+        pipelines = [('drf', JSONRenderer(), JSONParser(), ISO_8601)]
+        for backend in get_available_json_backends():
+            renderer, parser = FastJSONRenderer(), FastJSONParser()
+            renderer.backend = parser.backend = backend
+            pipelines.append((backend, renderer, parser, None))
+        for name in settings.BINARY_FORMATS:
+            renderer = getattr(renderers, '{0}Renderer'.format(name))()
+            parser = getattr(parsers, '{0}Parser'.format(name))()
+            pipelines.append((renderer.format, renderer, parser, None))
+        return pipelines
+
+    @staticmethod
+    def measure(serializer_class, queryset, context, renderer, parser, repeat):
+        holder = {}
+
+        def serialize():
+            holder['data'] = serializer_class(queryset.all(), many=True, context=context).data
+
+        def render():
+            holder['content'] = renderer.render(holder['data'])
+
+        def parse():
+            parser.parse(io.BytesIO(holder['content']), parser_context={'encoding': 'utf-8'})
+
+        timings = [SerializerBenchmark.measure(func, repeat) for func in (serialize, render, parse)]
+        return timings, len(holder['content'])
+
+    @staticmethod
+    def seed(rows):
+        now = timezone.now()
+        category = DroneCategory.objects.create(name='bench-json-category')
+        owner = User.objects.create(username='bench-json-owner')
+        drone = Drone.objects.create(name='bench-json-drone', drone_category=category, owner=owner,
+                                     manufacturing_date=now)
+        pilots = rows // COMPETITIONS_PER_PILOT
+        Pilot.objects.bulk_create(
+            Pilot(name='bench-json-pilot-{0}'.format(i), races_count=COMPETITIONS_PER_PILOT) for i in range(pilots))
+        pilot_ids = list(Pilot.objects.filter(name__startswith='bench-json-').values_list('pk', flat=True))
+        Competition.objects.bulk_create(
+            Competition(pilot_id=pilot_id, drone=drone, distance_in_feet=i, distance_achievement_date=now)
+            for pilot_id in pilot_ids for i in range(COMPETITIONS_PER_PILOT))
+        Toy.objects.bulk_create(
+            Toy(name='bench-json-toy-{0}'.format(i), description='玩具 {0}'.format(i), toy_category='bench',
+                release_date=now) for i in range(rows))
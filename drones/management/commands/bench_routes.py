@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+drones/urls.py 与 toys/urls.py 中每个路由的吞吐量和 p50/p95/p99 延迟
+
+    python manage.py bench_routes --requests 200 --output bench.json
+    python manage.py bench_routes --mode server --concurrency 8
+    python manage.py bench_routes --baseline bench-baseline.json --tolerance 0.2   # 回归时非零退出
+
+    # 先用 manage.py seed 生成生产规模的数据(写入当前数据库, 请使用单独的数据库文件):
+    python manage.py bench_routes --seed --categories 10000 --drones 1000000 --competitions 5000000
+    python manage.py seed ... && python manage.py bench_routes   # 需要其他分布参数时
+
+两种模式:
+    inprocess  APIClient 直接调用, 不经过网络
+    server     进程内启动本地 HTTP 服务器(多线程), concurrency 个客户端线程并发请求
+每个路由只发 GET; 详情路由轮流使用库中已有的主键. 测的是当前数据库中的数据, 限流关闭,
+drones 响应缓存默认关闭(--response-cache 打开). 请求使用临时创建的用户, 两种模式都发送同样的
+Authorization 头(Basic 或 Token 认证, 按视图), 认证开销计入延迟.
+
+结果(--output)是 JSON, --baseline 与之前的结果比较: p95 变慢或吞吐量下降超过 tolerance, 或错误数
+比基线多, 视为回归; 基线中没有或结果中没有的路由单独列出.
+"""
+import base64
+import http.client
+import json
+import platform
+import re
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.urls import RegexURLResolver, get_resolver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from drones.management.commands.bench_asgi import percentile
+from drones.models import Competition, Drone, DroneCategory, Pilot
+from restful01.throttling import TokenBucketRateThrottle
+from toys import views as toys_views
+from toys.models import Toy
+
+BENCHMARKED_URLCONFS = ('drones.urls', 'toys.urls')
+# 函数视图没有 queryset, 详情路由的主键从这些模型取
+FUNCTION_VIEW_MODELS = {toys_views.toy_detail: Toy}
+URL_ARGUMENT = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+USERNAME = 'bench-routes'
+PASSWORD = 'bench-routes-password'
+
+
+class Route(object):
+    def __init__(self, template, model=None, token_auth=False):
+        self.template = template
+        self.model = model
+        self.token_auth = token_auth
+        self.pks = []
+
+    def paths(self, count):
+        if not self.pks:
+            return ['/' + self.template] * count
+        return ['/' + self.template.format(pk=self.pks[i % len(self.pks)]) for i in range(count)]
+
+
+def get_routes():
+    """
+    按 URLconf 中的顺序列出两个应用的所有路由, 模板如 v1/vehicles/{pk}
+    """
+    routes = []
+    for included in get_resolver().url_patterns:
+        if not isinstance(included, RegexURLResolver):
+            continue
+        if getattr(included.urlconf_name, '__name__', included.urlconf_name) not in BENCHMARKED_URLCONFS:
+            continue
+        for pattern in included.url_patterns:
+            template = URL_ARGUMENT.sub(r'{\1}', (included.regex.pattern + pattern.regex.pattern).replace('^', ''))
+            template = template.replace('$', '')
+            view_class = getattr(pattern.callback, 'view_class', None)
+            model = None
+            if '{pk}' in template:
+                queryset = getattr(view_class, 'queryset', None)
+                model = queryset.model if queryset is not None else FUNCTION_VIEW_MODELS[pattern.callback]
+            token_auth = any(issubclass(authentication_class, TokenAuthentication)
+                             for authentication_class in getattr(view_class, 'authentication_classes', ()))
+            routes.append(Route(template, model, token_auth))
+    return routes
+
+
+def summarize(latencies, errors, elapsed, size):
+    return {'requests': len(latencies), 'errors': errors,
+            'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'bytes_per_response': size // max(len(latencies), 1)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    返回回归列表: p95 变慢或吞吐量下降超过 tolerance(比例), 或错误数比基线多
+    """
+    regressions = []
+    for route, modes in results['routes'].items():
+        for mode, current in modes.items():
+            previous = baseline.get('routes', {}).get(route, {}).get(mode)
+            if previous is None:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append('{0} [{1}] p95 {2:.2f} ms > baseline {3:.2f} ms'.format(
+                    route, mode, current['p95_ms'], previous['p95_ms']))
+            if current['requests_per_second'] < previous['requests_per_second'] * (1 - tolerance):
+                regressions.append('{0} [{1}] {2:.0f} req/s < baseline {3:.0f} req/s'.format(
+                    route, mode, current['requests_per_second'], previous['requests_per_second']))
+            if current['errors'] > previous.get('errors', 0):
+                regressions.append('{0} [{1}] {2} errors > baseline {3}'.format(
+                    route, mode, current['errors'], previous.get('errors', 0)))
+    return regressions
+
+
+def compare_routes(results, baseline):
+    """
+    返回 (基线中没有的, 结果中没有的) 路由与模式, 如 'v1/pilots/ [server]'
+    """
+    def measured(data):
+        return {'{0} [{1}]'.format(route, mode) for route, modes in data.get('routes', {}).items() for mode in modes}
+
+    current, previous = measured(results), measured(baseline)
+    return sorted(current - previous), sorted(previous - current)
+
+
+class ThreadedWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark throughput and latency percentiles of every drones and toys route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=('inprocess', 'server', 'both'), default='both')
+        parser.add_argument('--requests', type=int, default=200, help='requests per route and mode')
+        parser.add_argument('--concurrency', type=int, default=8, help='client threads in server mode')
+        parser.add_argument('--routes', default='', help='only routes whose template contains one of '
+                                                         'these comma separated strings')
+        parser.add_argument('--response-cache', action='store_true', help='keep the drones response cache on')
+        parser.add_argument('--output', help='write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+        parser.add_argument('--seed', action='store_true', help='run manage.py seed with the counts below first')
+        parser.add_argument('--categories', type=int, default=100)
+        parser.add_argument('--drones', type=int, default=10000)
+        parser.add_argument('--pilots', type=int, default=1000)
+        parser.add_argument('--competitions', type=int, default=50000)
+        parser.add_argument('--toys', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options)
+        routes = self.select_routes(options['routes'])
+        modes = ['inprocess', 'server'] if options['mode'] == 'both' else [options['mode']]
+        user = User.objects.create_user('{0}-{1}'.format(USERNAME, int(time.time() * 1000)), password=PASSWORD)
+        Token.objects.create(user=user)
+        cache_options = {'ENABLED': options['response_cache']}
+        try:
+            with mock.patch.object(TokenBucketRateThrottle, 'allow_request', lambda *args: True), \
+                    override_settings(DRONES_RESPONSE_CACHE=cache_options):
+                results = {'meta': self.describe_environment(options), 'routes': {}}
+                self.stdout.write('{0:<34} {1:<10} {2:>9} {3:>9} {4:>9} {5:>9} {6:>7}'.format(
+                    'route', 'mode', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+                for route in routes:
+                    for mode in modes:
+                        run = self.run_inprocess if mode == 'inprocess' else self.run_server
+                        result = run(route, user, options)
+                        results['routes'].setdefault(route.template, {})[mode] = result
+                        self.report(route.template, mode, result)
+        finally:
+            user.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            added, removed = compare_routes(results, baseline)
+            for route in added:
+                self.stdout.write('Not in the baseline: {0}'.format(route))
+            for route in removed:
+                self.stdout.write('Not measured this time: {0}'.format(route))
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('{0} regression(s):\n{1}'.format(len(regressions), '\n'.join(regressions)))
+            self.stdout.write('No regressions against {0}'.format(options['baseline']))
+
+    def select_routes(self, only):
+        routes = get_routes()
+        if only:
+            routes = [route for route in routes if any(part in route.template for part in only.split(','))]
+        for route in routes:
+            if route.model is not None:
+                route.pks = list(route.model.objects.order_by('?').values_list('pk', flat=True)[:100])
+        return routes
+
+    def report(self, template, mode, result):
+        self.stdout.write('{0:<34} {1:<10} {2:>9.0f} {3:>9.2f} {4:>9.2f} {5:>9.2f} {6:>7}'.format(
+            template, mode, result['requests_per_second'], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+            result['errors']))
+
+    @staticmethod
+    def describe_environment(options):
+        return {'python': platform.python_version(), 'django': django.get_version(),
+                'requests': options['requests'], 'concurrency': options['concurrency'],
+                'response_cache': options['response_cache'],
+                'rows': {model.__name__: model.objects.count()
+                         for model in (DroneCategory, Drone, Pilot, Competition, Toy)}}
+
+    @staticmethod
+    def get_credentials(route, user):
+        if route.token_auth:
+            return 'Token ' + user.auth_token.key
+        return 'Basic ' + base64.b64encode('{0}:{1}'.format(user.username, PASSWORD).encode('utf-8')).decode('ascii')
+
+    @classmethod
+    def run_inprocess(cls, route, user, options):
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION=cls.get_credentials(route, user))
+        latencies, errors, size = [], 0, 0
+        started = time.perf_counter()
+        for path in route.paths(options['requests']):
+            request_started = time.perf_counter()
+            response = client.get(path)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            latencies.append(time.perf_counter() - request_started)
+            size += len(content)
+            if response.status_code != 200:
+                errors += 1
+        return summarize(latencies, errors, time.perf_counter() - started, size)
+
+    @classmethod
+    def run_server(cls, route, user, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler)
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        host, port = server.server_address
+        credentials = cls.get_credentials(route, user)
+        local = threading.local()
+        lock = threading.Lock()
+        latencies, errors, size = [], [0], [0]
+
+        def call(path):
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = http.client.HTTPConnection(host, port)
+            request_started = time.perf_counter()
+            connection.request('GET', path, headers={'Authorization': credentials})
+            response = connection.getresponse()
+            body = response.read()
+            elapsed = time.perf_counter() - request_started
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                connection.close()
+                local.connection = None
+            with lock:
+                latencies.append(elapsed)
+                size[0] += len(body)
+                if response.status != 200:
+                    errors[0] += 1
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                list(pool.map(call, route.paths(options['requests'])))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+        return summarize(latencies, errors[0], elapsed, size[0])
+
+    def seed(self, options):
+        call_command('seed', prefix='bench-{0}'.format(int(time.time())), categories=options['categories'],
+                     drones=options['drones'], pilots=options['pilots'], competitions=options['competitions'],
+                     toys=options['toys'], stdout=self.stdout)
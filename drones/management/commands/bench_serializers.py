@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+比较 DRF 序列化器与 values() 快速序列化器的耗时
+
+    python manage.py bench_serializers --rows 10000 --repeat 3
+
+数据在事务中生成, 结束后回滚.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.versioning import NamespaceVersioning
+
+from drones.models import Competition, Drone, DroneCategory, Pilot
+from drones.serializers import (DroneSerializer, DroneValuesSerializer, PilotCompetitionSerializer,
+                                PilotCompetitionValuesSerializer)
+from toys.models import Toy
+from toys.serializers import ToySerializer, ToyValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the DRF serializers against the values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            self.seed(rows)
+            context = {'request': self.make_request()}
+            cases = (
+                ('DroneSerializer', DroneSerializer, DroneValuesSerializer,
+                 DroneSerializer.setup_eager_loading(Drone.objects.all())),
+                ('PilotCompetitionSerializer', PilotCompetitionSerializer, PilotCompetitionValuesSerializer,
+                 PilotCompetitionSerializer.setup_eager_loading(Competition.objects.all())),
+                ('ToySerializer', ToySerializer, ToyValuesSerializer, Toy.objects.all()),
+            )
+            self.stdout.write('{0:<30}{1:>12}{2:>12}{3:>10}'.format('serializer', 'drf (s)', 'fast (s)', 'speedup'))
+            for label, serializer_class, fast_class, queryset in cases:
+                drf = self.measure(lambda: serializer_class(queryset.all(), many=True, context=context).data,
+                                   options['repeat'])
+                fast = self.measure(lambda: fast_class(queryset.all(), many=True, context=context).data,
+                                    options['repeat'])
+                self.stdout.write('{0:<30}{1:>12.3f}{2:>12.3f}{3:>9.1f}x'.format(label, drf, fast, drf / fast))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    @staticmethod
+    def make_request():
+        request = Request(APIRequestFactory().get('/v1/vehicles/'))
+        request.version = 'v1'
+        request.versioning_scheme = NamespaceVersioning()
+        return request
+
+    @staticmethod
+    def seed(rows):
+        now = timezone.now()
+        owner = User.objects.create(username='bench-serializers-owner')
+        category = DroneCategory.objects.create(name='bench-serializers-category')
+        pilot = Pilot.objects.create(name='bench-serializers-pilot', races_count=0)
+        Drone.objects.bulk_create(
+            Drone(name='bench-serializers-drone-{0}'.format(i), drone_category=category, owner=owner,
+                  manufacturing_date=now) for i in range(rows))
+        drone_ids = list(Drone.objects.filter(owner=owner).values_list('pk', flat=True))
+        Competition.objects.bulk_create(
+            Competition(pilot=pilot, drone_id=drone_ids[i % len(drone_ids)], distance_in_feet=i,
+                        distance_achievement_date=now) for i in range(rows))
+        Toy.objects.bulk_create(
+            Toy(name='bench-serializers-toy-{0}'.format(i), toy_category='bench', release_date=now)
+            for i in range(rows))
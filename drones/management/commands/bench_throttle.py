@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+比较 DRF 自带的 AnonRateThrottle(默认缓存中的时间戳列表) 与令牌桶限流的单次检查耗时
+
+    python manage.py bench_throttle --checks 20000 --clients 50
+
+rate 设得足够大使所有请求都放行, 自带限流的时间戳列表随请求数增长; 令牌桶状态写入临时文件.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from restful01 import throttling
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the token bucket throttle against the stock DRF throttle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=50)
+
+    def handle(self, *args, **options):
+        checks, clients = options['checks'], options['clients']
+        rate = '{0}/day'.format(checks * 10)
+        factory = APIRequestFactory()
+        requests = [Request(factory.get('/', REMOTE_ADDR='10.0.{0}.{1}'.format(i // 250, i % 250)))
+                    for i in range(clients)]
+
+        stock = type('StockThrottle', (AnonRateThrottle,), {'rate': rate})
+        bucket = type('BucketThrottle', (throttling.TokenBucketAnonRateThrottle,), {'rate': rate})
+
+        directory = tempfile.mkdtemp()
+        original_store = throttling._store
+        throttling._store = throttling.SQLiteBucketStore(os.path.join(directory, 'throttle.sqlite3'))
+        try:
+            results = [('AnonRateThrottle (cache)', self.run(stock, requests, checks)),
+                       ('TokenBucketAnonRateThrottle (sqlite)', self.run(bucket, requests, checks))]
+        finally:
+            throttling._store = original_store
+            shutil.rmtree(directory, ignore_errors=True)
+            for request in requests:
+                cache.delete(stock().get_cache_key(request, None))
+
+        self.stdout.write('{0:<40} {1:>10} {2:>10} {3:>10} {4:>10}'.format(
+            'throttle', 'checks/s', 'us/check', 'us first', 'us last'))
+        for name, (elapsed, first, last) in results:
+            self.stdout.write('{0:<40} {1:>10.0f} {2:>10.1f} {3:>10.1f} {4:>10.1f}'.format(
+                name, checks / elapsed, elapsed / checks * 1e6, first * 1e6, last * 1e6))
+
+    @staticmethod
+    def run(throttle_class, requests, checks):
+        """
+        返回 (总耗时, 第一轮平均每次耗时, 最后一轮平均每次耗时)
+        """
+        rounds = []
+        started = time.perf_counter()
+        for start in range(0, checks, len(requests)):
+            round_started = time.perf_counter()
+            batch = requests[:min(len(requests), checks - start)]
+            for request in batch:
+                if not throttle_class().allow_request(request, None):
+                    raise RuntimeError('throttled during benchmark')
+            rounds.append((time.perf_counter() - round_started) / len(batch))
+        return time.perf_counter() - started, rounds[0], rounds[-1]
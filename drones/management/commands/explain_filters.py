@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+对 drones 列表视图声明的每个过滤/排序组合执行 EXPLAIN, 发现全表扫描时失败
+
+    python manage.py explain_filters
+    python manage.py explain_filters --verbosity 2   # 输出每条查询计划
+
+新增 filter_fields / filter_class / ordering_fields 而没有对应索引时命令返回非零状态.
+"""
+import re
+
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models, router
+from django.utils import timezone
+
+from drones import urls
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN every declared filter/ordering combination of the drones list views'
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        full_scans = []
+        for view_class in self.get_list_views():
+            model = view_class.queryset.model
+            queryset = view_class.queryset.all()
+            filters = self.get_filters(view_class)
+            orderings = [None]
+            for field in getattr(view_class, 'ordering_fields', None) or ():
+                if not self.is_model_path(model, field):
+                    self.stderr.write('{0}: ordering field {1!r} is not a field of {2}, skipped'.format(
+                        view_class.name, field, model.__name__))
+                    continue
+                orderings.extend([field, '-' + field])
+            for description, lookup in [(None, None)] + filters:
+                for ordering in orderings:
+                    if description is None and ordering is None:
+                        continue
+                    filtered = queryset
+                    label = []
+                    if lookup is not None:
+                        filtered = filtered.filter(**{lookup: self.sample_value(model, lookup)})
+                        label.append(description)
+                    if ordering is not None:
+                        filtered = filtered.order_by(ordering)
+                        label.append('ordering=' + ordering)
+                    scans = self.explain(view_class.name, ' '.join(label), filtered[:20])
+                    full_scans.extend(scans)
+        if full_scans:
+            raise CommandError('{0} full table scan(s):\n{1}'.format(len(full_scans), '\n'.join(full_scans)))
+        self.stdout.write('No full table scans.')
+
+    @staticmethod
+    def get_list_views():
+        views = []
+        for pattern in urls.urlpatterns:
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is None or getattr(view_class, 'queryset', None) is None:
+                continue
+            if any(getattr(view_class, attr, None) for attr in ('filter_fields', 'filter_class', 'ordering_fields')):
+                if view_class not in views:
+                    views.append(view_class)
+        return views
+
+    @staticmethod
+    def get_filters(view_class):
+        """
+        [(描述, ORM 查询路径)]
+        """
+        filters = [('{0}='.format(field), field) for field in getattr(view_class, 'filter_fields', None) or ()]
+        filter_class = getattr(view_class, 'filter_class', None)
+        if filter_class is not None:
+            for param, declared in filter_class.base_filters.items():
+                lookup = declared.field_name
+                if declared.lookup_expr and declared.lookup_expr != 'exact':
+                    lookup = '{0}__{1}'.format(lookup, declared.lookup_expr)
+                filters.append(('{0}='.format(param), lookup))
+        return filters
+
+    @staticmethod
+    def resolve_field(model, path):
+        field = None
+        for part in path.split('__'):
+            field = model._meta.get_field(part)
+            if field.is_relation:
+                model = field.related_model
+        return field
+
+    def is_model_path(self, model, path):
+        try:
+            self.resolve_field(model, path)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def sample_value(self, model, lookup):
+        parts = lookup.split('__')
+        try:
+            field = self.resolve_field(model, '__'.join(parts))
+        except FieldDoesNotExist:
+            field = self.resolve_field(model, '__'.join(parts[:-1]))
+        if isinstance(field, models.ForeignKey):
+            return 1
+        if isinstance(field, models.BooleanField):
+            return True
+        if isinstance(field, (models.DateTimeField, models.DateField)):
+            return timezone.now()
+        if isinstance(field, (models.IntegerField, models.AutoField, models.FloatField)):
+            return 1
+        return 'x'
+
+    def explain(self, view_name, label, queryset):
+        connection = connections[router.db_for_read(queryset.model)]
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except FieldError as exc:
+            self.stderr.write('{0} {1}: {2}'.format(view_name, label, exc))
+            return []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                scans = [line for line in plan if SQLITE_FULL_SCAN.match(line.strip())]
+            else:
+                cursor.execute('EXPLAIN ' + sql, params)
+                columns = [column[0].lower() for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                plan = [' '.join('{0}={1}'.format(key, value) for key, value in row.items()) for row in rows]
+                scans = ['{0} ({1})'.format(row.get('table'), row.get('type')) for row in rows
+                         if str(row.get('type', '')).upper() == 'ALL']
+        if self.verbosity >= 2 or scans:
+            self.stdout.write('{0} {1}{2}'.format(view_name, label, ' FULL SCAN' if scans else ''))
+            for line in plan:
+                self.stdout.write('    ' + str(line))
+        return ['{0} {1}: {2}'.format(view_name, label, scan) for scan in scans]
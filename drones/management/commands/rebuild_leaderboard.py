@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+按 Competition 全量重建驾驶员/无人机排行榜
+
+    python manage.py rebuild_leaderboard
+
+排行榜平时由 drones.signals 增量维护; 绕过信号直接改库(raw SQL、QuerySet.update 等)后运行.
+"""
+from django.core.management.base import BaseCommand
+
+from drones import leaderboard
+from drones.cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pilot and drone leaderboards from the competitions table'
+
+    def handle(self, *args, **options):
+        counts = leaderboard.rebuild()
+        for entry_model, count in counts.items():
+            bump_generation(entry_model)
+            self.stdout.write('{0}: {1} entries'.format(entry_model.__name__, count))
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+按 Competition 重新计算 Pilot.races_count 与 Drone.has_it_competed
+
+    python manage.py reconcile_counters --chunk-size 1000
+
+按 pk 分段, 每段一次聚合查询, 只更新不一致的行. 计数平时由 drones.signals 增量维护;
+绕过信号直接改库后运行, 运行期间的并发写入可能需要再运行一次.
+"""
+from django.core.management.base import BaseCommand
+
+from drones import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount Pilot.races_count and Drone.has_it_competed from the competitions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=counters.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        pilots_fixed, drones_fixed = counters.reconcile(options['chunk_size'])
+        self.stdout.write('Pilots fixed: {0}, drones fixed: {1}'.format(pilots_fixed, drones_fixed))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+生成大规模测试数据(类别、用户、无人机、驾驶员、比赛、玩具)
+
+    python manage.py seed --categories 10000 --drones 1000000 --pilots 100000 --competitions 5000000
+    python manage.py seed --seed 42 --prefix run2 --pilot-skew 0   # 比赛在驾驶员间均匀分布
+
+    - 同样的 --seed 与数量生成同样的数据(名称带 --prefix, 同一个库中多次生成时换前缀, 前缀已用过时报错)
+    - 被引用的一方按 Zipf 分布挑选, 指数越大越集中(0 为均匀): 少数驾驶员参加大部分比赛,
+      少数无人机/类别/用户占多数, 热门对象的主键是打乱的
+    - 分块批量写入(--chunk-size), 每张表一个事务, 期间推迟约束检查(MySQL 关闭外键/唯一检查).
+      生成的是已经转换好的行, 每块一次 executemany; bulk_create 逐个实例化模型并转换字段值,
+      每秒只能写几千行
+    - races_count / has_it_competed 在插入前算好, 最后重建排行榜(--skip-leaderboard 跳过)
+
+日期都在 END_DATE 之前的 --years 年内, 与运行时间无关.
+"""
+import contextlib
+import datetime
+import itertools
+import random
+import time
+from bisect import bisect_right
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from drones import leaderboard
+from drones.cache import bump_generation
+from drones.models import Competition, Drone, DroneCategory, Pilot
+from toys.models import Toy
+
+END_DATE = datetime.datetime(2018, 3, 25, tzinfo=timezone.utc)
+TOY_CATEGORIES = ('Action figures', 'Dolls', 'Puzzles', 'Vehicles', 'Board games', 'Plush', 'Building blocks')
+
+
+class ZipfSampler(object):
+    """
+    从 0..n-1 中抽样, 第 k 热门的概率正比于 1 / k ** exponent; exponent 为 0 时均匀
+    """
+
+    def __init__(self, n, exponent, rng):
+        self.n = n
+        self.rng = rng
+        self.cum_weights = None
+        if exponent and n > 1:
+            total = 0.0
+            self.cum_weights = []
+            for rank in range(1, n + 1):
+                total += rank ** -exponent
+                self.cum_weights.append(total)
+            # 热门对象分散在整个主键范围内
+            self.order = list(range(n))
+            rng.shuffle(self.order)
+
+    def sample(self, k):
+        if self.cum_weights is None:
+            return [self.rng.randrange(self.n) for i in range(k)]
+        total, cum_weights, order, rand = self.cum_weights[-1], self.cum_weights, self.order, self.rng.random
+        return [order[bisect_right(cum_weights, rand() * total)] for i in range(k)]
+
+
+@contextlib.contextmanager
+def deferred_constraints():
+    """
+    批量写入期间推迟约束检查; SQLite 在 Django 1.11 中本就不检查外键,
+    PostgreSQL 的外键由 Django 创建为 DEFERRABLE INITIALLY DEFERRED
+    """
+    if connection.vendor != 'mysql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
+        cursor.execute('SET UNIQUE_CHECKS = 0')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET UNIQUE_CHECKS = 1')
+            cursor.execute('SET FOREIGN_KEY_CHECKS = 1')
+
+
+class Command(BaseCommand):
+    help = 'Generate reproducible, skewed synthetic data with chunked batch inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='prefix of every generated name')
+        parser.add_argument('--categories', type=int, default=100)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--drones', type=int, default=10000)
+        parser.add_argument('--pilots', type=int, default=1000)
+        parser.add_argument('--competitions', type=int, default=50000)
+        parser.add_argument('--toys', type=int, default=10000)
+        parser.add_argument('--pilot-skew', type=float, default=1.1, help='Zipf exponent of competitions per pilot')
+        parser.add_argument('--drone-skew', type=float, default=0.8, help='Zipf exponent of competitions per drone')
+        parser.add_argument('--category-skew', type=float, default=1.0, help='Zipf exponent of drones per category')
+        parser.add_argument('--owner-skew', type=float, default=1.0, help='Zipf exponent of drones per user')
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--password', default='seed-password', help='password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--skip-leaderboard', action='store_true')
+
+    def handle(self, *args, **options):
+        if (options['drones'] and not (options['categories'] and options['users'])) or \
+                (options['competitions'] and not (options['drones'] and options['pilots'])):
+            raise CommandError('drones need categories and users, competitions need drones and pilots')
+        self.options = options
+        self.prefix = options['prefix']
+        self.check_prefix()
+        self.chunk_size = options['chunk_size']
+        self.end_date = self.db_datetime(END_DATE)
+        self.now = self.db_datetime(timezone.now())
+
+        # 先抽出每场比赛的驾驶员和无人机, 插入驾驶员/无人机时就带上 races_count / has_it_competed
+        races_count = [0] * options['pilots']
+        competed = bytearray(options['drones'])
+        for pilot, drone in self.competition_owners():
+            races_count[pilot] += 1
+            competed[drone] = 1
+
+        category_ids = self.load(DroneCategory, ('name', 'updated_at'), self.categories())
+        user_ids = self.load(User, ('username', 'password', 'first_name', 'last_name', 'email', 'is_superuser',
+                                    'is_staff', 'is_active', 'date_joined'), self.users())
+        drone_ids = self.load(Drone, ('name', 'drone_category', 'owner', 'manufacturing_date', 'has_it_competed',
+                                      'inserted_timestamp', 'updated_at'),
+                              self.drones(category_ids, user_ids, competed))
+        pilot_ids = self.load(Pilot, ('name', 'gender', 'races_count', 'inserted_timestamp', 'updated_at'),
+                              self.pilots(races_count))
+        self.load(Competition, ('pilot', 'drone', 'distance_in_feet', 'distance_achievement_date', 'updated_at'),
+                  self.competitions(pilot_ids, drone_ids), return_ids=False)
+        self.load(Toy, ('name', 'description', 'toy_category', 'release_date', 'was_included_in_home', 'created'),
+                  self.toys(), return_ids=False)
+        if not options['skip_leaderboard']:
+            started = time.perf_counter()
+            counts = leaderboard.rebuild()
+            self.stdout.write('Leaderboards: {0} entries in {1:.1f}s'.format(
+                sum(counts.values()), time.perf_counter() - started))
+
+    @staticmethod
+    def db_datetime(value):
+        """
+        与 DateTimeField 写入时相同的表示: 不支持时区的数据库保存 UTC 的 naive 时间
+        """
+        if settings.USE_TZ and not connection.features.supports_timezones:
+            return timezone.make_naive(value, timezone.utc)
+        return value
+
+    def check_prefix(self):
+        """
+        每种对象的第一个名称已存在时说明前缀用过; 按完整名称比较, 'seed' 与 'seed 2' 互不影响
+        """
+        first_names = ((DroneCategory, 'name', self.name('category', 0)),
+                       (User, 'username', self.name('user', 0).replace(' ', '-')),
+                       (Drone, 'name', self.name('drone', 0)), (Pilot, 'name', self.name('pilot', 0)),
+                       (Toy, 'name', self.name('toy', 0)))
+        for model, field, name in first_names:
+            if model.objects.filter(**{field: name}).exists():
+                raise CommandError('Prefix {0!r} was already used ({1} {2!r} exists), pass another --prefix'.format(
+                    self.prefix, model.__name__, name))
+
+    def rng(self, name):
+        return random.Random('{0}:{1}'.format(self.options['seed'], name))
+
+    def name(self, kind, index):
+        return '{0} {1} {2}'.format(self.prefix, kind, index)
+
+    def random_dates(self, rng):
+        span = self.options['years'] * 365 * 86400
+        while True:
+            yield self.end_date - datetime.timedelta(seconds=rng.randrange(span))
+
+    def load(self, model, fields, rows, return_ids=True):
+        """
+        分块写入 fields 对应列; 返回按生成顺序排列的主键(写入前最大主键之后的行)
+        """
+        quote = connection.ops.quote_name
+        columns = [model._meta.get_field(name).column for name in fields]
+        sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+            quote(model._meta.db_table), ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)))
+        started = time.perf_counter()
+        count = 0
+        with deferred_constraints(), transaction.atomic(), connection.cursor() as cursor:
+            last_pk = model.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+            while True:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                cursor.executemany(sql, chunk)
+                count += len(chunk)
+            # executemany 不发送信号, 手动使依赖该模型的响应缓存与 ETag 失效
+            bump_generation(model)
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)) \
+                if return_ids else []
+        elapsed = time.perf_counter() - started
+        self.stdout.write('{0}: {1} rows in {2:.1f}s ({3:.0f} rows/s)'.format(
+            model.__name__, count, elapsed, count / elapsed if elapsed else 0))
+        if return_ids and len(pks) != count:
+            raise CommandError('{0}: expected {1} new rows, found {2} (concurrent writes?)'.format(
+                model.__name__, count, len(pks)))
+        return pks
+
+    def competition_owners(self):
+        """
+        每场比赛的 (驾驶员序号, 无人机序号), 同一个种子两次调用结果相同
+        """
+        count, rng = self.options['competitions'], self.rng('competition-owners')
+        pilots = ZipfSampler(self.options['pilots'], self.options['pilot_skew'], rng)
+        drones = ZipfSampler(self.options['drones'], self.options['drone_skew'], rng)
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            yield from zip(pilots.sample(size), drones.sample(size))
+
+    def categories(self):
+        for i in range(self.options['categories']):
+            yield self.name('category', i), self.now
+
+    def users(self):
+        password = make_password(self.options['password'])
+        for i in range(self.options['users']):
+            yield self.name('user', i).replace(' ', '-'), password, '', '', '', False, False, True, self.now
+
+    def drones(self, category_ids, user_ids, competed):
+        rng = self.rng('drones')
+        categories = ZipfSampler(len(category_ids), self.options['category_skew'], rng)
+        owners = ZipfSampler(len(user_ids), self.options['owner_skew'], rng)
+        dates = self.random_dates(rng)
+        for i in range(self.options['drones']):
+            yield (self.name('drone', i), category_ids[categories.sample(1)[0]], user_ids[owners.sample(1)[0]],
+                   next(dates), bool(competed[i]), self.now, self.now)
+
+    def pilots(self, races_count):
+        rng = self.rng('pilots')
+        for i in range(self.options['pilots']):
+            yield self.name('pilot', i), rng.choice((Pilot.MALE, Pilot.FEMALE)), races_count[i], self.now, self.now
+
+    def competitions(self, pilot_ids, drone_ids):
+        rng = self.rng('competitions')
+        dates = self.random_dates(rng)
+        for pilot, drone in self.competition_owners():
+            yield (pilot_ids[pilot], drone_ids[drone], int(rng.lognormvariate(6.5, 0.6)), next(dates), self.now)
+
+    def toys(self):
+        rng = self.rng('toys')
+        dates = self.random_dates(rng)
+        for i in range(self.options['toys']):
+            yield (self.name('toy', i), '', rng.choice(TOY_CATEGORIES), next(dates), rng.random() < 0.3, self.now)
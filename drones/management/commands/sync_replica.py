@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+把主库整库复制到本地 SQLite 副本(见 restful01.routers)
+
+    DJANGO_REPLICA_DB=db-replica.sqlite3 python manage.py sync_replica
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from restful01.db.replication import sync_sqlite_replica
+from restful01.routers import get_replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the local read replica files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', action='append', dest='replicas',
+                            help='replica alias (default: every configured replica)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='primary alias')
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or get_replicas()
+        if not replicas:
+            raise CommandError('No replica configured, set DJANGO_REPLICA_DB or REPLICA_ROUTING')
+        for alias in replicas:
+            if alias not in connections.databases:
+                raise CommandError('Unknown database alias {0!r}'.format(alias))
+            sync_sqlite_replica(alias, options['database'])
+            self.stdout.write('{0} -> {1}'.format(options['database'], connections[alias].settings_dict['NAME']))
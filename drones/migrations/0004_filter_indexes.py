@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 10:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='competition',
+            name='distance_achievement_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='drone',
+            name='manufacturing_date',
+            field=models.DateTimeField(db_index=True, verbose_name='制造日期'),
+        ),
+        migrations.AlterField(
+            model_name='pilot',
+            name='races_count',
+            field=models.IntegerField(db_index=True, verbose_name='比赛计数'),
+        ),
+        migrations.AddIndex(
+            model_name='drone',
+            index=models.Index(fields=['has_it_competed', 'name'], name='drone_competed_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drone',
+            index=models.Index(fields=['drone_category', 'name'], name='drone_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pilot',
+            index=models.Index(fields=['gender', 'name'], name='pilot_gender_name_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 10:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max
+
+
+def populate_leaderboard(apps, schema_editor):
+    Competition = apps.get_model('drones', 'Competition')
+    for model_name, key in (('PilotLeaderboardEntry', 'pilot'), ('DroneLeaderboardEntry', 'drone')):
+        entry_model = apps.get_model('drones', model_name)
+        rows = Competition.objects.order_by().values(key).annotate(
+            best=Max('distance_in_feet'), count=Count('pk'), last=Max('distance_achievement_date'))
+        entry_model.objects.bulk_create([
+            entry_model(pk=row[key], best_distance_in_feet=row['best'], competitions_count=row['count'],
+                        last_achievement_date=row['last'])
+            for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0004_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DroneLeaderboardEntry',
+            fields=[
+                ('best_distance_in_feet', models.IntegerField()),
+                ('competitions_count', models.IntegerField()),
+                ('last_achievement_date', models.DateTimeField()),
+                ('drone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='drones.Drone')),
+            ],
+            options={
+                'ordering': ('-best_distance_in_feet', '-pk'),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PilotLeaderboardEntry',
+            fields=[
+                ('best_distance_in_feet', models.IntegerField()),
+                ('competitions_count', models.IntegerField()),
+                ('last_achievement_date', models.DateTimeField()),
+                ('pilot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='drones.Pilot')),
+            ],
+            options={
+                'ordering': ('-best_distance_in_feet', '-pk'),
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pilotleaderboardentry',
+            index=models.Index(fields=['-best_distance_in_feet', '-pilot'], name='pilot_leaderboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='droneleaderboardentry',
+            index=models.Index(fields=['-best_distance_in_feet', '-drone'], name='drone_leaderboard_idx'),
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
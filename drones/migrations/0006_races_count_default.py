@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 10:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0005_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pilot',
+            name='races_count',
+            field=models.IntegerField(db_index=True, default=0, verbose_name='比赛计数'),
+        ),
+    ]
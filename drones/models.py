@@ -3,6 +3,7 @@ from django.db import models
 
 class DroneCategory(models.Model):
     name = models.CharField(max_length=250, unique=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ('name',)
@@ -17,13 +18,20 @@ class Drone(models.Model):
     """
     name = models.CharField(max_length=250, unique=True)
     drone_category = models.ForeignKey(DroneCategory, related_name='drones', on_delete=models.CASCADE)
-    manufacturing_date = models.DateTimeField(verbose_name="制造日期")
+    manufacturing_date = models.DateTimeField(verbose_name="制造日期", db_index=True)
+    # 由 drones.counters 按比赛维护
     has_it_competed = models.BooleanField(default=False)
     inserted_timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     owner = models.ForeignKey('auth.User', related_name='drones', on_delete=models.CASCADE)
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            # DroneList 过滤 has_it_competed / drone_category 并按 name 排序
+            models.Index(fields=['has_it_competed', 'name'], name='drone_competed_name_idx'),
+            models.Index(fields=['drone_category', 'name'], name='drone_category_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -39,11 +47,17 @@ class Pilot(models.Model):
 
     name = models.CharField(max_length=150, blank=False, unique=True)
     gender = models.CharField(max_length=2, choices=GENDER_CHOICES, default=MALE, )
-    races_count = models.IntegerField(verbose_name="比赛计数")
+    # 由 drones.counters 按比赛维护
+    races_count = models.IntegerField(verbose_name="比赛计数", default=0, db_index=True)
     inserted_timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            # PilotList 过滤 gender 并按 name 排序
+            models.Index(fields=['gender', 'name'], name='pilot_gender_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -56,8 +70,61 @@ class Competition(models.Model):
     pilot = models.ForeignKey(Pilot, related_name='competitions', on_delete=models.CASCADE)
     drone = models.ForeignKey(Drone, on_delete=models.CASCADE)
     distance_in_feet = models.IntegerField()
-    distance_achievement_date = models.DateTimeField()
+    distance_achievement_date = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         # Order by distance in descending order
         ordering = ('-distance_in_feet',)
+        indexes = [
+            # 键集分页 (-distance_in_feet, -pk)
+            models.Index(fields=['-distance_in_feet', '-id'], name='competition_keyset_idx'),
+            # 驾驶员的前若干场比赛(PilotSerializer.competitions)
+            models.Index(fields=['pilot', '-distance_in_feet', '-id'], name='competition_pilot_keyset_idx'),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    排行榜条目: 按比赛增量维护(drones.leaderboard), 读取时无需聚合 Competition
+    """
+    best_distance_in_feet = models.IntegerField()
+    competitions_count = models.IntegerField()
+    last_achievement_date = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+        ordering = ('-best_distance_in_feet', '-pk')
+
+
+class PilotLeaderboardEntry(LeaderboardEntry):
+    """
+    驾驶员排行榜
+    """
+    pilot = models.OneToOneField(Pilot, primary_key=True, related_name='leaderboard_entry',
+                                 on_delete=models.CASCADE)
+
+    class Meta(LeaderboardEntry.Meta):
+        indexes = [
+            # 排行榜键集分页 (-best_distance_in_feet, -pk)
+            models.Index(fields=['-best_distance_in_feet', '-pilot'], name='pilot_leaderboard_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.pilot)
+
+
+class DroneLeaderboardEntry(LeaderboardEntry):
+    """
+    无人机排行榜
+    """
+    drone = models.OneToOneField(Drone, primary_key=True, related_name='leaderboard_entry',
+                                 on_delete=models.CASCADE)
+
+    class Meta(LeaderboardEntry.Meta):
+        indexes = [
+            models.Index(fields=['-best_distance_in_feet', '-drone'], name='drone_leaderboard_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.drone)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+分页
+
+KeysetPagination 按排序列的值(而不是 OFFSET)定位下一页, 第 N 页与第 1 页的代价相同:
+    http :8000/v1/competitions/
+    http :8000/v1/competitions/ cursor==<next 中的游标> page_size==20 count==exact
+
+两种分页都接受 count 参数:
+    none      不计数, 多取一行判断是否有下一页
+    estimate  估计值: 未过滤的大表用表统计信息(ANALYZE 后), 其他情况用缓存的精确计数,
+              模型写入(更换响应缓存的代, 各进程共享)或 PAGINATION_COUNT['CACHE_TTL'] 秒后重新计数
+    exact     每次 COUNT(*)
+    http :8000/v1/vehicles/ count==none
+
+windowed_pks 一次查询取出每组(如每个类别)排在最前的若干行, 用于有界的嵌套关联.
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from drones.cache import get_generations
+
+COUNT_MODES = ('none', 'estimate', 'exact')
+COUNT_CACHE_KEY = 'drones:count:{0}'
+# 各数据库的表行数统计; SQLite 的 sqlite_stat1.stat 第一个数是表(索引)的行数
+TABLE_STATISTICS_SQL = {
+    'sqlite': "SELECT stat FROM sqlite_stat1 WHERE tbl = %s",
+    'mysql': "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+    'postgresql': "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+}
+
+
+def get_count_options():
+    options = {'DEFAULT_MODE': 'exact', 'CACHE_TTL': 60, 'EXACT_BELOW': 1000}
+    options.update(getattr(settings, 'PAGINATION_COUNT', {}))
+    return options
+
+
+def get_table_estimate(model, using):
+    """
+    表统计信息中的行数, 没有统计信息时返回 None
+    """
+    connection = connections[using]
+    sql = TABLE_STATISTICS_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table])
+            rows = cursor.fetchall()
+    except DatabaseError:
+        # 未运行过 ANALYZE 的 SQLite 没有 sqlite_stat1
+        return None
+    estimates = [int(str(row[0]).split()[0]) for row in rows if row[0] is not None]
+    estimates = [estimate for estimate in estimates if estimate >= 0]
+    return max(estimates) if estimates else None
+
+
+def get_cached_count(queryset, generations=None):
+    """
+    精确计数按 SQL 与代缓存
+
+    generations: 视图本次请求读到的依赖模型的代(drones.cache), 过滤条件跨表时其他模型的写入也会
+    使计数失效; 默认只用查询集模型的代
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    if generations is None:
+        generations = get_generations([queryset.model])
+    parts = [queryset.db, sql, repr(params)] + list(generations)
+    key = COUNT_CACHE_KEY.format(hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, get_count_options()['CACHE_TTL'])
+    return count
+
+
+def estimate_count(queryset, generations=None):
+    """
+    未过滤的查询在统计值不小于 EXACT_BELOW 时直接用统计值, 否则用缓存的精确计数
+    """
+    if not queryset.query.where and not queryset.query.distinct:
+        estimate = get_table_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate >= get_count_options()['EXACT_BELOW']:
+            return estimate
+    return get_cached_count(queryset, generations)
+
+
+def get_count_mode(request, param, default):
+    mode = request.query_params.get(param, default)
+    return mode if mode in COUNT_MODES else default
+
+
+def get_view_generations(queryset, view):
+    """
+    视图依赖查询集的模型时用它本次请求读到的代, 计数与响应缓存键基于同一状态
+    """
+    if queryset.model not in getattr(view, 'cache_dependencies', ()):
+        return None
+    return view.get_dependency_generations()
+
+
+def count_queryset(queryset, mode, view=None):
+    if mode == 'exact':
+        return queryset.order_by().count()
+    if mode == 'estimate':
+        return estimate_count(queryset, get_view_generations(queryset, view))
+    return None
+
+
+class KeysetPagination(BasePagination):
+    """
+    键集分页
+
+    ordering 的最后一列必须唯一(通常为 pk)作为并列时的决胜列, 且各列不可为空,
+    数据库中应有与 ordering 一致的复合索引.
+    count 参数: none(默认) / estimate / exact
+    """
+    ordering = ('-pk',)
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    count_mode = 'none'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request, view)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        content = OrderedDict()
+        if self.count is not None:
+            content['count'] = self.count
+        content['next'] = self.get_next_link()
+        content['previous'] = self.get_previous_link()
+        content['results'] = data
+        return Response(content)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset, request, view=None):
+        return count_queryset(queryset, get_count_mode(request, self.count_query_param, self.count_mode), view)
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return self.ordering
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in self.ordering)
+
+    @staticmethod
+    def get_position_filter(ordering, position):
+        """
+        (a, b) 之后: a 越过 pa, 或 a 等于 pa 且 b 越过 pb
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def get_row_value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    def get_position(self, row):
+        return [self.get_row_value(row, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, row, reverse):
+        payload = {'p': [value if isinstance(value, (int, float)) else str(value)
+                         for value in self.get_position(row)]}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def decode_cursor(self, request, model):
+        """
+        游标中的值按排序列的字段转换(to_python), 格式正确但取值无法转换的游标同样返回 404
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(position)
+            position = [self.get_ordering_field(model, field).to_python(value)
+                        for field, value in zip(self.ordering, position)]
+            if None in position:
+                raise ValueError(position)
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError, base64.binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
+
+    @staticmethod
+    def get_ordering_field(model, field):
+        name = field.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class LimitOffsetCountPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination 加上 count 参数, 默认模式为 PAGINATION_COUNT['DEFAULT_MODE']
+    none 模式的响应没有 count 字段
+    """
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = get_count_mode(request, self.count_query_param, get_count_options()['DEFAULT_MODE'])
+        if self.count_mode == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.count = count_queryset(queryset, self.count_mode, view)
+        return rows[:self.limit]
+
+    def get_paginated_response(self, data):
+        if self.count_mode == 'exact':
+            return super().get_paginated_response(data)
+        content = OrderedDict()
+        if self.count is not None:
+            content['count'] = self.count
+        content['next'] = self.get_next_link()
+        content['previous'] = self.get_previous_link()
+        content['results'] = data
+        return Response(content)
+
+    def get_next_link(self):
+        if self.count_mode == 'exact':
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+
+def windowed_pks(queryset, field, values, ordering, limit, branches=200):
+    """
+    field 的每个取值按 ordering 排在最前的 limit 行的主键
+
+    Django 1.11 没有窗口函数(ROW_NUMBER() OVER (PARTITION BY ...)): 每个取值一个
+    ORDER BY ... LIMIT 子查询, 走 (field, ordering) 复合索引只读 limit 行, 用 UNION ALL 合并,
+    每 branches 个取值一次查询(SQLite 复合查询最多 500 个分支)
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    pks = []
+    values = list(values)
+    for start in range(0, len(values), branches):
+        parts, params = [], []
+        for index, value in enumerate(values[start:start + branches]):
+            branch = queryset.filter(**{field: value}).order_by(*ordering).values_list('pk', flat=True)[:limit]
+            sql, branch_params = branch.query.get_compiler(using=queryset.db).as_sql()
+            # 带 LIMIT 的分支要包一层才能放进复合查询
+            parts.append('SELECT * FROM ({0}) {1}'.format(sql, quote('w{0}'.format(index))))
+            params.extend(branch_params)
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(parts), params)
+            pks.extend(row[0] for row in cursor.fetchall())
+    return pks
+
+
+def iterate_keyset(queryset, ordering, fields, chunk_size=1000):
+    """
+    按键集分段遍历 values_list(*fields) 行, 每段一次查询, 内存占用与总行数无关
+    """
+    names = [field.lstrip('-') for field in ordering]
+    columns = list(fields) + [name for name in names if name not in fields]
+    indexes = [columns.index(name) for name in names]
+    queryset = queryset.order_by(*ordering).values_list(*columns)
+    position = None
+    while True:
+        chunk = queryset
+        if position is not None:
+            chunk = chunk.filter(KeysetPagination.get_position_filter(ordering, position))
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[:len(fields)]
+        if len(rows) < chunk_size:
+            return
+        position = [rows[-1][index] for index in indexes]
+
+
+class CompetitionKeysetPagination(KeysetPagination):
+    """
+    比赛按飞行距离降序, 距离相同按 pk 降序, 由 competition_keyset_idx 支撑
+    """
+    ordering = ('-distance_in_feet', '-pk')
+
+
+class LeaderboardKeysetPagination(KeysetPagination):
+    """
+    排行榜按最远距离降序, 由 pilot_leaderboard_idx / drone_leaderboard_idx 支撑
+    """
+    ordering = ('-best_distance_in_feet', '-pk')
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+NDJSON(每行一个 JSON 对象)解析, 用于批量写入:
+    http POST :8000/v1/competitions/ Content-Type:application/x-ndjson < competitions.ndjson
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from restful01.renderers import get_json_backend
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        loads = get_json_backend().loads
+        items = []
+        for number, line in enumerate(codecs.getreader(encoding)(stream), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError as exc:
+                raise ParseError('NDJSON parse error on line {0} - {1}'.format(number, exc))
+        return items
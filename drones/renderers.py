@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+导出格式: NDJSON / CSV
+
+stream() 把 values_list 行逐段编码为字节, 供 StreamingHttpResponse 使用;
+render() 仅用于错误等普通响应.
+"""
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class StreamingRenderer(BaseRenderer):
+    charset = 'utf-8'
+    rows_per_write = 500
+
+    def stream(self, rows, header):
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= self.rows_per_write:
+                yield self.encode_rows(buffer, header)
+                buffer = []
+        if buffer:
+            yield self.encode_rows(buffer, header)
+
+    def encode_rows(self, rows, header):
+        raise NotImplementedError('`encode_rows()` must be implemented.')
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def __init__(self):
+        self.encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def encode_rows(self, rows, header):
+        return ''.join(self.encoder.encode(dict(zip(header, row))) + '\n' for row in rows).encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (self.encoder.encode(data) + '\n').encode(self.charset)
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.encoder = JSONEncoder()
+
+    def stream(self, rows, header):
+        yield self.encode_rows([header], None)
+        yield from super().stream(rows, header)
+
+    def encode_value(self, value):
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return self.encoder.default(value)
+
+    def encode_rows(self, rows, header):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerows([self.encode_value(value) for value in row] for row in rows)
+        return output.getvalue().encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return self.encode_rows([list(data.keys()), list(data.values())], None)
@@ -1,37 +1,495 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.utils.encoding import smart_text
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+from rest_framework.utils.field_mapping import get_detail_view_name
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.validators import UniqueValidator
 from drones.models import DroneCategory
 from drones.models import Drone
 from drones.models import Pilot
 from drones.models import Competition
-import drones.views
+from drones.models import DroneLeaderboardEntry
+from drones.models import PilotLeaderboardEntry
+from drones.pagination import CompetitionKeysetPagination, KeysetPagination, windowed_pks
+from drones.signals import bulk_created
+from restful01.fastpath import DateTimeValue, HyperlinkValue, ValuesSerializer
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_paths(value):
+    """
+    'name,competitions.drone.name' -> {'name': {}, 'competitions': {'drone': {'name': {}}}}
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def get_field_selection(request):
+    """
+    安全请求的 (?fields=, ?expand=) 解析结果, 没有对应参数时为 None
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    fields = parse_field_paths(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    expand = parse_field_paths(params[EXPAND_PARAM]) if EXPAND_PARAM in params else None
+    return fields, expand
+
+
+def resolve_source(model, attrs):
+    """
+    source 路径 -> (查询路径, 最后一个模型字段); 不是模型字段(方法、属性)时返回 (None, None)
+    """
+    opts, parts, field = model._meta, [], None
+    for attr in attrs:
+        if field is not None and not (field.many_to_one or field.one_to_one):
+            return None, None
+        try:
+            field = opts.get_field(attr)
+        except FieldDoesNotExist:
+            return None, None
+        parts.append(attr)
+        if field.is_relation:
+            opts = field.related_model._meta
+    return '__'.join(parts), field
+
+
+def link_field(field):
+    """
+    不展开的嵌套序列化器改为详情链接(many 时为链接列表)
+    """
+    many = isinstance(field, serializers.ListSerializer)
+    serializer = field.child if many else field
+    kwargs = {} if field.source == field.field_name else {'source': field.source}
+    return serializers.HyperlinkedRelatedField(view_name=get_detail_view_name(serializer.Meta.model),
+                                               many=many, read_only=True, **kwargs)
+
+
+def apply_loading(queryset, lookups, select_related, prefetches):
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if lookups is not None:
+        queryset = queryset.only(*lookups)
+    return queryset
+
+
+def get_related_prefetch(path, relation, serializer_class=None, fields=None, expand=None):
+    """
+    多值关联的 Prefetch: 展开时按嵌套序列化器选中的字段加载, 否则只加载主键(输出链接)
+    """
+    lookups, select_related, prefetches = [relation.related_model._meta.pk.name], [], []
+    if serializer_class is not None:
+        lookups, select_related, prefetches = serializer_class.get_loading(fields, expand)
+    if lookups is not None and relation.one_to_many:
+        # 反向外键, prefetch 按它把结果分配给各个对象
+        lookups = lookups + [relation.field.name]
+    queryset = apply_loading(relation.related_model._default_manager.all(), lookups, select_related, prefetches)
+    return Prefetch(path, queryset=queryset)
+
+
+class EagerLoadingMixin(object):
+    """
+    预加载方案: 声明序列化时需要的关联, 由视图的 get_queryset 自动应用, 避免 N+1 查询
+
+    安全请求可以用 ?fields= / ?expand= 裁剪输出, 查询随之裁剪(only() 选中的列, 只加载用到的关联):
+        ?fields=name,competitions.distance_in_feet   只输出列出的字段, 嵌套字段用 . 分隔
+        ?expand=competitions.drone                   只展开列出的嵌套序列化器, 其余输出为链接;
+                                                     ?expand= 为空时都不展开
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    # 输出字段 -> 需要的模型字段查询路径, 由 source 推导不出(如 get_FOO_display)时声明
+    field_lookups = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = get_field_selection(self.context.get('request'))
+        if fields is not None or expand is not None:
+            self.select_fields(fields, expand)
+
+    def select_fields(self, fields=None, expand=None):
+        for name, field in list(self.fields.items()):
+            if fields is not None and name not in fields:
+                del self.fields[name]
+                continue
+            nested = getattr(field, 'child', field)
+            if not isinstance(nested, EagerLoadingMixin):
+                continue
+            nested_fields = fields and fields[name] or None
+            nested_expand = None if expand is None else expand.get(name)
+            if isinstance(field, BoundedRelationField):
+                field.select(nested_fields, nested_expand, expand is None or name in expand)
+            elif expand is not None and name not in expand:
+                self.fields[name] = link_field(field)
+            else:
+                nested.select_fields(nested_fields, nested_expand)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None, required=()):
+        """
+        fields/expand 为 None 时使用声明的预加载方案, 否则按选中的字段加载; required 是另外要加载的列
+        """
+        if fields is None and expand is None:
+            if cls.select_related_fields:
+                queryset = queryset.select_related(*cls.select_related_fields)
+            if cls.prefetch_related_fields:
+                queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+            return queryset
+        lookups, select_related, prefetches = cls.get_loading(fields, expand)
+        return apply_loading(queryset, lookups and lookups + list(required), select_related, prefetches)
+
+    @classmethod
+    def get_loading(cls, fields=None, expand=None):
+        """
+        选中的字段需要的 (only() 的查询路径, None 表示全部列; select_related 路径; Prefetch 列表)
+        """
+        # only() 的关联路径不认 pk 别名
+        lookups, select_related, prefetches = [cls.Meta.model._meta.pk.name], [], []
+        for name, field in cls().fields.items():
+            if fields is not None and name not in fields:
+                continue
+            if name in cls.field_lookups:
+                lookups.extend(cls.field_lookups[name])
+                continue
+            if isinstance(field, BoundedRelationField):
+                # 关联由 BoundedRelationField.prefetch 单独加载
+                lookups.extend(field.get_lookups())
+                continue
+            if isinstance(field, serializers.HyperlinkedIdentityField) or field.source_attrs == ['pk']:
+                continue
+            path, model_field = resolve_source(cls.Meta.model, field.source_attrs)
+            if path is None:
+                lookups = None
+                break
+            nested = getattr(field, 'child', field)
+            nested_fields = fields and fields[name] or None
+            nested_expand = None if expand is None else expand.get(name)
+            expanded = isinstance(nested, EagerLoadingMixin) and (expand is None or name in expand)
+            if model_field.one_to_many or model_field.many_to_many:
+                prefetches.append(get_related_prefetch(path, model_field, type(nested) if expanded else None,
+                                                       nested_fields, nested_expand))
+                continue
+            if expanded:
+                related = type(nested).get_loading(nested_fields, nested_expand)
+                if related[0] is None:
+                    lookups = None
+                    break
+                lookups.extend('{0}__{1}'.format(path, lookup) for lookup in related[0])
+                select_related.append(path)
+                select_related.extend('{0}__{1}'.format(path, lookup) for lookup in related[1])
+                prefetches.extend(Prefetch('{0}__{1}'.format(path, prefetch.prefetch_through),
+                                           queryset=prefetch.queryset) for prefetch in related[2])
+                continue
+            if model_field.is_relation and isinstance(field, serializers.SlugRelatedField):
+                path = '{0}__{1}'.format(path, field.slug_field)
+            lookups.append(path)
+            if '__' in path:
+                select_related.append(path.rsplit('__', 1)[0])
+        if lookups is None:
+            return None, select_related, prefetches
+        return lookups, select_related, prefetches
+
+
+class PreloadedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    批量校验时从 BulkListSerializer 预先查询好的 {slug: 对象} 中取值, 不再逐条查询
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.preloaded = None
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+        if not isinstance(data, (str, int)):
+            self.fail('invalid')
+        try:
+            return self.preloaded[str(data)]
+        except KeyError:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=smart_text(data))
+
+
+class BoundedRelationField(serializers.Field):
+    """
+    多值关联的有界表示, 不随关联的行数增长:
+
+        {"count": 总数, "next": 过滤后的列表中接下来的一页(全部已列出时为 null), "results": [前 limit 个]}
+
+    child 序列化每一个关联对象(链接或嵌套序列化器); 同一页的对象由 BoundedListSerializer
+    一起加载(prefetch): 一次 GROUP BY 计数(count_attr 为维护好的计数列时省去), 一次
+    windowed_pks 取每个对象的前 limit 个主键, 一次按主键加载关联对象.
+    """
+
+    def __init__(self, child, relation, list_view_name, filter_param, filter_attr='pk', ordering=None,
+                 count_attr=None, pagination_class=None, limit=None, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.child = child
+        self.child.bind(field_name='', parent=self)
+        self.relation = relation
+        self.list_view_name = list_view_name
+        self.filter_param = filter_param
+        self.filter_attr = filter_attr
+        self.ordering = ordering
+        self.count_attr = count_attr
+        self.pagination_class = pagination_class or api_settings.DEFAULT_PAGINATION_CLASS
+        self.limit = limit
+        self.selection = (None, None)
+        self.windows = {}
+
+    def get_limit(self):
+        if self.limit is not None:
+            return self.limit
+        return settings.NESTED_RELATION_LIMIT
+
+    def get_lookups(self):
+        """
+        prefetch 和 next 链接需要的本方模型字段
+        """
+        return [lookup for lookup in (self.filter_attr, self.count_attr) if lookup not in (None, 'pk')]
+
+    def select(self, fields, expand, expanded):
+        """
+        ?fields= / ?expand=: 不展开时 child 改为详情链接
+        """
+        if not expanded:
+            self.child = serializers.HyperlinkedRelatedField(
+                view_name=get_detail_view_name(self.child.Meta.model), read_only=True)
+            self.child.bind(field_name='', parent=self)
+            return
+        self.selection = (fields, expand)
+        self.child.select_fields(fields, expand)
+
+    def get_queryset(self, relation):
+        model = relation.related_model
+        ordering = self.ordering or model._meta.ordering
+        required = [relation.field.name] + [field.lstrip('-') for field in ordering]
+        if isinstance(self.child, EagerLoadingMixin):
+            return type(self.child).setup_eager_loading(model._default_manager.all(), *self.selection,
+                                                        required=required)
+        return model._default_manager.only(*required)
 
+    def prefetch(self, instances):
+        relation = instances[0]._meta.get_field(self.relation) if instances else None
+        if relation is None:
+            return
+        model, field = relation.related_model, relation.field
+        ordering = self.ordering or model._meta.ordering
+        if self.count_attr is not None:
+            counts = {instance.pk: getattr(instance, self.count_attr) for instance in instances}
+        else:
+            counts = dict(model._default_manager.filter(**{field.name + '__in': instances}).order_by()
+                          .values_list(field.name).annotate(Count('pk')))
+        values = [instance.pk for instance in instances if counts.get(instance.pk)]
+        queryset = self.get_queryset(relation).order_by(*ordering)
+        limit = self.get_limit()
+        if len(values) > 1:
+            rows = queryset.filter(pk__in=windowed_pks(model._default_manager.all(), field.name, values,
+                                                       ordering, limit))
+        elif values:
+            rows = queryset.filter(**{field.name: values[0]})[:limit]
+        else:
+            rows = []
+        windows = {instance.pk: [] for instance in instances}
+        for row in rows:
+            windows[getattr(row, field.attname)].append(row)
+        for instance in instances:
+            self.windows[instance.pk] = (counts.get(instance.pk, 0), windows[instance.pk])
 
-class DroneCategorySerializer(serializers.HyperlinkedModelSerializer):
+    def get_next_link(self, instance, rows):
+        url = reverse(self.list_view_name, request=self.context.get('request'))
+        url = replace_query_param(url, self.filter_param, getattr(instance, self.filter_attr))
+        paginator = self.pagination_class()
+        if isinstance(paginator, KeysetPagination):
+            paginator.base_url = replace_query_param(url, paginator.page_size_query_param, self.get_limit())
+            return paginator.encode_cursor(rows[-1], reverse=False)
+        url = replace_query_param(url, paginator.limit_query_param, self.get_limit())
+        return replace_query_param(url, paginator.offset_query_param, len(rows))
+
+    def to_representation(self, instance):
+        if instance.pk not in self.windows:
+            self.prefetch([instance])
+        count, rows = self.windows[instance.pk]
+        return OrderedDict([
+            ('count', count),
+            ('next', self.get_next_link(instance, rows) if count > len(rows) else None),
+            ('results', [self.child.to_representation(row) for row in rows]),
+        ])
+
+
+class BoundedListSerializer(serializers.ListSerializer):
+    """
+    序列化一页对象前, 为其中的 BoundedRelationField 一起加载关联
+    """
+
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, 'all') else data)
+        for field in self.child._readable_fields:
+            if isinstance(field, BoundedRelationField):
+                field.prefetch(instances)
+        return super().to_representation(instances)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    批量创建
+
+    每个 PreloadedSlugRelatedField 只做一次 IN 查询(按 chunk_size 分段), 唯一字段一次 IN 查询
+    加批内查重, 全部通过后在一个事务内 bulk_create, 并发送 bulk_created 信号.
+    """
+    chunk_size = 500
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            return super().to_internal_value(data)
+        related_fields = [field for field in self.child.fields.values()
+                          if isinstance(field, PreloadedSlugRelatedField) and not field.read_only]
+        unique_fields = [field for field in self.child.fields.values()
+                         if not field.read_only and any(isinstance(v, UniqueValidator) for v in field.validators)]
+        original_validators = {field: field.validators for field in unique_fields}
+        try:
+            for field in related_fields:
+                field.preloaded = self.preload_related(field, data)
+            existing = {}
+            for field in unique_fields:
+                existing[field] = self.preload_existing(field, data)
+                field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+            return self.validate_items(data, existing)
+        finally:
+            for field in related_fields:
+                field.preloaded = None
+            for field, validators in original_validators.items():
+                field.validators = validators
+
+    def validate_items(self, data, existing):
+        ret = []
+        errors = []
+        seen = {field: set() for field in existing}
+        for item in data:
+            try:
+                validated = self.child.run_validation(item)
+                unique_errors = {}
+                for field, values in existing.items():
+                    value = validated.get(field.source)
+                    if value in values or value in seen[field]:
+                        unique_errors[field.field_name] = [UniqueValidator.message]
+                    seen[field].add(value)
+                if unique_errors:
+                    raise serializers.ValidationError(unique_errors)
+            except serializers.ValidationError as exc:
+                errors.append(exc.detail)
+            else:
+                ret.append(validated)
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return ret
+
+    def get_values(self, field, data):
+        values = set()
+        for item in data:
+            if isinstance(item, dict) and isinstance(item.get(field.field_name), (str, int)):
+                values.add(str(item[field.field_name]))
+        return sorted(values)
+
+    def chunks(self, values):
+        for start in range(0, len(values), self.chunk_size):
+            yield values[start:start + self.chunk_size]
+
+    def preload_related(self, field, data):
+        preloaded = {}
+        for chunk in self.chunks(self.get_values(field, data)):
+            for obj in field.get_queryset().filter(**{field.slug_field + '__in': chunk}):
+                preloaded[str(getattr(obj, field.slug_field))] = obj
+        return preloaded
+
+    def preload_existing(self, field, data):
+        queryset = self.child.Meta.model._default_manager.all()
+        existing = set()
+        for chunk in self.chunks(self.get_values(field, data)):
+            existing.update(queryset.filter(**{field.source + '__in': chunk}).values_list(field.source, flat=True))
+        return existing
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        instances = [model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            model._default_manager.bulk_create(instances, batch_size=self.batch_size)
+        bulk_created.send(sender=model, instances=instances)
+        return instances
+
+
+class UpdateFieldsMixin(object):
+    """
+    更新时只写入提交的字段(以及 auto_now 的 updated_at): 整行 save() 会把 get_object() 时读到的
+    races_count / has_it_competed 写回, 覆盖期间 drones.counters 用 F() 做的增减
+    """
+
+    def update(self, instance, validated_data):
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data) + [
+            field.name for field in instance._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        instance.save(update_fields=update_fields)
+        return instance
+
+
+class DroneCategorySerializer(EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     """
     无人机类型serializer
     """
-    drones = serializers.HyperlinkedRelatedField(many=True, read_only=True, view_name='drone-detail')
+    # 无人机数量, 按名称排在最前的若干个的链接, 以及 /vehicles/?drone_category= 的下一页
+    drones = BoundedRelationField(serializers.HyperlinkedRelatedField(read_only=True, view_name='drone-detail'),
+                                  relation='drones', list_view_name='drone-list', filter_param='drone_category')
 
     class Meta:
         model = DroneCategory
+        list_serializer_class = BoundedListSerializer
         fields = ('url', 'pk', 'name', 'drones')
 
 
-class DroneSerializer(serializers.HyperlinkedModelSerializer):
+class DroneSerializer(UpdateFieldsMixin, EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     """
     无人机 serializer
     """
     # Display the category name
-    drone_category = serializers.SlugRelatedField(queryset=DroneCategory.objects.all(), slug_field='name')
+    drone_category = PreloadedSlugRelatedField(queryset=DroneCategory.objects.all(), slug_field='name')
     owner = serializers.ReadOnlyField(source='owner.username')
 
+    select_related_fields = ('drone_category', 'owner')
+
     class Meta:
         model = Drone
+        list_serializer_class = BulkListSerializer
         fields = (
             'url', 'name', 'drone_category', "owner", 'manufacturing_date', 'has_it_competed', 'inserted_timestamp')
+        # 由比赛维护 (drones.counters)
+        read_only_fields = ('has_it_competed',)
 
 
-class CompetitionSerializer(serializers.HyperlinkedModelSerializer):
+class CompetitionSerializer(EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     """
     比赛serializer
     """
@@ -39,38 +497,108 @@ class CompetitionSerializer(serializers.HyperlinkedModelSerializer):
     # 显示相关的无人驾驶飞机的所有细节
     drone = DroneSerializer()
 
+    select_related_fields = ('drone__drone_category', 'drone__owner')
+
     class Meta:
         model = Competition
         fields = ('url', 'pk', 'distance_in_feet', 'distance_achievement_date', 'drone')
 
 
-class PilotSerializer(serializers.HyperlinkedModelSerializer):
+class PilotSerializer(UpdateFieldsMixin, EagerLoadingMixin, serializers.HyperlinkedModelSerializer):
     """
     飞行员Serializer
     """
-    competitions = CompetitionSerializer(many=True, read_only=True)  # 比赛
+    # 比赛: 总数取 races_count, 按距离排在最前的若干场, 以及 /competitions/?pilot_name= 的下一页
+    competitions = BoundedRelationField(CompetitionSerializer(), relation='competitions',
+                                        list_view_name='competition-list', filter_param='pilot_name',
+                                        filter_attr='name', ordering=CompetitionKeysetPagination.ordering,
+                                        count_attr='races_count', pagination_class=CompetitionKeysetPagination)
     gender = serializers.ChoiceField(choices=Pilot.GENDER_CHOICES)  # 性别
     gender_description = serializers.CharField(source='get_gender_display', read_only=True)
 
+    field_lookups = {'gender_description': ('gender',)}
+
     class Meta:
         model = Pilot
+        list_serializer_class = BoundedListSerializer
         fields = ('url', 'name', 'gender', 'gender_description', 'races_count', 'inserted_timestamp', 'competitions')
+        read_only_fields = ('races_count',)
 
 
-class PilotCompetitionSerializer(serializers.ModelSerializer):
+class PilotCompetitionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     飞行比赛serializer
     """
     # Display the pilot's name  显示飞行员的名字
-    pilot = serializers.SlugRelatedField(queryset=Pilot.objects.all(), slug_field='name')
+    pilot = PreloadedSlugRelatedField(queryset=Pilot.objects.all(), slug_field='name')
     # Display the drone's name  显示无人驾驶飞机的名字
-    drone = serializers.SlugRelatedField(queryset=Drone.objects.all(), slug_field='name')
+    drone = PreloadedSlugRelatedField(queryset=Drone.objects.all(), slug_field='name')
+
+    select_related_fields = ('pilot', 'drone')
 
     class Meta:
         model = Competition
+        list_serializer_class = BulkListSerializer
         fields = ('url', 'pk', 'distance_in_feet', 'distance_achievement_date', 'pilot', 'drone')
 
 
+class PilotLeaderboardSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """
+    驾驶员排行榜
+    """
+    pilot = serializers.SlugRelatedField(read_only=True, slug_field='name')
+    pilot_url = serializers.HyperlinkedRelatedField(source='pilot', read_only=True, view_name='pilot-detail')
+
+    select_related_fields = ('pilot',)
+
+    class Meta:
+        model = PilotLeaderboardEntry
+        fields = ('pilot', 'pilot_url', 'best_distance_in_feet', 'competitions_count', 'last_achievement_date')
+
+
+class DroneLeaderboardSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """
+    无人机排行榜
+    """
+    drone = serializers.SlugRelatedField(read_only=True, slug_field='name')
+    drone_url = serializers.HyperlinkedRelatedField(source='drone', read_only=True, view_name='drone-detail')
+
+    select_related_fields = ('drone',)
+
+    class Meta:
+        model = DroneLeaderboardEntry
+        fields = ('drone', 'drone_url', 'best_distance_in_feet', 'competitions_count', 'last_achievement_date')
+
+
+class DroneValuesSerializer(ValuesSerializer):
+    """
+    DroneSerializer 的只读快速版本
+    """
+    fields = (
+        ('url', HyperlinkValue('drone-detail')),
+        ('name', 'name'),
+        ('drone_category', 'drone_category__name'),
+        ('owner', 'owner__username'),
+        ('manufacturing_date', DateTimeValue('manufacturing_date')),
+        ('has_it_competed', 'has_it_competed'),
+        ('inserted_timestamp', DateTimeValue('inserted_timestamp')),
+    )
+
+
+class PilotCompetitionValuesSerializer(ValuesSerializer):
+    """
+    PilotCompetitionSerializer 的只读快速版本
+    """
+    fields = (
+        ('url', HyperlinkValue('competition-detail')),
+        ('pk', 'pk'),
+        ('distance_in_feet', 'distance_in_feet'),
+        ('distance_achievement_date', DateTimeValue('distance_achievement_date')),
+        ('pilot', 'pilot__name'),
+        ('drone', 'drone__name'),
+    )
+
+
 from django.contrib.auth.models import User
 
 
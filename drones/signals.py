@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+模型信号处理: 写入后更换响应缓存的代, 维护排行榜与比赛计数, 使 Token 认证缓存失效
+
+bulk_create 不发送 post_save, 批量写入路径(BulkListSerializer)发送 bulk_created
+
+删除驾驶员/无人机(以及级联到无人机的类别、用户)时, Collector 按依赖顺序发送信号:
+所有对象的 pre_delete(比赛在前), 执行删除, 再按同样顺序发送 post_delete.
+父对象的 pre_delete 记下自己正在删除, 级联删除的比赛在 post_delete 中只登记另一侧仍然存在的
+驾驶员/无人机, 由父对象的 post_delete 一次分段更新计数和排行榜, 而不是每场比赛各做一遍;
+被删除一方的排行榜条目随父对象级联删除.
+"""
+import threading
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+from drones import counters
+from drones import leaderboard
+from drones.cache import bump_generation
+from drones.models import Competition, Drone, DroneCategory, DroneLeaderboardEntry, Pilot, PilotLeaderboardEntry
+from restful01.authentication import invalidate_tokens
+
+CACHED_MODELS = (DroneCategory, Drone, Pilot, Competition, User)
+
+bulk_created = Signal(providing_args=['instances'])
+
+_cascade = threading.local()
+
+
+class CascadeState(object):
+    def __init__(self):
+        # 正在删除的驾驶员/无人机
+        self.deleting = {'pilot': set(), 'drone': set()}
+        # 级联删除的比赛所属的、仍然存在的驾驶员(减少的比赛数)和无人机
+        self.pilot_counts = Counter()
+        self.drones = set()
+
+
+def get_cascade_state():
+    state = getattr(_cascade, 'state', None)
+    if state is None:
+        state = _cascade.state = CascadeState()
+    return state
+
+
+def reset_cascade_state():
+    _cascade.state = None
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(bulk_created)
+def invalidate_response_cache(sender, **kwargs):
+    if sender in CACHED_MODELS:
+        bump_generation(sender)
+
+
+@receiver(pre_save, sender=Competition)
+def remember_competition_owners(sender, instance, raw=False, **kwargs):
+    """
+    修改比赛前记下原来的驾驶员/无人机
+    """
+    instance._previous_owners = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._previous_owners = sender.objects.filter(pk=instance.pk).values('pilot', 'drone').first()
+
+
+@receiver(post_save, sender=Competition)
+def competition_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_owners', None)
+    if created:
+        counters.competitions_added([instance])
+        leaderboard.competition_added(instance)
+    else:
+        if previous:
+            counters.competition_moved(instance, previous)
+        leaderboard.competitions_changed([instance], previous)
+
+
+@receiver(pre_delete, sender=Competition)
+def forget_interrupted_cascade(sender, instance, **kwargs):
+    """
+    比赛的 pre_delete 总在父对象的 pre_delete 之前, 这时还有记录说明上一次删除中途失败
+    """
+    state = get_cascade_state()
+    if state.deleting['pilot'] or state.deleting['drone']:
+        reset_cascade_state()
+
+
+@receiver(post_delete, sender=Competition)
+def competition_deleted(sender, instance, **kwargs):
+    state = get_cascade_state()
+    pilot_deleted = instance.pilot_id in state.deleting['pilot']
+    drone_deleted = instance.drone_id in state.deleting['drone']
+    if not (pilot_deleted or drone_deleted):
+        counters.competition_removed(instance)
+        leaderboard.competitions_changed([instance])
+        return
+    if not pilot_deleted:
+        state.pilot_counts[instance.pilot_id] += 1
+    if not drone_deleted:
+        state.drones.add(instance.drone_id)
+
+
+@receiver(pre_delete, sender=Pilot)
+@receiver(pre_delete, sender=Drone)
+def parent_deleting(sender, instance, **kwargs):
+    get_cascade_state().deleting[sender._meta.model_name].add(instance.pk)
+
+
+@receiver(post_delete, sender=Pilot)
+@receiver(post_delete, sender=Drone)
+def parent_deleted(sender, instance, **kwargs):
+    """
+    级联删除的比赛都已登记(比赛的 post_delete 在前), 第一个父对象一次处理全部, 其余的没有剩余工作
+    """
+    state = get_cascade_state()
+    state.deleting[sender._meta.model_name].discard(instance.pk)
+    if state.pilot_counts:
+        counters.add_races({pk: -count for pk, count in state.pilot_counts.items()})
+        leaderboard.refresh(PilotLeaderboardEntry, 'pilot', state.pilot_counts)
+        state.pilot_counts = Counter()
+    if state.drones:
+        counters.unmark_competed(state.drones)
+        leaderboard.refresh(DroneLeaderboardEntry, 'drone', state.drones)
+        state.drones = set()
+
+
+@receiver(bulk_created, sender=Competition)
+def competitions_bulk_created(sender, instances, **kwargs):
+    counters.competitions_added(instances)
+    leaderboard.competitions_changed(instances)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    """
+    停用、改密码等用户修改使其 Token 的认证缓存失效(删除用户时 Token 级联删除)
+    """
+    invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
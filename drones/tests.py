@@ -1,9 +1,56 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db import connections
+from django.db.utils import OperationalError
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 from django.utils.http import urlencode
 from django.core.urlresolvers import reverse
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.exceptions import ParseError
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework.test import APITransactionTestCase
 from drones.models import DroneCategory
+from drones.models import Drone
+from drones.models import Pilot
+from drones.models import Competition
+from drones.models import DroneLeaderboardEntry
+from drones.models import PilotLeaderboardEntry
+from drones import leaderboard
 from drones import views
+from drones.v2 import views as views_v2
+from drones.cache import clear_response_cache, get_generation_store, get_generations, model_label
+from drones.management.commands.bench_routes import compare, compare_routes
+from drones.pagination import windowed_pks
+from restful01.db.backends.sqlite3.base import DatabaseWrapper as PooledSQLiteDatabaseWrapper
+from restful01 import routers
+from restful01.generations import SQLiteGenerationStore
+from restful01.db.pool import ConnectionPool, close_pools
+from restful01.db.replication import sync_sqlite_replica
+from restful01.lru import LRUCache
+from restful01.metrics import registry
+from restful01.middleware import QueryBudgetExceeded
+from restful01.parsers import FastJSONParser
+from restful01.renderers import FastJSONRenderer, get_available_json_backends
+from restful01.throttling import SQLiteBucketStore, TokenBucketScopedRateThrottle
+from toys.models import Toy
 
 
 class DroneCategoryTests(APITestCase):
@@ -91,6 +138,1360 @@ class DroneCategoryTests(APITestCase):
         assert get_response.data['name'] == drone_category_name
 
 
+class DroneDataMixin(object):
+    def create_drone_data(self, pilots_count, competitions_per_pilot):
+        if not hasattr(self, 'user'):
+            self.user = User.objects.create_user('pilot-owner', password='pilot-password')
+            self.categories = [DroneCategory.objects.create(name='Category {0}'.format(i)) for i in range(3)]
+        for i in range(pilots_count):
+            pilot = Pilot.objects.create(name='Pilot {0}'.format(Pilot.objects.count()), races_count=0)
+            for j in range(competitions_per_pilot):
+                drone = Drone.objects.create(
+                    name='Drone {0}'.format(Drone.objects.count()),
+                    drone_category=self.categories[j % len(self.categories)],
+                    owner=self.user, manufacturing_date=timezone.now())
+                Competition.objects.create(pilot=pilot, drone=drone, distance_in_feet=100 * j,
+                                           distance_achievement_date=timezone.now())
+
+
+class PilotQueryCountTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(0, 0)
+        self.client.force_authenticate(user=self.user)
+
+    def create_pilots(self, pilots_count, competitions_per_pilot):
+        self.create_drone_data(pilots_count, competitions_per_pilot)
+
+    def get_pilots(self):
+        url = '{0}?{1}'.format(reverse('v1:' + views.PilotList.name), urlencode({'limit': 100}))
+        return self.client.get(url, format='json')
+
+    def test_pilot_list_query_count_is_constant(self):
+        """
+        Ensure the pilot list costs the same number of queries regardless of the nested data volume
+        """
+        self.create_pilots(1, 1)
+        # count + pilots + competitions joined with drone, category and owner
+        with self.assertNumQueries(3):
+            response = self.get_pilots()
+        assert response.status_code == status.HTTP_200_OK
+        self.create_pilots(5, 4)
+        # several pilots add the query picking the first competitions of each pilot
+        with self.assertNumQueries(4):
+            response = self.get_pilots()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 6
+        competition = response.data['results'][-1]['competitions']['results'][0]
+        assert competition['drone']['owner'] == self.user.username
+        assert competition['drone']['drone_category'] in [category.name for category in self.categories]
+
+    def test_pilot_detail_query_count_is_constant(self):
+        """
+        Ensure a single pilot is retrieved with its competitions in a fixed number of queries
+        """
+        self.create_pilots(1, 6)
+        url = reverse('v1:' + views.PilotDetail.name, None, {Pilot.objects.get().pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['competitions']['count'] == 6
+        assert len(response.data['competitions']['results']) == 6
+
+
+class QueryInstrumentationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 3)
+        self.client.force_authenticate(user=self.user)
+        registry.reset()
+
+    def test_endpoints_stay_within_query_budget(self):
+        """
+        Ensure every drones endpoint serves data within its declared query budget
+        """
+        urls = [reverse('v1:' + views.ApiRoot.name)]
+        for list_view, detail_view, model in ((views.DroneCategoryList, views.DroneCategoryDetail, DroneCategory),
+                                              (views.DroneList, views.DroneDetail, Drone),
+                                              (views.PilotList, views.PilotDetail, Pilot),
+                                              (views.CompetitionList, views.CompetitionDetail, Competition)):
+            urls.append('{0}?{1}'.format(reverse('v1:' + list_view.name), urlencode({'limit': 100})))
+            urls.append(reverse('v1:' + detail_view.name, None, {model.objects.first().pk}))
+        for url in urls:
+            response = self.client.get(url, format='json')
+            assert response.status_code == status.HTTP_200_OK, url
+            assert response['Server-Timing'].startswith('db;desc="{0} queries"'.format(response['X-Query-Count']))
+
+    def test_query_budget_exceeded(self):
+        """
+        Ensure a request running more queries than its budget fails under test
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        with mock.patch.object(views.DroneList, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url, format='json')
+        assert registry.get('query_budget_exceeded_total', endpoint='v1:' + views.DroneList.name) == 1
+
+    def test_metrics_endpoint(self):
+        """
+        Ensure the collected counters can be scraped
+        """
+        self.client.get(reverse('v1:' + views.DroneList.name), format='json')
+        response = self.client.get(reverse('metrics'))
+        assert response.status_code == status.HTTP_200_OK
+        content = response.content.decode()
+        assert 'http_requests_total{endpoint="v1:drone-list",method="GET"} 1' in content
+        assert 'sql_queries_total{endpoint="v1:drone-list"} 2' in content
+
+
+class TokenBucketThrottleTests(DroneDataMixin, APITestCase):
+    def test_bucket_refills_at_the_configured_rate(self):
+        """
+        Ensure a bucket allows a burst of num_requests and then one request per duration / num_requests
+        """
+        now = [1000.0]
+        path = settings.THROTTLE_STORE['PATH']
+        store = SQLiteBucketStore(path, timer=lambda: now[0])
+        assert store.consume('client', 2, 10) == (True, 0.0)
+        assert store.consume('client', 2, 10) == (True, 0.0)
+        assert store.consume('client', 2, 10) == (False, 5.0)
+        # another process sees the same bucket
+        assert SQLiteBucketStore(path, timer=lambda: now[0]).consume('client', 2, 10) == (False, 5.0)
+        assert store.consume('other', 2, 10) == (True, 0.0)
+        now[0] += 5
+        assert store.consume('client', 2, 10) == (True, 0.0)
+        now[0] += 100
+        store.purge()
+        assert store.get_connection().execute('SELECT COUNT(*) FROM throttle_bucket').fetchone() == (0,)
+
+    def test_scoped_throttle_on_drone_list(self):
+        self.create_drone_data(1, 1)
+        url = reverse('v1:' + views.DroneList.name)
+        with mock.patch.dict(TokenBucketScopedRateThrottle.THROTTLE_RATES, {'drones': '2/hour'}):
+            assert self.client.get(url, format='json').status_code == status.HTTP_200_OK
+            assert self.client.get(url, format='json').status_code == status.HTTP_200_OK
+            response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response['Retry-After']) == 1800
+        assert registry.get('throttle_rejections_total', scope='drones') == 1
+
+
+class PooledSQLiteBackendTests(APITestCase):
+    def setUp(self):
+        self.settings_dict = dict(connection.settings_dict, CONN_MAX_AGE=0, OPTIONS={
+            'pool': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+            'pragmas': {'cache_size': -2000}})
+        self.settings_dict['NAME'] = os.path.join(os.path.dirname(settings.THROTTLE_STORE['PATH']), 'pool.sqlite3')
+        registry.reset()
+
+    def tearDown(self):
+        close_pools()
+
+    def test_pragmas_are_set_on_connect(self):
+        wrapper = PooledSQLiteDatabaseWrapper(self.settings_dict, alias='pool-pragmas')
+        with wrapper.cursor() as cursor:
+            values = [cursor.execute('PRAGMA {0}'.format(name)).fetchone()[0]
+                      for name in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size')]
+        wrapper.close()
+        assert values == ['wal', 1, -2000, 268435456]
+
+    def test_closed_connections_are_reused_and_the_pool_is_bounded(self):
+        first = PooledSQLiteDatabaseWrapper(self.settings_dict, alias='pool-reuse')
+        second = PooledSQLiteDatabaseWrapper(self.settings_dict, alias='pool-reuse')
+        first.ensure_connection()
+        raw = first.connection
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        assert registry.get('db_pool_timeouts_total', alias='pool-reuse') == 1
+        first.close()
+        second.ensure_connection()
+        assert second.connection is raw
+        assert registry.get('db_pool_connections', alias='pool-reuse', state='in_use') == 1
+        second.close()
+        assert registry.get('db_pool_connections', alias='pool-reuse', state='idle') == 1
+        assert registry.get('db_pool_connections_created_total', alias='pool-reuse') == 1
+
+    def test_unhealthy_idle_connections_are_replaced(self):
+        now = [0.0]
+        created = []
+
+        def connect():
+            created.append(mock.Mock())
+            return created[-1]
+
+        def health_check(raw):
+            if raw is created[0]:
+                raise OperationalError('gone away')
+
+        pool = ConnectionPool(connect, alias='pool-health', max_size=1, health_check=health_check,
+                              health_check_interval=10, timer=lambda: now[0])
+        pool.release(pool.acquire())
+        now[0] += 5
+        assert pool.acquire() is created[0]
+        pool.release(created[0])
+        now[0] += 20
+        assert pool.acquire() is created[1]
+        assert created[0].close.called
+        assert registry.get('db_pool_health_check_failures_total', alias='pool-health') == 1
+
+
+class SQLiteReplicaHarness(object):
+    """
+    把 alias 注册为 path 上的 SQLite 副本, sync() 从测试主库整库复制
+    """
+
+    def __init__(self, path, alias='replica'):
+        self.path = path
+        self.alias = alias
+
+    def start(self):
+        connections.databases[self.alias] = dict(connections.databases['default'], NAME=self.path, TEST={})
+        connections.ensure_defaults(self.alias)
+        self.sync()
+
+    def sync(self):
+        sync_sqlite_replica(self.alias)
+
+    def stop(self):
+        connections[self.alias].close()
+        close_pools([self.alias])
+        del connections.databases[self.alias]
+        delattr(connections._connections, self.alias)
+
+
+class ReplicaRoutingTests(DroneDataMixin, APITransactionTestCase):
+    def setUp(self):
+        self.create_drone_data(1, 1)
+        self.replica = SQLiteReplicaHarness(
+            os.path.join(os.path.dirname(settings.THROTTLE_STORE['PATH']), 'replica.sqlite3'))
+        self.replica.start()
+        self.url = reverse('v1:' + views.DroneCategoryList.name)
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.replica.stop()
+        routers.end_request()
+
+    def category_names(self):
+        response = self.client.get(self.url, {'limit': 10}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        return [category['name'] for category in response.data['results']]
+
+    def test_safe_requests_read_from_the_replica(self):
+        DroneCategory.objects.create(name='Only on primary')
+        assert 'Only on primary' not in self.category_names()
+        self.replica.sync()
+        assert 'Only on primary' in self.category_names()
+
+    def test_reads_after_a_write_stay_on_the_primary_for_the_pin_window(self):
+        response = self.client.post(self.url, {'name': 'Written'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'Written' in self.category_names()
+        with mock.patch.object(signing, 'time', mock.Mock(time=lambda: time.time() + 60)):
+            assert 'Written' not in self.category_names()
+        self.client.cookies.pop(settings.REPLICA_ROUTING['COOKIE'])
+        assert 'Written' not in self.category_names()
+
+    def test_writes_pin_the_rest_of_the_request_to_the_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        routers.use_replica()
+        assert router.db_for_read(Drone) == 'replica'
+        assert router.db_for_write(Drone) == 'default'
+        assert router.db_for_read(Drone) is None
+        assert routers.pinned_to_primary()
+
+
+class CachedTokenAuthenticationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 1)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('v1:' + views.PilotList.name)
+        registry.reset()
+
+    def get_pilots(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, format='json')
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_repeated_requests_skip_the_token_query(self):
+        """
+        Ensure only the first request with a token queries authtoken_token
+        """
+        response, queries = self.get_pilots()
+        assert response.status_code == status.HTTP_200_OK
+        assert any('authtoken_token' in sql for sql in queries)
+        clear_response_cache()
+        response, queries = self.get_pilots()
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('authtoken_token' in sql for sql in queries)
+        assert registry.get('token_auth_cache_misses_total') == 1
+        assert registry.get('token_auth_cache_hits_total') == 1
+
+    def test_deleted_token_is_rejected_immediately(self):
+        assert self.get_pilots()[0].status_code == status.HTTP_200_OK
+        self.token.delete()
+        assert self.get_pilots()[0].status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        assert self.get_pilots()[0].status_code == status.HTTP_200_OK
+        self.user.is_active = False
+        self.user.save()
+        assert self.get_pilots()[0].status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_revocation_by_another_worker_is_seen(self):
+        """
+        Ensure a generation bumped by another process invalidates this process's cached entry
+        """
+        assert self.get_pilots()[0].status_code == status.HTTP_200_OK
+        clear_response_cache()
+        # 另一个 worker 删除了 Token: 本进程收不到信号, 只能看到共享存储中的代
+        Token.objects.filter(pk=self.token.pk)._raw_delete(connection.alias)
+        other_worker = SQLiteGenerationStore(settings.TOKEN_AUTH_CACHE['GENERATION_PATH'], ttl=300)
+        other_worker.bump([self.token.key])
+        assert self.get_pilots()[0].status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class CachedBasicAuthenticationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(1, 1)
+        self.url = reverse('v1:' + views.DroneList.name)
+        registry.reset()
+
+    def post_drone(self, name, password='pilot-password'):
+        credentials = base64.b64encode('pilot-owner:{0}'.format(password).encode('utf-8')).decode('ascii')
+        data = {'name': name, 'drone_category': self.categories[0].name,
+                'manufacturing_date': '2017-07-20T02:02:00.716312Z'}
+        return self.client.post(self.url, data, format='json', HTTP_AUTHORIZATION='Basic ' + credentials)
+
+    def test_verified_credentials_skip_the_hasher(self):
+        """
+        Ensure the password hasher runs once for repeated requests with the same credentials
+        """
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True,
+                               side_effect=PBKDF2PasswordHasher.verify) as verify:
+            for i in range(3):
+                assert self.post_drone('Basic {0}'.format(i)).status_code == status.HTTP_201_CREATED
+        assert verify.call_count == 1
+        assert registry.get('basic_auth_cache_hits_total') == 2
+        assert self.post_drone('Wrong', password='guess').status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_password_change_and_deactivation_invalidate(self):
+        assert self.post_drone('Before').status_code == status.HTTP_201_CREATED
+        self.user.set_password('new-password')
+        self.user.save()
+        assert self.post_drone('Old password').status_code == status.HTTP_401_UNAUTHORIZED
+        assert self.post_drone('New password', password='new-password').status_code == status.HTTP_201_CREATED
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        assert self.post_drone('Inactive', password='new-password').status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class AsgiApplicationTests(APITestCase):
+    def setUp(self):
+        from restful01 import asgi
+        self.asgi = asgi
+        self.loop = asyncio.new_event_loop()
+        registry.reset()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def request(self, app, path, headers=((b'accept', b'application/json'),), query_string=b''):
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string, 'http_version': '1.1',
+                 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+                 'headers': list(headers)}
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        self.loop.run_until_complete(app(scope, receive, send))
+        return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_unthrottled_root_runs_inline_and_lists_run_in_the_thread_pool(self):
+        """
+        Ensure an unthrottled anonymous API root is served on the event loop and DB views through the thread pool
+        """
+        with mock.patch.object(views_v2.ApiRootVersion2, 'throttle_classes', ()):
+            app = self.asgi.get_asgi_application()
+            status_code, body = self.request(app, reverse('v1:api-root'))
+            assert status_code == status.HTTP_200_OK
+            assert json.loads(body.decode())['vehicles'] == 'http://testserver' + reverse('v1:' + views.DroneList.name)
+            status_code, body = self.request(app, reverse('v1:' + views.DroneList.name))
+            assert status_code == status.HTTP_200_OK
+            assert json.loads(body.decode())['results'] == []
+            status_code, body = self.request(app, reverse('v1:api-root'),
+                                             [(b'accept', b'application/json'), (b'cookie', b'sessionid=x')])
+            assert status_code == status.HTTP_200_OK
+            assert registry.get('asgi_requests_total', mode='inline', status='200') == 1
+            assert registry.get('asgi_requests_total', mode='threadpool', status='200') == 2
+
+    def test_throttled_views_never_run_inline(self):
+        """
+        Ensure views whose throttles write to the SQLite store are kept off the event loop
+        """
+        inline_views = ('v1:api-root', 'v1:' + views.DroneCategoryList.name)
+        # the API root keeps the default throttles, so it goes through the thread pool as well
+        assert self.asgi.DjangoASGIHandler(inline_views=inline_views).get_inline_paths() == set()
+        app = self.asgi.get_asgi_application()
+        assert self.request(app, reverse('v1:api-root'))[0] == status.HTTP_200_OK
+        assert registry.get('asgi_requests_total', mode='threadpool', status='200') == 1
+        with mock.patch.object(views_v2.ApiRootVersion2, 'throttle_classes', ()):
+            handler = self.asgi.DjangoASGIHandler(inline_views=inline_views)
+            assert handler.get_inline_paths() == {reverse('v1:api-root')}
+
+    def test_streaming_response(self):
+        app = self.asgi.get_asgi_application()
+        status_code, body = self.request(app, reverse('v1:' + views.CompetitionExport.name), headers=(),
+                                         query_string=b'format=csv')
+        assert status_code == status.HTTP_200_OK
+        assert body.decode().splitlines() == ['pk,distance_in_feet,distance_achievement_date,pilot,drone']
+
+    def test_concurrency_limit(self):
+        app = self.asgi.ConcurrencyLimitMiddleware(self.asgi.DjangoASGIHandler(), max_pending=1)
+        app.pending = 1
+        assert self.request(app, reverse('v1:api-root')) == (503, b'Service Unavailable')
+        assert registry.get('asgi_rejected_total') == 1
+
+
+class CompetitionKeysetPaginationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        # 4 pilots x 5 competitions with distances 0..400, so every distance appears 4 times
+        self.create_drone_data(4, 5)
+
+    def get_all_pages(self, url):
+        pks = []
+        while url:
+            # only the page itself, no COUNT(*) or OFFSET
+            with self.assertNumQueries(1):
+                response = self.client.get(url, format='json')
+            assert response.status_code == status.HTTP_200_OK
+            pks.extend(result['pk'] for result in response.data['results'])
+            url = response.data['next']
+        return pks
+
+    def test_pages_follow_distance_and_pk_order(self):
+        """
+        Ensure walking the cursors returns every competition once in keyset order
+        """
+        url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionList.name), urlencode({'page_size': 3}))
+        expected = list(Competition.objects.order_by('-distance_in_feet', '-pk').values_list('pk', flat=True))
+        assert self.get_all_pages(url) == expected
+
+    def test_previous_link_returns_previous_page(self):
+        """
+        Ensure the previous cursor of a page returns the page before it
+        """
+        url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionList.name), urlencode({'page_size': 3}))
+        first_page = self.client.get(url, format='json').data
+        assert first_page['previous'] is None
+        second_page = self.client.get(first_page['next'], format='json').data
+        back = self.client.get(second_page['previous'], format='json').data
+        assert [result['pk'] for result in back['results']] == [result['pk'] for result in first_page['results']]
+        assert back['next'] is not None
+
+    def test_count_mode(self):
+        """
+        Ensure the count is only computed on request
+        """
+        url = reverse('v1:' + views.CompetitionList.name)
+        assert 'count' not in self.client.get(url, format='json').data
+        response = self.client.get('{0}?{1}'.format(url, urlencode({'count': 'exact'})), format='json')
+        assert response.data['count'] == 20
+
+    def test_invalid_cursor(self):
+        url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionList.name), urlencode({'cursor': 'broken'}))
+        response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_cursor_with_malformed_position(self):
+        """
+        Ensure a well-formed cursor whose values do not fit the ordering fields is rejected with 404
+        """
+        url = reverse('v1:' + views.CompetitionList.name)
+        for payload in ({'p': ['abc', 1]}, {'p': [100, None]}, {'p': [[1], 1]}, {'p': {'a': 1, 'b': 2}}):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+            response = self.client.get('{0}?{1}'.format(url, urlencode({'cursor': cursor})), format='json')
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class CountModePaginationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(1, 5)
+        self.url = reverse('v1:' + views.DroneList.name)
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('{0}?{1}'.format(self.url, urlencode(params)), format='json')
+        assert response.status_code == status.HTTP_200_OK
+        return response.data, [query['sql'] for query in queries.captured_queries]
+
+    def test_count_none_fetches_one_extra_row(self):
+        """
+        Ensure count=none skips COUNT(*) and still links to the next page
+        """
+        exact, exact_queries = self.get(limit=2, offset=2)
+        data, queries = self.get(limit=2, offset=2, count='none')
+        assert 'count' not in data
+        assert len(queries) == len(exact_queries) - 1
+        assert not any('__count' in sql for sql in queries)
+        assert [drone['name'] for drone in data['results']] == [drone['name'] for drone in exact['results']]
+        assert data['next'] == exact['next'].replace('?', '?count=none&')
+        last, queries = self.get(limit=2, offset=4, count='none')
+        assert last['next'] is None and len(last['results']) == 1
+
+    def test_count_estimate_is_cached_until_the_model_changes(self):
+        data, queries = self.get(limit=2, count='estimate', has_it_competed='true')
+        assert data['count'] == 5
+        data, queries = self.get(limit=2, offset=2, count='estimate', has_it_competed='true')
+        assert data['count'] == 5
+        assert not any('__count' in sql for sql in queries)
+        Drone.objects.filter(name='Drone 0').update(has_it_competed=False)
+        Drone.objects.get(name='Drone 1').save()
+        data, queries = self.get(limit=2, offset=2, count='estimate', has_it_competed='true')
+        assert data['count'] == 4
+
+    def test_cached_count_sees_writes_by_another_worker(self):
+        """
+        Ensure a cached count is recomputed after another process bumps the model's generation
+        """
+        data, queries = self.get(limit=2, count='estimate', has_it_competed='true')
+        assert data['count'] == 5
+        Drone.objects.filter(name='Drone 0').update(has_it_competed=False)
+        other_worker = SQLiteGenerationStore(settings.DRONES_RESPONSE_CACHE['GENERATION_PATH'],
+                                             table='model_generation')
+        other_worker.bump([model_label(Drone)])
+        data, queries = self.get(limit=2, offset=2, count='estimate', has_it_competed='true')
+        assert data['count'] == 4
+
+    def test_count_estimate_uses_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with self.settings(PAGINATION_COUNT={'EXACT_BELOW': 0}):
+            data, queries = self.get(count='estimate')
+        assert data['count'] == 5
+        assert any('sqlite_stat1' in sql for sql in queries)
+        assert not any('__count' in sql for sql in queries)
+
+
+class FieldSelectionTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 3)
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, view, **params):
+        params.setdefault('limit', 100)
+        url = '{0}?{1}'.format(reverse('v1:' + view.name), urlencode(params))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['results'], [query['sql'] for query in queries.captured_queries]
+
+    def test_fields_prune_output_and_columns(self):
+        """
+        Ensure ?fields= drops unselected fields and their columns and joins
+        """
+        results, queries = self.get(views.DroneList, fields='url,name')
+        assert [sorted(drone) for drone in results] == [['name', 'url']] * 6
+        select = [sql for sql in queries if 'FROM "drones_drone"' in sql and 'LIMIT' in sql]
+        assert len(select) == 1
+        assert '"manufacturing_date"' not in select[0] and 'JOIN' not in select[0]
+
+    def test_collapsed_and_pruned_nested_serializers(self):
+        """
+        Ensure unexpanded nested serializers become links and nested selections shrink the prefetch
+        """
+        results, queries = self.get(views.PilotList, fields='name,competitions', expand='')
+        assert results[0]['competitions']['results'][0].startswith('http://testserver/v1/competitions/')
+        assert not any('"drones_drone"' in sql for sql in queries)
+        results, queries = self.get(views.PilotList,
+                                    fields='name,competitions.distance_in_feet,competitions.drone.name')
+        assert dict(results[0]['competitions']['results'][0]['drone']) == {'name': 'Drone 2'}
+        assert sorted(results[0]['competitions']['results'][0]) == ['distance_in_feet', 'drone']
+        prefetch = [sql for sql in queries if sql.startswith('SELECT "drones_competition"')]
+        assert len(prefetch) == 1
+        assert '"distance_achievement_date"' not in prefetch[0] and '"auth_user"' not in prefetch[0]
+        full, queries = self.get(views.PilotList)
+        assert full[0]['competitions']['results'][0]['drone']['owner'] == self.user.username
+
+    def test_fields_skip_prefetch(self):
+        results, queries = self.get(views.DroneCategoryList, fields='name')
+        assert results[0] == {'name': 'Category 0'}
+        assert not any('"drones_drone"' in sql for sql in queries)
+
+    def test_fast_path_and_keyset_cursor(self):
+        """
+        Ensure the values fast path honours ?fields= and keyset cursors still work without their columns
+        """
+        with self.settings(FAST_READ_SERIALIZERS=True):
+            url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionList.name), urlencode({'fields': 'pilot',
+                                                                                        'page_size': 4}))
+            response = self.client.get(url, format='json')
+            assert [sorted(row) for row in response.data['results']] == [['pilot']] * 4
+            response = self.client.get(response.data['next'], format='json')
+        assert len(response.data['results']) == 2
+        results, queries = self.get(views.CompetitionList, fields='pilot', page_size=4)
+        assert [sorted(row) for row in results] == [['pilot']] * 4
+
+
+@override_settings(NESTED_RELATION_LIMIT=2)
+class BoundedRelationTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 5)
+        self.client.force_authenticate(user=self.user)
+
+    def test_category_drones_are_capped(self):
+        """
+        Ensure categories embed a drone count, the first drone links and a link to the filtered drone list
+        """
+        url = '{0}?limit=10'.format(reverse('v1:' + views.DroneCategoryList.name))
+        response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        category = response.data['results'][0]
+        drones = Drone.objects.filter(drone_category=self.categories[0])
+        assert category['drones']['count'] == drones.count() == 6
+        assert category['drones']['results'] == [
+            'http://testserver{0}'.format(reverse('v1:' + views.DroneDetail.name, None, {drone.pk}))
+            for drone in drones[:2]]
+        following = self.client.get(category['drones']['next'], format='json').data
+        assert [drone['name'] for drone in following['results']] == [drone.name for drone in drones[2:4]]
+
+    def test_pilot_competitions_link_to_the_next_keyset_page(self):
+        url = reverse('v1:' + views.PilotDetail.name, None, {Pilot.objects.order_by('pk').first().pk})
+        competitions = self.client.get(url, format='json').data['competitions']
+        assert competitions['count'] == 5 and len(competitions['results']) == 2
+        following = self.client.get(competitions['next'], format='json').data
+        expected = Competition.objects.filter(pilot__name='Pilot 0').order_by('-distance_in_feet', '-pk')[2:4]
+        assert [row['pk'] for row in following['results']] == [competition.pk for competition in expected]
+
+    def test_windowed_pks(self):
+        """
+        Ensure windowed_pks returns the first rows of every group in a single query
+        """
+        queryset = Competition.objects.all()
+        pilots = list(Pilot.objects.order_by('pk').values_list('pk', flat=True))
+        with self.assertNumQueries(1):
+            pks = windowed_pks(queryset, 'pilot', pilots, ('-distance_in_feet', '-pk'), 3)
+        expected = [pk for pilot in pilots for pk in queryset.filter(pilot=pilot).order_by(
+            '-distance_in_feet', '-pk').values_list('pk', flat=True)[:3]]
+        assert pks == expected
+        assert windowed_pks(queryset, 'pilot', pilots, ('-pk',), 1, branches=2) == [
+            queryset.filter(pilot=pilot).order_by('-pk').first().pk for pilot in pilots]
+
+
+class CompetitionNameFilterTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 2)
+        self.url = reverse('v1:' + views.CompetitionList.name)
+
+    def test_filter_by_names(self):
+        """
+        Ensure drone_name and pilot_name filter with an indexed lookup instead of SELECT DISTINCT
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '{0}?{1}'.format(self.url, urlencode({'pilot_name': 'Pilot 1', 'drone_name': 'Drone 3'})),
+                format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert [result['pilot'] for result in response.data['results']] == ['Pilot 1']
+        assert [result['drone'] for result in response.data['results']] == ['Drone 3']
+        assert not any('DISTINCT' in query['sql'] for query in queries.captured_queries)
+
+    def test_unknown_name_returns_no_results(self):
+        url = '{0}?{1}'.format(self.url, urlencode({'pilot_name': 'Nobody'}))
+        response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == []
+
+    def test_browsable_api_does_not_list_names(self):
+        """
+        Ensure rendering the filter form does not load every name
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('DISTINCT' in query['sql'] for query in queries.captured_queries)
+
+
+class FastJSONTests(DroneDataMixin, APITestCase):
+    def test_every_backend_matches_drf(self):
+        """
+        Ensure every JSON backend renders native datetimes like DRF renders ISO 8601 strings, and parses them back
+        """
+        now = timezone.now()
+        data = {'pilot': '驾驶员\u2028', 'date': now, 'day': now.date(), 'distance': 1.5, 1: None}
+        expected = JSONRenderer().render(dict(data, date=now.isoformat().replace('+00:00', 'Z'),
+                                              day=now.date().isoformat()))
+        for backend in get_available_json_backends():
+            renderer, parser = FastJSONRenderer(), FastJSONParser()
+            renderer.backend = parser.backend = backend
+            assert renderer.render(data) == expected
+            assert parser.parse(io.BytesIO(expected)) == json.loads(expected.decode('utf-8'))
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(b'{"pilot": '))
+
+    def test_responses_and_benchmark(self):
+        self.create_drone_data(1, 2)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('v1:' + views.CompetitionList.name), format='json')
+        assert response.status_code == status.HTTP_200_OK
+        achieved = response.json()['results'][0]['distance_achievement_date']
+        assert achieved == Competition.objects.get(pk=response.json()['results'][0]['pk']).distance_achievement_date \
+            .isoformat().replace('+00:00', 'Z')
+        out = io.StringIO()
+        call_command('bench_json', rows=20, repeat=1, stdout=out)
+        assert 'PilotSerializer' in out.getvalue()
+
+
+class BinaryFormatTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(1, 2)
+        self.client.force_authenticate(user=self.user)
+
+    @skipUnless('MessagePack' in settings.BINARY_FORMATS, 'msgpack is not installed')
+    def test_messagepack(self):
+        """
+        Ensure generic and function views negotiate MessagePack with native timestamps both ways
+        """
+        import msgpack
+        response = self.client.get(reverse('v1:' + views.CompetitionList.name), HTTP_ACCEPT='application/msgpack')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/msgpack'
+        competition = msgpack.unpackb(response.content, timestamp=3)['results'][0]
+        assert competition['distance_achievement_date'] == Competition.objects.get(
+            pk=competition['pk']).distance_achievement_date
+        release_date = timezone.now()
+        content = msgpack.packb({'name': '玩具', 'description': '', 'toy_category': 'Dolls',
+                                 'was_included_in_home': True, 'release_date': release_date}, datetime=True)
+        response = self.client.post('/toys/', content, content_type='application/msgpack',
+                                    HTTP_ACCEPT='application/msgpack')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert msgpack.unpackb(response.content, timestamp=3)['release_date'] == release_date
+        assert Toy.objects.get(name='玩具').release_date == release_date
+        response = self.client.post('/toys/', b'\xc1', content_type='application/msgpack')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @skipUnless('CBOR' in settings.BINARY_FORMATS, 'cbor2 is not installed')
+    def test_cbor(self):
+        import cbor2
+        toy = Toy.objects.create(name='Toy', toy_category='Dolls', release_date=timezone.now())
+        response = self.client.get('/toys/{0}?format=cbor'.format(toy.pk))
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/cbor'
+        assert cbor2.loads(response.content)['release_date'] == toy.release_date
+        url = reverse('v1:' + views.DroneDetail.name, None, {Drone.objects.first().pk})
+        response = self.client.patch(url, cbor2.dumps({'name': 'Renamed drone'}), content_type='application/cbor')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['name'] == 'Renamed drone'
+        response = self.client.patch(url, b'\xa1', content_type='application/cbor')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class LeaderboardTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 3)
+
+    def expected(self, key):
+        return {row[key]: leaderboard.entry_values(row) for row in leaderboard.aggregate_competitions(key)}
+
+    def actual(self, entry_model):
+        return {entry.pk: {'best_distance_in_feet': entry.best_distance_in_feet,
+                           'competitions_count': entry.competitions_count,
+                           'last_achievement_date': entry.last_achievement_date}
+                for entry in entry_model.objects.all()}
+
+    def assert_consistent(self):
+        assert self.actual(PilotLeaderboardEntry) == self.expected('pilot')
+        assert self.actual(DroneLeaderboardEntry) == self.expected('drone')
+
+    def test_entries_follow_competition_writes(self):
+        """
+        Ensure create, update, reassignment and delete keep the leaderboards equal to the aggregates
+        """
+        self.assert_consistent()
+        pilot = Pilot.objects.get(name='Pilot 0')
+        assert pilot.leaderboard_entry.best_distance_in_feet == 200
+        assert pilot.leaderboard_entry.competitions_count == 3
+        best = Competition.objects.get(pilot=pilot, distance_in_feet=200)
+        best.distance_in_feet = 50
+        best.save()
+        self.assert_consistent()
+        assert PilotLeaderboardEntry.objects.get(pk=pilot.pk).best_distance_in_feet == 100
+        best.pilot = Pilot.objects.get(name='Pilot 1')
+        best.save()
+        self.assert_consistent()
+        Competition.objects.filter(pilot=pilot).delete()
+        self.assert_consistent()
+        assert not PilotLeaderboardEntry.objects.filter(pk=pilot.pk).exists()
+        Pilot.objects.get(name='Pilot 2').delete()
+        self.assert_consistent()
+
+    def test_cascading_deletes_are_batched(self):
+        """
+        Ensure deleting a pilot, drone or category maintains counters and leaderboards in a fixed number of queries
+        """
+        drones = list(Drone.objects.order_by('pk'))
+        pilots = list(Pilot.objects.order_by('pk'))
+        for pilot, count in ((pilots[0], 2), (pilots[1], 20)):
+            for i in range(count):
+                Competition.objects.create(pilot=pilot, drone=drones[i % len(drones)], distance_in_feet=1000 + i,
+                                           distance_achievement_date=timezone.now())
+        with CaptureQueriesContext(connection) as few:
+            pilots[0].delete()
+        with CaptureQueriesContext(connection) as many:
+            pilots[1].delete()
+        assert len(many.captured_queries) == len(few.captured_queries)
+        self.assert_consistent()
+        Competition.objects.create(pilot=pilots[2], drone=drones[0], distance_in_feet=3000,
+                                   distance_achievement_date=timezone.now())
+        self.categories[0].delete()
+        self.assert_consistent()
+        for pilot in Pilot.objects.all():
+            assert pilot.races_count == pilot.competitions.count()
+        for drone in Drone.objects.all():
+            assert drone.has_it_competed == Competition.objects.filter(drone=drone).exists()
+
+    def test_cached_page_does_not_outlive_entry_updates(self):
+        """
+        Ensure a leaderboard page cached between the competition write and the entry update is invalidated
+        """
+        url = reverse('v1:' + views.PilotLeaderboard.name)
+        competition_added = leaderboard.competition_added
+
+        def read_then_update(competition):
+            # 比赛与驾驶员的代已更换, 条目还是旧的
+            self.client.get(url, format='json')
+            competition_added(competition)
+
+        with mock.patch.object(leaderboard, 'competition_added', read_then_update):
+            Competition.objects.create(pilot=Pilot.objects.get(name='Pilot 2'), drone=Drone.objects.get(name='Drone 0'),
+                                       distance_in_feet=5000, distance_achievement_date=timezone.now())
+        first = self.client.get(url, format='json').data['results'][0]
+        assert (first['pilot'], first['best_distance_in_feet']) == ('Pilot 2', 5000)
+
+    def test_bulk_create_updates_entries(self):
+        self.client.force_authenticate(user=self.user)
+        items = [{'distance_in_feet': 1000 + i, 'distance_achievement_date': '2017-10-20T05:03:20.776594Z',
+                  'pilot': 'Pilot 1', 'drone': 'Drone 0'} for i in range(3)]
+        response = self.client.post(reverse('v1:' + views.CompetitionList.name), items, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        self.assert_consistent()
+        assert DroneLeaderboardEntry.objects.get(drone__name='Drone 0').competitions_count == 4
+
+    def test_rebuild_command(self):
+        PilotLeaderboardEntry.objects.update(best_distance_in_feet=0, competitions_count=0)
+        DroneLeaderboardEntry.objects.all().delete()
+        call_command('rebuild_leaderboard', stdout=io.StringIO())
+        self.assert_consistent()
+
+    def test_leaderboard_pages(self):
+        """
+        Ensure a leaderboard page is a single query and the pages follow the best distance order
+        """
+        url = '{0}?{1}'.format(reverse('v1:' + views.DroneLeaderboard.name), urlencode({'page_size': 4}))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        distances = [result['best_distance_in_feet'] for result in response.data['results']]
+        response = self.client.get(response.data['next'], format='json')
+        distances.extend(result['best_distance_in_feet'] for result in response.data['results'])
+        response = self.client.get(response.data['next'], format='json')
+        distances.extend(result['best_distance_in_feet'] for result in response.data['results'])
+        assert response.data['next'] is None
+        assert distances == sorted(Competition.objects.values_list('distance_in_feet', flat=True), reverse=True)
+        response = self.client.get(reverse('v1:' + views.PilotLeaderboard.name), format='json')
+        first = response.data['results'][0]
+        assert first['best_distance_in_feet'] == 200
+        assert first['competitions_count'] == 3
+        assert first['pilot_url'].endswith(reverse('v1:' + views.PilotDetail.name,
+                                                   kwargs={'pk': Pilot.objects.get(name=first['pilot']).pk}))
+
+
+class CompetitionCounterTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 3)
+        self.client.force_authenticate(user=self.user)
+
+    def assert_counters(self):
+        for pilot in Pilot.objects.all():
+            assert pilot.races_count == pilot.competitions.count()
+        for drone in Drone.objects.all():
+            assert drone.has_it_competed == Competition.objects.filter(drone=drone).exists()
+
+    def test_counters_follow_competitions(self):
+        """
+        Ensure races_count and has_it_competed follow competition create, reassignment and delete
+        """
+        pilot = Pilot.objects.get(name='Pilot 0')
+        assert pilot.races_count == 3
+        idle = Drone.objects.create(name='Idle', drone_category=self.categories[0], owner=self.user,
+                                    manufacturing_date=timezone.now())
+        assert not idle.has_it_competed
+        competition = Competition.objects.filter(pilot=pilot).first()
+        old_drone = competition.drone
+        competition.pilot = Pilot.objects.get(name='Pilot 1')
+        competition.drone = idle
+        competition.save()
+        assert Pilot.objects.get(pk=pilot.pk).races_count == 2
+        assert Pilot.objects.get(name='Pilot 1').races_count == 4
+        assert Drone.objects.get(pk=idle.pk).has_it_competed
+        assert not Drone.objects.get(pk=old_drone.pk).has_it_competed
+        competition.delete()
+        assert not Drone.objects.get(pk=idle.pk).has_it_competed
+        self.assert_counters()
+
+    def test_bulk_create_increments_counters(self):
+        items = [{'distance_in_feet': i, 'distance_achievement_date': '2017-10-20T05:03:20.776594Z',
+                  'pilot': 'Pilot {0}'.format(i % 2), 'drone': 'Drone 0'} for i in range(5)]
+        response = self.client.post(reverse('v1:' + views.CompetitionList.name), items, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Pilot.objects.get(name='Pilot 0').races_count == 6
+        assert Pilot.objects.get(name='Pilot 1').races_count == 5
+        self.assert_counters()
+
+    def test_counters_are_read_only(self):
+        response = self.client.post(reverse('v1:' + views.PilotList.name),
+                                    {'name': 'New Pilot', 'gender': 'F', 'races_count': 10}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['races_count'] == 0
+        drone = Drone.objects.get(name='Drone 0')
+        response = self.client.patch(reverse('v1:' + views.DroneDetail.name, kwargs={'pk': drone.pk}),
+                                     {'has_it_competed': False}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert Drone.objects.get(pk=drone.pk).has_it_competed
+
+    def test_update_does_not_overwrite_concurrent_counters(self):
+        """
+        Ensure PUT/PATCH on pilots and drones only write the submitted columns
+        """
+        pilot = Pilot.objects.get(name='Pilot 0')
+        drone = Drone.objects.get(name='Drone 0')
+        get_object = generics.GenericAPIView.get_object
+
+        def get_object_then_compete(view):
+            instance = get_object(view)
+            # get_object() 之后另一个请求新增了比赛
+            Competition.objects.create(pilot=pilot, drone=Drone.objects.get(name='Drone 1'), distance_in_feet=1,
+                                       distance_achievement_date=timezone.now())
+            Drone.objects.filter(pk=drone.pk).update(has_it_competed=False)
+            return instance
+
+        with mock.patch.object(generics.GenericAPIView, 'get_object', get_object_then_compete):
+            response = self.client.patch(reverse('v1:' + views.PilotDetail.name, kwargs={'pk': pilot.pk}),
+                                         {'name': 'Renamed pilot'}, format='json')
+            assert response.status_code == status.HTTP_200_OK
+            response = self.client.put(reverse('v1:' + views.DroneDetail.name, kwargs={'pk': drone.pk}),
+                                       {'name': 'Renamed drone', 'drone_category': self.categories[1].name,
+                                        'manufacturing_date': '2017-10-20T05:03:20.776594Z'}, format='json')
+            assert response.status_code == status.HTTP_200_OK
+        pilot.refresh_from_db()
+        assert (pilot.name, pilot.races_count) == ('Renamed pilot', 5)
+        drone.refresh_from_db()
+        assert (drone.name, drone.drone_category, drone.has_it_competed) == (
+            'Renamed drone', self.categories[1], False)
+
+    def test_reconcile_command(self):
+        Pilot.objects.update(races_count=42)
+        Drone.objects.update(has_it_competed=False)
+        Drone.objects.create(name='Idle', drone_category=self.categories[0], owner=self.user,
+                             manufacturing_date=timezone.now(), has_it_competed=True)
+        out = io.StringIO()
+        call_command('reconcile_counters', chunk_size=2, stdout=out)
+        assert out.getvalue().strip() == 'Pilots fixed: 2, drones fixed: 7'
+        self.assert_counters()
+
+
+class ResponseCacheCommitTests(APITransactionTestCase):
+    def test_generation_is_bumped_again_after_commit(self):
+        """
+        Ensure a response cached while the write was uncommitted is invalidated by the commit
+        """
+        with transaction.atomic():
+            DroneCategory.objects.create(name='Uncommitted')
+            # 其他连接此时读到的是提交前的数据, 以这个代缓存
+            during = get_generations([DroneCategory])
+        assert get_generations([DroneCategory]) != during
+
+
+class ResponseCacheTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 2)
+
+    def test_repeated_get_is_served_from_cache(self):
+        """
+        Ensure an unchanged list is served without touching the database
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        first = self.client.get(url, format='json')
+        with self.assertNumQueries(0):
+            second = self.client.get(url, format='json')
+        assert second.data == first.data
+
+    def test_cache_key_includes_query_params(self):
+        url = reverse('v1:' + views.DroneList.name)
+        first = self.client.get('{0}?{1}'.format(url, urlencode({'limit': 1})), format='json')
+        second = self.client.get('{0}?{1}'.format(url, urlencode({'limit': 4})), format='json')
+        assert len(first.data['results']) == 1
+        assert len(second.data['results']) == 4
+
+    def test_drone_rename_invalidates_dependent_payloads(self):
+        """
+        Ensure renaming a drone refreshes the cached category and competition payloads
+        """
+        drone = Competition.objects.order_by('-distance_in_feet', '-pk').first().drone
+        category_url = reverse('v1:' + views.DroneCategoryDetail.name, None, {drone.drone_category.pk})
+        competitions_url = reverse('v1:' + views.CompetitionList.name)
+        category_before = self.client.get(category_url, format='json').data
+        competitions_before = self.client.get(competitions_url, format='json').data
+        assert competitions_before['results'][0]['drone'] == drone.name
+        drone.name = 'Renamed Drone'
+        drone.save()
+        assert self.client.get(competitions_url, format='json').data['results'][0]['drone'] == 'Renamed Drone'
+        Drone.objects.create(name='New Drone', drone_category=drone.drone_category, owner=self.user,
+                             manufacturing_date=timezone.now())
+        category_after = self.client.get(category_url, format='json').data
+        assert category_after['drones']['count'] == category_before['drones']['count'] + 1
+
+    def test_write_by_another_worker_invalidates_payloads(self):
+        """
+        Ensure a generation bumped by another process is seen by this worker's cache
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        drone = Drone.objects.order_by('name').first()
+        assert self.client.get(url, format='json').data['results'][0]['name'] == drone.name
+        # another worker renames the drone; its bump reaches this process only through the shared store
+        Drone.objects.filter(pk=drone.pk).update(name='0 Renamed Elsewhere')
+        other_worker = SQLiteGenerationStore(settings.DRONES_RESPONSE_CACHE['GENERATION_PATH'],
+                                             table='model_generation')
+        other_worker.bump([model_label(Drone)])
+        assert self.client.get(url, format='json').data['results'][0]['name'] == '0 Renamed Elsewhere'
+
+    def test_lru_eviction_and_ttl(self):
+        now = [0]
+        lru = LRUCache(max_entries=2, ttl=10, timer=lambda: now[0])
+        lru.set('a', 1)
+        lru.set('b', 2)
+        assert lru.get('a') == 1
+        lru.set('c', 3)
+        assert 'b' not in lru
+        assert lru.get('a') == 1
+        now[0] = 11
+        assert lru.get('a') is None
+
+
+class ConditionalGetTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 2)
+
+    def test_list_not_modified(self):
+        """
+        Ensure a list returns 304 for a matching ETag until a dependency changes
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        response = self.client.get(url, format='json')
+        etag = response['ETag']
+        assert response.has_header('Last-Modified')
+        not_modified = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified['ETag'] == etag
+        category = DroneCategory.objects.first()
+        category.name = 'Renamed Category'
+        category.save()
+        modified = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        assert modified.status_code == status.HTTP_200_OK
+        assert modified['ETag'] != etag
+
+    def test_revalidation_does_not_query(self):
+        """
+        Ensure a matching ETag is answered from the generations alone
+        """
+        url = reverse('v1:' + views.CompetitionList.name)
+        etag = self.client.get(url, format='json')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_validators_describe_the_body_they_are_sent_with(self):
+        """
+        Ensure a write by another worker never pairs a new ETag with a previously cached body
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        drone = Drone.objects.order_by('name').first()
+        first = self.client.get(url, format='json')
+        Drone.objects.filter(pk=drone.pk).update(name='0 Renamed Elsewhere')
+        other_worker = SQLiteGenerationStore(settings.DRONES_RESPONSE_CACHE['GENERATION_PATH'],
+                                             table='model_generation')
+        other_worker.bump([model_label(Drone)])
+        second = self.client.get(url, format='json')
+        assert second['ETag'] != first['ETag']
+        assert second.data['results'][0]['name'] == '0 Renamed Elsewhere'
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=second['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'][0]['name'] == '0 Renamed Elsewhere'
+
+    def test_owner_rename_changes_validators(self):
+        """
+        Ensure models without updated_at (auth.User) still change the ETag and Last-Modified
+        """
+        url = reverse('v1:' + views.DroneDetail.name, None, {Drone.objects.first().pk})
+        response = self.client.get(url, format='json')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        # Last-Modified 精确到秒
+        with mock.patch.object(get_generation_store(), 'timer', return_value=time.time() + 2):
+            self.user.username = 'renamed-owner'
+            self.user.save()
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['owner'] == 'renamed-owner'
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_delete_changes_etag(self):
+        url = reverse('v1:' + views.CompetitionList.name)
+        etag = self.client.get(url, format='json')['ETag']
+        Competition.objects.order_by('pk').first().delete()
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_detail_if_modified_since(self):
+        """
+        Ensure a detail returns 304 when not modified since Last-Modified
+        """
+        drone = Drone.objects.first()
+        url = reverse('v1:' + views.DroneDetail.name, None, {drone.pk})
+        last_modified = self.client.get(url, format='json')['Last-Modified']
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        missing = reverse('v1:' + views.DroneDetail.name, None, {drone.pk + 1000})
+        assert self.client.get(missing, format='json').status_code == status.HTTP_404_NOT_FOUND
+
+
+class BulkCreateTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(2, 2)
+        self.client.force_authenticate(user=self.user)
+        self.pilots = list(Pilot.objects.values_list('name', flat=True))
+        self.drones = list(Drone.objects.values_list('name', flat=True))
+
+    def competitions(self, count):
+        return [{'distance_in_feet': 10 * i, 'distance_achievement_date': '2017-10-20T05:03:20.776594Z',
+                 'pilot': self.pilots[i % len(self.pilots)], 'drone': self.drones[i % len(self.drones)]}
+                for i in range(count)]
+
+    def post_competitions(self, items):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('v1:' + views.CompetitionList.name), items, format='json')
+        return response, len(context)
+
+    def test_bulk_create_competitions_in_constant_queries(self):
+        """
+        Ensure a JSON array of competitions is inserted with a query count independent of its size
+        """
+        before = Competition.objects.count()
+        response, small_queries = self.post_competitions(self.competitions(5))
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == {'count': 5}
+        response, large_queries = self.post_competitions(self.competitions(60))
+        assert response.status_code == status.HTTP_201_CREATED
+        assert large_queries == small_queries
+        assert Competition.objects.count() == before + 65
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """
+        Ensure invalid items are reported by index and nothing is inserted
+        """
+        items = self.competitions(3)
+        items[1]['pilot'] = 'Unknown Pilot'
+        items[2]['distance_in_feet'] = 'far'
+        before = Competition.objects.count()
+        response, queries = self.post_competitions(items)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [error['index'] for error in response.data['errors']] == [1, 2]
+        assert 'pilot' in response.data['errors'][0]['errors']
+        assert Competition.objects.count() == before
+
+    def test_bulk_create_ndjson(self):
+        body = '\n'.join(json.dumps(item) for item in self.competitions(4))
+        response = self.client.post(reverse('v1:' + views.CompetitionList.name), body,
+                                    content_type='application/x-ndjson')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['count'] == 4
+
+    def test_bulk_create_drones_checks_unique_names(self):
+        """
+        Ensure drone names are checked against the table and within the batch
+        """
+        url = reverse('v1:' + views.DroneList.name)
+        drone = {'drone_category': self.categories[0].name, 'manufacturing_date': '2017-07-20T02:02:00.716312Z',
+                 'has_it_competed': False}
+        items = [dict(drone, name='Bulk 1'), dict(drone, name='Bulk 1'), dict(drone, name=self.drones[0])]
+        response = self.client.post(url, items, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [error['index'] for error in response.data['errors']] == [1, 2]
+        response = self.client.post(url, [dict(drone, name='Bulk 1'), dict(drone, name='Bulk 2')], format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Drone.objects.get(name='Bulk 2').owner == self.user
+
+
+class CompetitionExportTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 4)
+
+    def export(self, **params):
+        url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionExport.name), urlencode(params))
+        response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_export_ndjson_in_chunks(self):
+        """
+        Ensure every competition is streamed once, in keyset order, across chunks
+        """
+        with mock.patch.object(views.CompetitionExport, 'chunk_size', 5):
+            response, content = self.export()
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        expected = list(Competition.objects.order_by('-distance_in_feet', '-pk').values_list('pk', flat=True))
+        assert [row['pk'] for row in rows] == expected
+        assert set(rows[0]) == {'pk', 'distance_in_feet', 'distance_achievement_date', 'pilot', 'drone'}
+
+    def test_export_csv_honors_filters(self):
+        """
+        Ensure the CompetitionFilter parameters apply to the export
+        """
+        pilot = Pilot.objects.order_by('name').first()
+        response, content = self.export(format='csv', pilot_name=pilot.name, min_distance_in_feet=100)
+        assert response['Content-Type'].startswith('text/csv')
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows[0] == ['pk', 'distance_in_feet', 'distance_achievement_date', 'pilot', 'drone']
+        assert len(rows) - 1 == pilot.competitions.filter(distance_in_feet__gte=100).count()
+        assert all(row[3] == pilot.name for row in rows[1:])
+
+
+class FastReadSerializerTests(DroneDataMixin, APITestCase):
+    def setUp(self):
+        self.create_drone_data(3, 3)
+
+    def get_both(self, url):
+        with self.settings(FAST_READ_SERIALIZERS=False):
+            expected = self.client.get(url, format='json')
+        clear_response_cache()
+        with self.settings(FAST_READ_SERIALIZERS=True):
+            actual = self.client.get(url, format='json')
+        assert actual.status_code == expected.status_code == status.HTTP_200_OK
+        return json.loads(actual.content.decode()), json.loads(expected.content.decode())
+
+    def test_drone_list_matches_serializer(self):
+        """
+        Ensure the values() fast path renders exactly what DroneSerializer renders
+        """
+        url = '{0}?{1}'.format(reverse('v1:' + views.DroneList.name), urlencode({'limit': 100}))
+        actual, expected = self.get_both(url)
+        assert actual == expected
+        assert len(actual['results']) == 9
+
+    def test_competition_list_matches_serializer(self):
+        url = '{0}?{1}'.format(reverse('v1:' + views.CompetitionList.name), urlencode({'page_size': 4}))
+        actual, expected = self.get_both(url)
+        assert actual == expected
+        actual, expected = self.get_both(expected['next'])
+        assert actual == expected
+
+    def test_toy_list_matches_serializer(self):
+        for i in range(3):
+            Toy.objects.create(name='Toy {0}'.format(i), toy_category='Dolls', release_date=timezone.now())
+        actual, expected = self.get_both('/toys/')
+        assert actual == expected
+        assert len(actual) == 3
+
+
+class ExplainFiltersTests(APITestCase):
+    def test_no_full_table_scans(self):
+        """
+        Ensure every declared filter/ordering combination is served by an index
+        """
+        out = io.StringIO()
+        call_command('explain_filters', stdout=out, stderr=io.StringIO())
+        assert 'No full table scans.' in out.getvalue()
+
+
+
+class SeedCommandTests(APITestCase):
+    def seed(self, prefix, **options):
+        call_command('seed', prefix=prefix, seed=7, categories=3, users=2, drones=40, pilots=20, competitions=400,
+                     toys=5, stdout=io.StringIO(), **options)
+        return [(competition.pilot.name.split(' ', 1)[1], competition.drone.name.split(' ', 1)[1],
+                 competition.distance_in_feet, competition.distance_achievement_date)
+                for competition in Competition.objects.filter(pilot__name__startswith=prefix + ' ')
+                .select_related('pilot', 'drone').order_by('pk')]
+
+    def test_same_seed_generates_the_same_rows(self):
+        assert self.seed('first') == self.seed('second')
+        assert Toy.objects.filter(name__startswith='first ').count() == 5
+
+    def test_overlapping_prefixes_do_not_mix(self):
+        """
+        Ensure a prefix that starts another prefix only links to its own rows, and reusing a prefix fails
+        """
+        self.seed('run 2')
+        self.seed('run')
+        assert not Competition.objects.filter(pilot__name__startswith='run pilot').exclude(
+            drone__name__startswith='run drone').exists()
+        assert not Drone.objects.filter(name__startswith='run drone').exclude(
+            drone_category__name__startswith='run category').exists()
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        assert out.getvalue().strip() == 'Pilots fixed: 0, drones fixed: 0'
+        with self.assertRaises(CommandError):
+            self.seed('run')
+
+    def test_counters_and_skew(self):
+        self.seed('skewed')
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        assert out.getvalue().strip() == 'Pilots fixed: 0, drones fixed: 0'
+        counts = sorted(Pilot.objects.annotate(n=Count('competitions')).values_list('n', flat=True), reverse=True)
+        assert sum(counts) == 400
+        # Zipf 1.1: 最热门的驾驶员远多于平均的 20 场
+        assert counts[0] > 80
+        assert PilotLeaderboardEntry.objects.count() == len([n for n in counts if n])
+
+
+class BenchRoutesTests(DroneDataMixin, APITestCase):
+    def test_every_route_is_measured_and_compared_to_the_baseline(self):
+        """
+        Ensure the route benchmark covers drones and toys routes, writes JSON and fails on regressions
+        """
+        self.create_drone_data(2, 2)
+        Toy.objects.create(name='Bench toy', toy_category='bench', release_date=timezone.now())
+        output = os.path.join(os.path.dirname(settings.THROTTLE_STORE['PATH']), 'bench.json')
+        call_command('bench_routes', mode='inprocess', requests=3, output=output, stdout=io.StringIO())
+        with open(output) as results_file:
+            results = json.load(results_file)
+        assert {'toys/', 'toys/{pk}', 'v1/vehicles/{pk}', 'v1/pilots/', 'v1/competitions/export/'} <= set(
+            results['routes'])
+        assert all(modes['inprocess']['errors'] == 0 for modes in results['routes'].values())
+        for modes in results['routes'].values():
+            modes['inprocess'].update(p95_ms=0.001, requests_per_second=1e9)
+        with open(output, 'w') as baseline_file:
+            json.dump(results, baseline_file)
+        with self.assertRaises(CommandError):
+            call_command('bench_routes', mode='inprocess', requests=3, routes='toys/', baseline=output,
+                         stdout=io.StringIO())
+
+    def test_new_errors_fail_and_route_changes_are_listed(self):
+        measurement = {'p95_ms': 1.0, 'requests_per_second': 100.0, 'errors': 0}
+        baseline = {'routes': {'toys/': {'inprocess': measurement}, 'v1/': {'inprocess': measurement}}}
+        results = {'routes': {'toys/': {'inprocess': dict(measurement, errors=3)},
+                              'v1/pilots/': {'inprocess': measurement}}}
+        assert compare(results, baseline, 0.2) == ['toys/ [inprocess] 3 errors > baseline 0']
+        assert compare_routes(results, baseline) == (['v1/pilots/ [inprocess]'], ['v1/ [inprocess]'])
+
+
 """
 pip install pytest
 pip install pytest-django
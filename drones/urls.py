@@ -14,7 +14,10 @@ urlpatterns = [
     url(r'^pilots/$', views.PilotList.as_view(), name=views.PilotList.name),
     url(r'^pilots/(?P<pk>[0-9]+)$', views.PilotDetail.as_view(), name=views.PilotDetail.name),
     url(r'^competitions/$', views.CompetitionList.as_view(), name=views.CompetitionList.name),
+    url(r'^competitions/export/$', views.CompetitionExport.as_view(), name=views.CompetitionExport.name),
     url(r'^competitions/(?P<pk>[0-9]+)$', views.CompetitionDetail.as_view(), name=views.CompetitionDetail.name),
+    url(r'^leaderboard/pilots/$', views.PilotLeaderboard.as_view(), name=views.PilotLeaderboard.name),
+    url(r'^leaderboard/vehicles/$', views.DroneLeaderboard.as_view(), name=views.DroneLeaderboard.name),
 
     url(r'^$', views_v2.ApiRootVersion2.as_view(), name=views_v2.ApiRootVersion2.name),
 
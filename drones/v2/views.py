@@ -6,6 +6,7 @@ from drones import views
 
 class ApiRootVersion2(generics.GenericAPIView):
     name = 'api-root'
+    query_budget = 2
 
     def get(self, request, *args, **kwargs):
         return Response(
@@ -13,7 +14,9 @@ class ApiRootVersion2(generics.GenericAPIView):
                 'vehicle-categories': reverse(views.DroneCategoryList.name, request=request),
                 'vehicles': reverse(views.DroneList.name, request=request),
                 'pilots': reverse(views.PilotList.name, request=request),
-                'competitions': reverse(views.CompetitionList.name, request=request)
+                'competitions': reverse(views.CompetitionList.name, request=request),
+                'pilot-leaderboard': reverse(views.PilotLeaderboard.name, request=request),
+                'vehicle-leaderboard': reverse(views.DroneLeaderboard.name, request=request),
 
             }
         )
@@ -1,22 +1,43 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework import permissions
-from rest_framework.throttling import ScopedRateThrottle  
+from rest_framework import status
+from rest_framework.settings import api_settings
 
 from drones import custompermission
+from drones.cache import CachedResponseMixin
+from drones.conditional import ConditionalGetMixin
 from drones.filters import CompetitionFilter
+from drones.pagination import CompetitionKeysetPagination
+from drones.pagination import LeaderboardKeysetPagination
+from drones.pagination import iterate_keyset
+from drones.parsers import NDJSONParser
+from drones.renderers import CSVRenderer
+from drones.renderers import NDJSONRenderer
 from drones.models import DroneCategory
 from drones.models import Drone
 from drones.models import Pilot
 from drones.models import Competition
+from drones.models import DroneLeaderboardEntry
+from drones.models import PilotLeaderboardEntry
 from drones.serializers import DroneCategorySerializer
 from drones.serializers import DroneSerializer
 from drones.serializers import PilotSerializer
 from drones.serializers import PilotCompetitionSerializer
+from drones.serializers import DroneValuesSerializer
+from drones.serializers import PilotCompetitionValuesSerializer
+from drones.serializers import PilotLeaderboardSerializer
+from drones.serializers import DroneLeaderboardSerializer
+from drones.serializers import get_field_selection
+from restful01.authentication import CachedTokenAuthentication
+from restful01.throttling import TokenBucketScopedRateThrottle
 
 from rest_framework.pagination import LimitOffsetPagination
 
@@ -27,10 +48,72 @@ class LimitOffsetPaginationWithUpperBound(LimitOffsetPagination):
 
 
 from rest_framework import filters
-from django_filters import AllValuesFilter, DateTimeFilter, NumberFilter
+from django_filters import DateTimeFilter, NumberFilter
 
 
-class DroneCategoryList(generics.ListCreateAPIView):
+def get_cursor_fields(pagination_class):
+    """
+    键集分页从行中读取游标的列, 裁剪字段时也要加载
+    """
+    return [field.lstrip('-') for field in getattr(pagination_class, 'ordering', ())]
+
+
+class EagerLoadingViewMixin(object):
+    """
+    按序列化器声明的预加载方案(setup_eager_loading)加载关联数据, ?fields= / ?expand= 时只加载选中的字段
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = get_field_selection(self.request)
+        return self.get_serializer_class().setup_eager_loading(queryset, fields, expand,
+                                                               get_cursor_fields(self.pagination_class))
+
+
+class FastListMixin(object):
+    """
+    FAST_READ_SERIALIZERS 开启时, 列表 GET 用 fast_serializer_class 直接序列化 values() 行
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer_class is None or not settings.FAST_READ_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        fields, expand = get_field_selection(self.request)
+        serializer = self.fast_serializer_class(many=True, context=self.get_serializer_context(), fields=fields)
+        queryset = serializer.setup_values(self.filter_queryset(self.get_queryset()),
+                                           get_cursor_fields(self.pagination_class))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer.instance = page
+            return self.get_paginated_response(serializer.data)
+        serializer.instance = queryset
+        return Response(serializer.data)
+
+
+class BulkCreateMixin(object):
+    """
+    POST 一个 JSON 数组或 NDJSON 流时批量创建(BulkListSerializer), 单事务写入
+    成功返回 {"count": n}, 失败返回每条的错误 {"errors": [{"index": i, "errors": {...}}]}
+    """
+    parser_classes = tuple(api_settings.DEFAULT_PARSER_CLASSES) + (NDJSONParser,)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = {'errors': [{'index': index, 'errors': detail}
+                                     for index, detail in enumerate(errors) if detail]}
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        self.perform_create(serializer)
+        return Response({'count': len(serializer.instance)}, status=status.HTTP_201_CREATED)
+
+
+class DroneCategoryList(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                        generics.ListCreateAPIView):
     """
     无人机类别列表
     /drone-categories/ --->> GET, POST, and OPTIONS
@@ -40,13 +123,16 @@ class DroneCategoryList(generics.ListCreateAPIView):
     queryset = DroneCategory.objects.all()
     serializer_class = DroneCategorySerializer
     name = 'dronecategory-list'
+    cache_dependencies = (DroneCategory, Drone)
+    query_budget = 5
 
     filter_fields = ('name',)
     search_fields = ('^name',)
     ordering_fields = ('name', 'manufacturing_date',)
 
 
-class DroneCategoryDetail(generics.RetrieveUpdateDestroyAPIView):
+class DroneCategoryDetail(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                          generics.RetrieveUpdateDestroyAPIView):
     """
     无人机类别详情
     /drone-category/{id} -->> GET, PUT, PATCH, DELETE, and OPTIONS
@@ -54,15 +140,21 @@ class DroneCategoryDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = DroneCategory.objects.all()
     serializer_class = DroneCategorySerializer
     name = 'dronecategory-detail'
+    cache_dependencies = (DroneCategory, Drone)
+    query_budget = 4
 
 
-class DroneList(generics.ListCreateAPIView):
+class DroneList(BulkCreateMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                EagerLoadingViewMixin, generics.ListCreateAPIView):
     """ 无人机列表 """
     throttle_scope = 'drones'
-    throttle_classes = (ScopedRateThrottle,)
+    throttle_classes = (TokenBucketScopedRateThrottle,)
     queryset = Drone.objects.all()
     serializer_class = DroneSerializer
+    fast_serializer_class = DroneValuesSerializer
     name = 'drone-list'
+    cache_dependencies = (Drone, DroneCategory, User)
+    query_budget = 4
 
     filter_fields = ('name', 'drone_category', 'manufacturing_date', 'has_it_competed',)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,
@@ -73,62 +165,137 @@ class DroneList(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class DroneDetail(generics.RetrieveUpdateDestroyAPIView):
+class DroneDetail(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                  generics.RetrieveUpdateDestroyAPIView):
     """ 无人机详情 """
     throttle_scope = 'drones'
-    throttle_classes = (ScopedRateThrottle,)
+    throttle_classes = (TokenBucketScopedRateThrottle,)
     queryset = Drone.objects.all()
     serializer_class = DroneSerializer
     name = 'drone-detail'
+    cache_dependencies = (Drone, DroneCategory, User)
+    query_budget = 3
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly, custompermission.IsCurrentUserOwnerOrReadOnly,
     )
 
 
-class PilotList(generics.ListCreateAPIView):
+class PilotList(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                generics.ListCreateAPIView):
     """ 飞行员列表 """
     queryset = Pilot.objects.all()
     serializer_class = PilotSerializer
     name = 'pilot-list'
+    cache_dependencies = (Pilot, Competition, Drone, DroneCategory, User)
+    query_budget = 4
     filter_fields = ('name', 'gender', 'races_count',)
     search_fields = ('^name',)
     ordering_fields = ('name', 'races_count')
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
 
-class PilotDetail(generics.RetrieveUpdateDestroyAPIView):
+class PilotDetail(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                  generics.RetrieveUpdateDestroyAPIView):
     """ 飞行员详情 """
     queryset = Pilot.objects.all()
     serializer_class = PilotSerializer
     name = 'pilot-detail'
-    authentication_classes = (TokenAuthentication,)
+    cache_dependencies = (Pilot, Competition, Drone, DroneCategory, User)
+    query_budget = 3
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
 
-class CompetitionList(generics.ListCreateAPIView):
+class CompetitionList(BulkCreateMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                      EagerLoadingViewMixin, generics.ListCreateAPIView):
     """ 比赛名单列表 """
     queryset = Competition.objects.all()
     serializer_class = PilotCompetitionSerializer
+    fast_serializer_class = PilotCompetitionValuesSerializer
     name = 'competition-list'
+    cache_dependencies = (Competition, Pilot, Drone)
+    query_budget = 3
     filter_class = CompetitionFilter
+    pagination_class = CompetitionKeysetPagination
 
 
-class CompetitionDetail(generics.RetrieveUpdateDestroyAPIView):
+class CompetitionDetail(ConditionalGetMixin, CachedResponseMixin, EagerLoadingViewMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
     """ 比赛名单详情 """
     queryset = Competition.objects.all()
     serializer_class = PilotCompetitionSerializer
     name = 'competition-detail'
+    cache_dependencies = (Competition, Pilot, Drone)
+    query_budget = 3
+
+
+class CompetitionExport(generics.GenericAPIView):
+    """
+    比赛全量导出, 流式输出 NDJSON(默认) 或 CSV, 支持 CompetitionFilter 的全部参数
+    /competitions/export/?format=csv&min_distance_in_feet=800 -->> GET
+    """
+    queryset = Competition.objects.all()
+    name = 'competition-export'
+    filter_class = CompetitionFilter
+    filter_backends = (DjangoFilterBackend,)
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    export_fields = (('pk', 'pk'),
+                     ('distance_in_feet', 'distance_in_feet'),
+                     ('distance_achievement_date', 'distance_achievement_date'),
+                     ('pilot', 'pilot__name'),
+                     ('drone', 'drone__name'))
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        header = [name for name, lookup in self.export_fields]
+        rows = iterate_keyset(queryset, CompetitionKeysetPagination.ordering,
+                              [lookup for name, lookup in self.export_fields], self.chunk_size)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(renderer.stream(rows, header),
+                                         content_type='{0}; charset={1}'.format(renderer.media_type, renderer.charset))
+        response['Content-Disposition'] = 'attachment; filename="competitions.{0}"'.format(renderer.format)
+        return response
+
+
+class PilotLeaderboard(CachedResponseMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    """
+    驾驶员排行榜, 读取预先维护的条目, 每页一次查询
+    /leaderboard/pilots/ -->> GET
+    """
+    queryset = PilotLeaderboardEntry.objects.all()
+    serializer_class = PilotLeaderboardSerializer
+    name = 'pilot-leaderboard'
+    cache_dependencies = (PilotLeaderboardEntry, Competition, Pilot)
+    query_budget = 2
+    pagination_class = LeaderboardKeysetPagination
+
+
+class DroneLeaderboard(CachedResponseMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    """
+    无人机排行榜
+    /leaderboard/vehicles/ -->> GET
+    """
+    queryset = DroneLeaderboardEntry.objects.all()
+    serializer_class = DroneLeaderboardSerializer
+    name = 'drone-leaderboard'
+    cache_dependencies = (DroneLeaderboardEntry, Competition, Drone)
+    query_budget = 2
+    pagination_class = LeaderboardKeysetPagination
 
 
 class ApiRoot(generics.GenericAPIView):
     name = 'api-root'
+    query_budget = 2
 
     def get(self, request, *args, **kwargs):
         return Response({'drone-categories': reverse(DroneCategoryList.name, request=request),
                          'drones': reverse(DroneList.name, request=request),
                          'pilots': reverse(PilotList.name, request=request),
-                         'competitions': reverse(CompetitionList.name, request=request)})
+                         'competitions': reverse(CompetitionList.name, request=request),
+                         'pilot-leaderboard': reverse(PilotLeaderboard.name, request=request),
+                         'drone-leaderboard': reverse(DroneLeaderboard.name, request=request)})
 
 
 """
@@ -0,0 +1,298 @@
+"""
+ASGI config for restful01 project.
+
+Django 1.11 没有 ASGI 支持, 这里是一个最小的 ASGI 3 适配层:
+
+    uvicorn restful01.asgi:application --workers 4
+
+    - 请求体读完后交给 Django 的 WSGIHandler, 在有界线程池(ASGI['MAX_WORKERS'])中执行,
+      一个请求从视图到迭代完响应都在同一个线程(数据库连接是线程局部的); 普通响应整体交回
+      事件循环, StreamingHttpResponse 逐块经有界队列流式输出
+    - ASGI['INLINE_VIEWS'] 中不访问数据库的视图(API 根)对匿名请求直接在事件循环中执行,
+      不占用线程池; 其中声明了限流的视图仍交给线程池: 令牌桶限流是阻塞的 SQLite 写事务,
+      锁竞争时最多等待 THROTTLE_STORE['TIMEOUT'], 会卡住所有连接.
+      限流策略不因入口而变: 默认配置下 API 根有限流, 同样交给线程池
+    - 异步中间件: ConcurrencyLimitMiddleware 超过 ASGI['MAX_PENDING'] 个进行中的请求时直接
+      返回 503; TimingMiddleware 记录 asgi_requests_total / asgi_request_seconds_total
+
+    python manage.py bench_asgi   # 与 WSGI 对比吞吐量和 p99 延迟
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "restful01.settings")
+
+wsgi_application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+from django.urls import resolve, reverse  # noqa: E402
+
+from restful01.metrics import registry  # noqa: E402
+
+registry.describe('asgi_requests_total', 'Requests served through the ASGI entry point')
+registry.describe('asgi_request_seconds_total', 'Time spent serving ASGI requests')
+registry.describe('asgi_rejected_total', 'Requests rejected because too many were in flight')
+
+
+def get_asgi_options():
+    options = {'MAX_WORKERS': 8, 'MAX_PENDING': 256, 'INLINE_VIEWS': ('v1:api-root',), 'QUEUE_SIZE': 8}
+    options.update(getattr(settings, 'ASGI', {}))
+    return options
+
+
+def build_environ(scope, body):
+    """
+    ASGI HTTP scope -> WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI 中 PATH_INFO 是按 latin-1 解码的原始字节
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/{0}'.format(scope.get('http_version', '1.1')),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = '{0},{1}'.format(environ[name], value) if name in environ else value
+    return environ
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, headers, body=b''):
+    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def is_throttled(callback):
+    view_class = getattr(callback, 'view_class', None)
+    return bool(getattr(view_class, 'throttle_classes', ()))
+
+
+class DjangoASGIHandler(object):
+    """
+    把 Django(WSGI) 挂到 ASGI 上
+    """
+
+    def __init__(self, wsgi_handler=wsgi_application, max_workers=None, inline_views=None, queue_size=None):
+        options = get_asgi_options()
+        self.wsgi_handler = wsgi_handler
+        self.max_workers = max_workers or options['MAX_WORKERS']
+        self.inline_views = options['INLINE_VIEWS'] if inline_views is None else inline_views
+        self.queue_size = queue_size or options['QUEUE_SIZE']
+        self.executor = ThreadPoolExecutor(self.max_workers)
+        self._inline_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {0!r}'.format(scope['type']))
+        body = await read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        if self.can_run_inline(scope):
+            scope['restful01.mode'] = 'inline'
+            return await self.run_inline(environ, send)
+        scope['restful01.mode'] = 'threadpool'
+        return await self.run_in_thread(environ, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def get_inline_paths(self):
+        if self._inline_paths is None:
+            paths = (reverse(name) for name in self.inline_views)
+            self._inline_paths = frozenset(path for path in paths if not is_throttled(resolve(path).func))
+        return self._inline_paths
+
+    def can_run_inline(self, scope):
+        """
+        只有匿名(无 Cookie/Authorization)的 GET/HEAD 才在事件循环中执行, 保证视图不访问数据库
+        """
+        if scope['method'] not in ('GET', 'HEAD') or scope['path'] not in self.get_inline_paths():
+            return False
+        return not any(name in (b'cookie', b'authorization') for name, value in scope.get('headers', ()))
+
+    def call_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        result = self.wsgi_handler(environ, start_response)
+        return started['status'], started['headers'], result
+
+    async def run_inline(self, environ, send):
+        status, headers, result = self.call_wsgi(environ)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        await send_response(send, status, headers, body)
+
+    def respond_in_thread(self, environ, loop, queue):
+        """
+        在线程池中执行视图; 普通响应整体交给事件循环, 流式响应逐块经有界队列交出(队列满时线程等待)
+        """
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        try:
+            status, headers, result = self.call_wsgi(environ)
+            try:
+                if not getattr(result, 'streaming', False):
+                    put(('complete', status, headers, b''.join(result)))
+                    return
+                put(('start', status, headers))
+                for chunk in result:
+                    if chunk:
+                        put(('body', chunk))
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            put(('end',))
+
+    async def run_in_thread(self, environ, send):
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(self.queue_size)
+        future = loop.run_in_executor(self.executor, self.respond_in_thread, environ, loop, queue)
+        started = streaming = finished = False
+        try:
+            while True:
+                message = await queue.get()
+                if message[0] == 'complete':
+                    started = True
+                    await send_response(send, message[1], message[2], message[3])
+                elif message[0] == 'start':
+                    started = streaming = True
+                    await send({'type': 'http.response.start', 'status': message[1],
+                                'headers': encode_headers(message[2])})
+                elif message[0] == 'body':
+                    await send({'type': 'http.response.body', 'body': message[1], 'more_body': True})
+                else:
+                    finished = True
+                    break
+        finally:
+            if not finished:
+                # 客户端断开等情况下继续取走剩余的块, 线程才能结束
+                loop.create_task(self.drain(queue))
+        try:
+            await future
+        except Exception:
+            # 视图之外(WSGIHandler 自身)出错, 响应尚未开始时返回 500
+            if started:
+                raise
+        if streaming:
+            await send({'type': 'http.response.body', 'body': b''})
+        elif not started:
+            await send_response(send, 500, [('Content-Type', 'text/plain')], b'Internal Server Error')
+
+    @staticmethod
+    async def drain(queue):
+        while (await queue.get())[0] != 'end':
+            pass
+
+
+class ConcurrencyLimitMiddleware(object):
+    """
+    进行中的请求超过 max_pending 时返回 503, 不让请求在线程池前无限排队
+    """
+
+    def __init__(self, app, max_pending=None):
+        self.app = app
+        self.max_pending = max_pending or get_asgi_options()['MAX_PENDING']
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        if self.pending >= self.max_pending:
+            registry.inc('asgi_rejected_total')
+            return await send_response(send, 503, [('Content-Type', 'text/plain'), ('Retry-After', '1')],
+                                       b'Service Unavailable')
+        self.pending += 1
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            self.pending -= 1
+
+
+class TimingMiddleware(object):
+    """
+    按执行方式(inline/threadpool)和状态码统计请求数与耗时
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {}
+
+        async def timed_send(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            return await self.app(scope, receive, timed_send)
+        finally:
+            mode = scope.get('restful01.mode', 'rejected')
+            registry.inc('asgi_requests_total', mode=mode, status=str(status.get('code', '')))
+            registry.inc('asgi_request_seconds_total', time.perf_counter() - started, mode=mode)
+
+
+def get_asgi_application():
+    return TimingMiddleware(ConcurrencyLimitMiddleware(DjangoASGIHandler()))
+
+
+application = get_asgi_application()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+带缓存的 Token 认证与 Basic 认证
+
+TokenAuthentication 每个请求都要 Token.objects.select_related('user').get(key=...);
+这里把 key -> (user, token) 放进进程内 LRU(TOKEN_AUTH_CACHE 配置大小和 TTL).
+
+每个 key 有一个"代", 缓存条目记下查询前的代, 命中时代不同即作废.
+Token 删除/修改、用户保存(停用、改密码)或删除时更换相应 key 的代(drones.signals), 写入时与
+提交后各换一次(提交前读到旧数据的请求缓存的条目也作废).
+代保存在 TOKEN_AUTH_CACHE['GENERATION_PATH'] 指向的 SQLite 文件(restful01.generations),
+同一台机器上的所有进程共享, 失效立即生效.
+代存储不可用时不使用缓存, 直接查询数据库.
+命中率: token_auth_cache_hits_total / token_auth_cache_misses_total (/metrics/)
+
+BasicAuthentication 每个请求都要跑一遍 PBKDF2. CachedBasicAuthentication 记住验证通过的
+HMAC(SECRET_KEY 派生的密钥, 用户名 + 密码 + 当前密码哈希), 不保存明文密码:
+改密码后密码哈希变化, 旧记录自然失配, 不需要信号, 对所有进程立即生效.
+    python manage.py bench_basic_auth   # 每次认证写请求节省的 CPU
+"""
+import copy
+import hashlib
+import hmac
+import os
+import sqlite3
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from restful01.generations import SQLiteGenerationStore
+from restful01.lru import LRUCache
+from restful01.metrics import registry
+
+registry.describe('token_auth_cache_hits_total', 'Token authentications served from the cache')
+registry.describe('token_auth_cache_misses_total', 'Token authentications that queried the database')
+registry.describe('basic_auth_cache_hits_total', 'Basic authentications that skipped the password hasher')
+registry.describe('basic_auth_cache_misses_total', 'Basic authentications that ran the password hasher')
+registry.describe('token_generation_store_errors_total', 'Token authentications that bypassed the cache because '
+                                                         'the generation store failed')
+
+_token_cache = None
+_generation_store = None
+_credential_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        _token_cache = LRUCache(max_entries=options.get('MAX_ENTRIES', 10000), ttl=options.get('TTL', 300))
+    return _token_cache
+
+
+def clear_token_cache():
+    global _token_cache
+    _token_cache = None
+
+
+def token_cache_enabled():
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get('ENABLED', True)
+
+
+def get_generation_store():
+    global _generation_store
+    if _generation_store is None:
+        options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        path = options.get('GENERATION_PATH') or os.path.join(settings.BASE_DIR, 'token_generations.sqlite3')
+        _generation_store = SQLiteGenerationStore(path, ttl=get_token_cache().ttl,
+                                                  timeout=options.get('GENERATION_TIMEOUT', 1.0))
+    return _generation_store
+
+
+def reset_generation_store():
+    global _generation_store
+    _generation_store = None
+
+
+def invalidate_tokens(token_keys):
+    """
+    立即更换代, 在当前事务提交后再换一次; 代存储出错时异常照常抛出, 不能让吊销悄悄失效
+    """
+    token_keys = list(token_keys)
+    get_generation_store().bump(token_keys)
+    transaction.on_commit(lambda: get_generation_store().bump(token_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    与 TokenAuthentication 相同的认证结果, 命中缓存时不查询数据库
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache_enabled():
+            return super().authenticate_credentials(key)
+        token_cache = get_token_cache()
+        # 先读代再查询: 查询期间发生的失效会使这次写入的条目下次作废
+        try:
+            current = get_generation_store().get(key)
+        except sqlite3.Error:
+            registry.inc('token_generation_store_errors_total')
+            return super().authenticate_credentials(key)
+        entry = token_cache.get(key)
+        if entry is not None:
+            user, token, generation = entry
+            if generation == current:
+                registry.inc('token_auth_cache_hits_total')
+                # 每个请求拿到自己的 user 副本, 视图修改属性不会影响缓存
+                return copy.copy(user), token
+            token_cache.delete(key)
+        registry.inc('token_auth_cache_misses_total')
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token, current))
+        return copy.copy(user), token
+
+
+def get_credential_cache():
+    global _credential_cache
+    if _credential_cache is None:
+        options = getattr(settings, 'BASIC_AUTH_CACHE', {})
+        _credential_cache = LRUCache(max_entries=options.get('MAX_ENTRIES', 1000), ttl=options.get('TTL', 60))
+    return _credential_cache
+
+
+def clear_credential_cache():
+    global _credential_cache
+    _credential_cache = None
+
+
+def credential_cache_enabled():
+    return getattr(settings, 'BASIC_AUTH_CACHE', {}).get('ENABLED', True)
+
+
+def credential_fingerprint(username, password, password_hash):
+    key = hashlib.sha256(b'restful01.authentication.credential' + settings.SECRET_KEY.encode('utf-8')).digest()
+    message = '\0'.join((username, password, password_hash)).encode('utf-8')
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    命中时只按用户名取一次用户(与未命中时 authenticate() 相同的查询), 不运行密码哈希
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        if not credential_cache_enabled():
+            return super().authenticate_credentials(userid, password, request)
+        credential_cache = get_credential_cache()
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.get_by_natural_key(userid)
+        except user_model.DoesNotExist:
+            user = None
+        if user is not None and credential_cache.get(credential_fingerprint(userid, password, user.password)):
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            registry.inc('basic_auth_cache_hits_total')
+            return user, None
+        registry.inc('basic_auth_cache_misses_total')
+        user, auth = super().authenticate_credentials(userid, password, request)
+        # 哈希器升级迭代次数时 check_password 会重写 user.password, 用验证后的值
+        credential_cache.set(credential_fingerprint(userid, password, user.password), True)
+        return user, auth
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+MySQL(mysqlclient) 后端: 连接池
+
+    'ENGINE': 'restful01.db.backends.mysql',
+    'OPTIONS': {'pool': {'MIN_SIZE': 2, 'MAX_SIZE': 20}},
+"""
+from django.db.backends.mysql import base
+
+from restful01.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def check_connection(self, connection):
+        connection.ping()
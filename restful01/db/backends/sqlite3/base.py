@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+SQLite 后端: 连接池 + 建立连接时设置 PRAGMA
+
+    'ENGINE': 'restful01.db.backends.sqlite3',
+    'OPTIONS': {'pool': {...}, 'pragmas': {'mmap_size': 0, ...}},
+
+默认 journal_mode=WAL(读不阻塞写, 写不阻塞读), synchronous=NORMAL(WAL 下只在检查点 fsync),
+64MB 页缓存, 256MB mmap; OPTIONS['pragmas'] 中的同名项覆盖默认值, 值为 None 时不设置.
+内存数据库(测试)不使用连接池, 也不设置 PRAGMA.
+"""
+from django.db.backends.sqlite3 import base
+
+from restful01.db.pool import PooledDatabaseWrapperMixin
+
+DEFAULT_PRAGMAS = (
+    # journal_mode 要在其他 PRAGMA 之前设置
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -64000),
+    ('mmap_size', 268435456),
+)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    wrapper_options = ('pool', 'pragmas')
+
+    def get_pragmas(self):
+        overrides = dict(self.settings_dict['OPTIONS'].get('pragmas') or {})
+        pragmas = [(name, overrides.pop(name, value)) for name, value in DEFAULT_PRAGMAS]
+        pragmas.extend(sorted(overrides.items()))
+        return [(name, value) for name, value in pragmas if value is not None]
+
+    def get_pool_options(self):
+        if self.is_in_memory_db():
+            return None
+        return super().get_pool_options()
+
+    def configure_connection(self, connection):
+        if self.is_in_memory_db():
+            return
+        for name, value in self.get_pragmas():
+            connection.execute('PRAGMA {0} = {1}'.format(name, value))
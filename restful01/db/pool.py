@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+数据库连接池
+
+Django 的 DatabaseWrapper 每个线程一个连接, CONN_MAX_AGE = 0 时每个请求结束都关闭连接,
+下个请求重新建立(MySQL 是一次 TCP + 认证握手). 这里的后端(restful01.db.backends.*)把
+关闭改成归还到按别名共享的连接池, 建立改成从池中取出:
+
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'MIN_SIZE': 0,                   # 第一次取连接时预先建立的连接数
+        'MAX_SIZE': 10,                  # 池中连接总数(空闲 + 使用中)上限
+        'TIMEOUT': 30.0,                 # 池满时等待空闲连接的秒数, 超时抛出 OperationalError
+        'HEALTH_CHECK_INTERVAL': 30.0,   # 空闲超过这么多秒的连接取出前先检查(MySQL ping)
+        'MAX_LIFETIME': 3600.0,          # 建立超过这么多秒的连接不再复用, None 不限
+    }
+
+CONN_MAX_AGE 仍按别名配置, 含义不变: 一个线程持有连接多久后"关闭"(归还到池).
+指标(/metrics/): db_pool_connections{alias,state}, db_pool_waits_total,
+db_pool_wait_seconds_total, db_pool_timeouts_total, db_pool_health_check_failures_total,
+db_pool_connections_created_total
+"""
+import collections
+import functools
+import os
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+from restful01.metrics import registry
+
+registry.describe('db_pool_connections', 'Pooled database connections by state (idle, in_use)')
+registry.describe('db_pool_connections_created_total', 'Database connections opened by the pool')
+registry.describe('db_pool_waits_total', 'Connection checkouts that waited for a free connection')
+registry.describe('db_pool_wait_seconds_total', 'Time spent waiting for a free pooled connection')
+registry.describe('db_pool_timeouts_total', 'Connection checkouts that gave up waiting')
+registry.describe('db_pool_health_check_failures_total', 'Pooled connections discarded by a failed health check')
+
+DEFAULT_POOL_OPTIONS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 30.0,
+    'HEALTH_CHECK_INTERVAL': 30.0,
+    'MAX_LIFETIME': 3600.0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = None
+
+
+class ConnectionPool(object):
+    """
+    线程安全的 DB-API 连接池
+
+    connect() 建立新连接, health_check(connection) 出错表示连接不可用.
+    空闲连接后进先出, 常用的连接保持热, 多余的连接在 MAX_LIFETIME 后自然淘汰.
+    """
+
+    def __init__(self, connect, alias='default', min_size=0, max_size=10, timeout=30.0,
+                 health_check=None, health_check_interval=30.0, max_lifetime=None, timer=time.monotonic):
+        self.connect = connect
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.timer = timer
+        self.size = 0
+        self._idle = collections.deque()
+        self._created = {}
+        self._condition = threading.Condition()
+        self._filled = False
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self):
+        if not self._filled:
+            self.fill()
+        started = None
+        while True:
+            with self._condition:
+                entry, started = self._checkout(started)
+            if entry is None:
+                return self._open()
+            connection, released = entry
+            if self._usable(connection, released):
+                self._report()
+                return connection
+            self.discard(connection)
+
+    def release(self, connection, check=False):
+        """
+        归还连接; 回滚未结束的事务, check 为 True(执行中出过错)时先做健康检查
+        """
+        try:
+            connection.rollback()
+            if check and self.health_check is not None:
+                self.health_check(connection)
+        except Exception:
+            registry.inc('db_pool_health_check_failures_total', alias=self.alias)
+            return self.discard(connection)
+        if self._expired(connection):
+            return self.discard(connection)
+        with self._condition:
+            self._idle.append((connection, self.timer()))
+            self._condition.notify()
+        self._report()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created.pop(id(connection), None)
+            self.size -= 1
+            self._condition.notify()
+        self._report()
+
+    def fill(self):
+        """
+        预先建立 MIN_SIZE 个空闲连接
+        """
+        self._filled = True
+        while True:
+            with self._condition:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            self.release(self._open())
+
+    def close(self):
+        """
+        关闭所有空闲连接, 使用中的连接归还时照常入池
+        """
+        while True:
+            with self._condition:
+                if not self._idle:
+                    return
+                connection, released = self._idle.popleft()
+            self.discard(connection)
+
+    def _checkout(self, started):
+        """
+        持有锁时调用: 返回 (空闲连接, 开始等待时间); 池未满时占一个名额返回 (None, ...)
+        """
+        while not self._idle and self.size >= self.max_size:
+            now = self.timer()
+            if started is None:
+                started = now
+                registry.inc('db_pool_waits_total', alias=self.alias)
+            remaining = started + self.timeout - now
+            if remaining <= 0:
+                registry.inc('db_pool_wait_seconds_total', now - started, alias=self.alias)
+                registry.inc('db_pool_timeouts_total', alias=self.alias)
+                raise OperationalError('Timed out after {0:.1f}s waiting for a connection from the {1!r} pool '
+                                       '(MAX_SIZE={2})'.format(self.timeout, self.alias, self.max_size))
+            self._condition.wait(remaining)
+        if started is not None:
+            registry.inc('db_pool_wait_seconds_total', self.timer() - started, alias=self.alias)
+        if self._idle:
+            return self._idle.pop(), started
+        self.size += 1
+        return None, started
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[id(connection)] = self.timer()
+        registry.inc('db_pool_connections_created_total', alias=self.alias)
+        self._report()
+        return connection
+
+    def _expired(self, connection):
+        if self.max_lifetime is None:
+            return False
+        return self.timer() - self._created.get(id(connection), 0) >= self.max_lifetime
+
+    def _usable(self, connection, released):
+        if self._expired(connection):
+            return False
+        if self.health_check is None or self.timer() - released < self.health_check_interval:
+            return True
+        try:
+            self.health_check(connection)
+        except Exception:
+            registry.inc('db_pool_health_check_failures_total', alias=self.alias)
+            return False
+        return True
+
+    def _report(self):
+        idle = len(self._idle)
+        registry.set('db_pool_connections', idle, alias=self.alias, state='idle')
+        registry.set('db_pool_connections', self.size - idle, alias=self.alias, state='in_use')
+
+
+def get_pool(alias, factory):
+    """
+    按别名取连接池, 不存在时用 factory() 创建; fork 之后子进程不复用父进程的连接
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # 不关闭继承来的连接, 关闭会影响父进程
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = factory()
+        return pool
+
+
+def close_pools(aliases=None):
+    """
+    关闭并移除连接池(默认全部), 之后再取连接会建立新的池
+    """
+    with _pools_lock:
+        aliases = list(_pools) if aliases is None else [alias for alias in aliases if alias in _pools]
+        pools = [_pools.pop(alias) for alias in aliases]
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin(object):
+    """
+    DatabaseWrapper 混入: get_new_connection 从池中取连接, _close 归还连接
+
+    OPTIONS['pool'] 为 None 或 {'ENABLED': False} 时与原后端完全相同.
+    """
+    # 从 OPTIONS 中取出的选项, 不传给 DB-API 的 connect()
+    wrapper_options = ('pool',)
+    _pool = None
+
+    def get_pool_options(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if options is None or not options.get('ENABLED', True):
+            return None
+        return dict(DEFAULT_POOL_OPTIONS, **options)
+
+    def get_connection_params(self):
+        params = super(PooledDatabaseWrapperMixin, self).get_connection_params()
+        for name in self.wrapper_options:
+            params.pop(name, None)
+        return params
+
+    def create_connection(self, conn_params):
+        """
+        建立一个新的连接(池中的连接都从这里来)
+        """
+        connection = super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+        self.configure_connection(connection)
+        return connection
+
+    def configure_connection(self, connection):
+        """
+        新连接建立后执行一次, 子类设置会话参数
+        """
+
+    def check_connection(self, connection):
+        """
+        健康检查, 连接不可用时抛出异常
+        """
+        connection.cursor().execute('SELECT 1')
+
+    def get_new_connection(self, conn_params):
+        options = self.get_pool_options()
+        if options is None:
+            self._pool = None
+            return self.create_connection(conn_params)
+        self._pool = get_pool(self.alias, lambda: ConnectionPool(
+            functools.partial(self.create_connection, conn_params), alias=self.alias,
+            min_size=options['MIN_SIZE'], max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'],
+            health_check=self.check_connection, health_check_interval=options['HEALTH_CHECK_INTERVAL'],
+            max_lifetime=options['MAX_LIFETIME']))
+        return self._pool.acquire()
+
+    def _close(self):
+        if self.connection is None or self._pool is None:
+            return super(PooledDatabaseWrapperMixin, self)._close()
+        if self.in_atomic_block:
+            # 事务中途关闭: Django 之后仍持有这个连接对象, 不能交给别的线程
+            return self._pool.discard(self.connection)
+        return self._pool.release(self.connection, check=self.errors_occurred)
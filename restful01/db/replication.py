@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+本地 SQLite 副本同步
+
+生产环境的副本由数据库自身复制; 本地和测试中用两个 SQLite 文件模拟, 由这里整库复制:
+    python manage.py sync_replica --replica replica
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from restful01.db.pool import close_pools
+
+
+def sync_sqlite_replica(replica, primary=DEFAULT_DB_ALIAS):
+    """
+    用 VACUUM INTO 把主库复制到副本文件, 然后原子地替换副本
+
+    副本的连接(包括连接池中的)先全部关闭, 下次读取时重新连接到新文件.
+    主库连接不能处于事务中.
+    """
+    source, target = connections[primary], connections[replica]
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite' or target.is_in_memory_db():
+        raise ImproperlyConfigured('sync_sqlite_replica() needs a SQLite primary and a file-backed SQLite replica')
+    path = target.settings_dict['NAME']
+    target.close()
+    close_pools([replica])
+    staging = path + '.sync'
+    for name in (staging, path + '-wal', path + '-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+    with source.cursor() as cursor:
+        cursor.execute('VACUUM INTO %s', [staging])
+    os.replace(staging, path)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+跨进程共享的"代"存储
+
+缓存条目记下写入时的代, 读取时代不同即作废; 更换代就使依赖它的所有条目失效.
+代保存在 SQLite 文件(WAL)中, 与 restful01.throttling 相同的做法, 同一台机器上的所有进程共享,
+一个进程更换的代其他进程立即看到; 不使用 Django 默认缓存: 未配置 CACHES 时它是进程内的 LocMem.
+
+    - restful01.authentication: Token key 的代(ttl: 早于 Token 缓存 TTL 的记录可以清理)
+    - drones.cache: 模型的代(不清理: ETag 在客户端保存任意长时间)
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class SQLiteGenerationStore(object):
+    """
+    key -> (代, 更换时间), 每个线程一个连接, fork 之后重新连接; 没有记录的 key 的代为空字符串
+
+    ttl 为 None 时不清理记录
+    """
+    # 每更换这么多次清理一次早于 TTL 的记录: 记录之前写入的缓存条目都已过期, 删除与没有记录等价
+    purge_interval = 1000
+
+    def __init__(self, path, ttl=None, timeout=1.0, timer=time.time, table='token_generation'):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.timer = timer
+        self.table = table
+        self._local = threading.local()
+        self._bumps = 0
+
+    def get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS {0} ('
+                               'key TEXT PRIMARY KEY, generation TEXT NOT NULL, bumped REAL NOT NULL) '
+                               'WITHOUT ROWID'.format(self.table))
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self.get_connection().execute('SELECT generation FROM {0} WHERE key = ?'.format(self.table),
+                                            (key,)).fetchone()
+        return '' if row is None else row[0]
+
+    def get_many(self, keys):
+        """
+        {key: (代, 更换时间)}, 没有记录的 key 不出现在结果中
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        sql = 'SELECT key, generation, bumped FROM {0} WHERE key IN ({1})'.format(
+            self.table, ', '.join('?' * len(keys)))
+        return {key: (generation, bumped) for key, generation, bumped in self.get_connection().execute(sql, keys)}
+
+    def bump(self, keys):
+        now = self.timer()
+        rows = [(key, uuid.uuid4().hex, now) for key in keys]
+        if not rows:
+            return
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO {0} (key, generation, bumped) '
+                                   'VALUES (?, ?, ?)'.format(self.table), rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._bumps += 1
+        if self.ttl is not None and self._bumps % self.purge_interval == 0:
+            self.purge(now)
+
+    def purge(self, now=None):
+        now = self.timer() if now is None else now
+        self.get_connection().execute('DELETE FROM {0} WHERE bumped < ?'.format(self.table), (now - self.ttl,))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+进程内指标注册表
+
+计数器按 (名称, 标签) 累加, 通过 /metrics/ 以 Prometheus 文本格式暴露:
+    http :8000/metrics/
+"""
+import threading
+
+from django.http import HttpResponse
+
+
+class MetricsRegistry(object):
+    """
+    线程安全的计数器/仪表注册表
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, name, **labels):
+        return self._values.get(self._key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """
+        {name: {labels tuple: value}}
+        """
+        with self._lock:
+            items = list(self._values.items())
+        result = {}
+        for (name, labels), value in items:
+            result.setdefault(name, {})[labels] = value
+        return result
+
+    def render_prometheus(self):
+        lines = []
+        for name, samples in sorted(self.snapshot().items()):
+            if name in self._help:
+                lines.append('# HELP {0} {1}'.format(name, self._help[name]))
+            for labels, value in sorted(samples.items()):
+                label_text = ','.join('{0}="{1}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels)
+                if label_text:
+                    lines.append('{0}{{{1}}} {2}'.format(name, label_text, value))
+                else:
+                    lines.append('{0} {1}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
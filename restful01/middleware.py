@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+SQL 查询统计中间件
+
+对 QUERY_INSTRUMENTATION_APPS 中的视图记录:
+    db        SQL 查询次数与总耗时
+    serialize 视图内除 SQL 以外的耗时(序列化及视图逻辑)
+    render    响应渲染耗时
+结果写入 Server-Timing 响应头并累加到 restful01.metrics.registry.
+
+视图可声明读请求(GET/HEAD)的查询上限:
+    class DroneList(generics.ListCreateAPIView):
+        query_budget = 4
+
+函数视图使用 @query_budget(3) 装饰. 超出上限时记录日志,
+QUERY_BUDGET_RAISE = True 时抛出 QueryBudgetExceeded (测试中开启).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from restful01.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+registry.describe('http_requests_total', 'Instrumented requests')
+registry.describe('sql_queries_total', 'SQL queries executed by instrumented views')
+registry.describe('sql_seconds_total', 'Time spent in SQL')
+registry.describe('serialize_seconds_total', 'Time spent in views outside SQL')
+registry.describe('render_seconds_total', 'Time spent rendering responses')
+registry.describe('query_budget_exceeded_total', 'Requests exceeding the declared query budget')
+
+BUDGETED_METHODS = ('GET', 'HEAD')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """
+    为函数视图声明查询上限
+    """
+
+    def decorator(view_func):
+        view_func.query_budget = budget
+        return view_func
+
+    return decorator
+
+
+def get_query_budget(view_func):
+    if hasattr(view_func, 'query_budget'):
+        return view_func.query_budget
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return getattr(view_class, 'query_budget', None)
+
+
+class _RequestTiming(object):
+    def __init__(self, endpoint, budget):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.view_started = time.perf_counter()
+        self.view_finished = None
+        self.cursors = []
+        for connection in connections.all():
+            self.cursors.append((connection, connection.force_debug_cursor, len(connection.queries_log)))
+            connection.force_debug_cursor = True
+
+    def finish(self):
+        queries = []
+        for connection, force_debug_cursor, start in self.cursors:
+            connection.force_debug_cursor = force_debug_cursor
+            queries.extend(list(connection.queries_log)[start:])
+        return len(queries), sum(float(query['time']) for query in queries)
+
+
+class QueryInstrumentationMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.apps = tuple(getattr(settings, 'QUERY_INSTRUMENTATION_APPS', ()))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        timing = getattr(request, '_query_timing', None)
+        if timing is None:
+            return response
+        finished = time.perf_counter()
+        query_count, sql_seconds = timing.finish()
+        view_finished = timing.view_finished or finished
+        view_seconds = view_finished - timing.view_started
+        serialize_seconds = max(view_seconds - sql_seconds, 0.0)
+        render_seconds = finished - view_finished
+
+        endpoint = timing.endpoint
+        registry.inc('http_requests_total', endpoint=endpoint, method=request.method)
+        registry.inc('sql_queries_total', query_count, endpoint=endpoint)
+        registry.inc('sql_seconds_total', sql_seconds, endpoint=endpoint)
+        registry.inc('serialize_seconds_total', serialize_seconds, endpoint=endpoint)
+        registry.inc('render_seconds_total', render_seconds, endpoint=endpoint)
+
+        response['Server-Timing'] = ', '.join([
+            'db;desc="{0} queries";dur={1:.3f}'.format(query_count, sql_seconds * 1000),
+            'serialize;dur={0:.3f}'.format(serialize_seconds * 1000),
+            'render;dur={0:.3f}'.format(render_seconds * 1000),
+        ])
+        response['X-Query-Count'] = str(query_count)
+
+        if timing.budget is not None and request.method in BUDGETED_METHODS and query_count > timing.budget:
+            registry.inc('query_budget_exceeded_total', endpoint=endpoint)
+            message = '{0} {1} ran {2} queries, budget is {3}'.format(
+                request.method, request.path, query_count, timing.budget)
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func.__module__.split('.')[0] not in self.apps:
+            return None
+        request._query_timing = _RequestTiming(request.resolver_match.view_name, get_query_budget(view_func))
+        return None
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, '_query_timing', None)
+        if timing is not None:
+            timing.view_finished = time.perf_counter()
+        return response
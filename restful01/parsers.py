@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+JSON 解析, 与 restful01.renderers.FastJSONRenderer 使用同一个 JSON 后端(JSON_BACKEND);
+MessagePack / CBOR 解析, 时间戳解码为带时区(UTC)的 datetime, DateTimeField 直接接受
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from restful01.renderers import CBORRenderer, FastJSONRenderer, MessagePackRenderer, get_json_backend
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+    # None: 按 JSON_BACKEND 设置
+    backend = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        content = stream.read()
+        try:
+            # 后端直接解析 UTF-8 字节, 其他编码先解码
+            if codecs.lookup(encoding).name != 'utf-8':
+                content = content.decode(encoding)
+            return get_json_backend(self.backend).loads(content)
+        except (ValueError, LookupError) as exc:
+            raise ParseError('JSON parse error - {0}'.format(exc))
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            # timestamp=3: 时间戳扩展类型解码为 UTC datetime; 允许整数键
+            return self.msgpack.unpackb(stream.read(), raw=False, timestamp=3, strict_map_key=False)
+        except (ValueError, TypeError, self.msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - {0}'.format(exc))
+
+
+class CBORParser(BaseParser):
+    media_type = 'application/cbor'
+    renderer_class = CBORRenderer
+
+    def __init__(self):
+        import cbor2
+        self.cbor2 = cbor2
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return self.cbor2.loads(stream.read())
+        except (ValueError, self.cbor2.CBORDecodeError) as exc:
+            raise ParseError('CBOR parse error - {0}'.format(exc))
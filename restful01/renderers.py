@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+JSON 与二进制格式(MessagePack / CBOR)渲染
+
+FastJSONRenderer(与 restful01.parsers.FastJSONParser)在 REST_FRAMEWORK 中替换 DRF 的 JSONRenderer:
+    - 装有 orjson 时用它编码(C 实现, 直接输出 UTF-8 字节), 否则用标准库 json,
+      由 JSON_BACKEND 设置选择: 'auto'(默认) / 'orjson' / 'stdlib'
+    - REST_FRAMEWORK['DATETIME_FORMAT'] = None: 序列化器不再逐个字段 isoformat(),
+      datetime 原样交给渲染器; orjson 编码时直接输出(UTC 为 Z), 标准库按类型查表转换,
+      输出与 DRF 的 ISO 8601 格式相同
+    - 带 indent 的请求(可浏览 API)仍交给 DRF 的 JSONRenderer
+
+MessagePackRenderer / CBORRenderer 供机器客户端按 Accept(或 ?format=msgpack / ?format=cbor)选择,
+装有 msgpack / cbor2 时才在 REST_FRAMEWORK 中注册(见 settings.BINARY_FORMATS):
+    - datetime 编码为原生时间戳: MessagePack 的 timestamp 扩展类型(-1), CBOR 的 tag 1(epoch)
+    - 其余 JSON 没有的类型按 encode_default 转换, 与 JSON 的输出一致
+
+    python manage.py bench_json   # JSON 各后端与二进制格式的编码/解码时间和字节数
+"""
+import datetime
+import decimal
+import importlib.util
+import json
+import uuid
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.json import strict_constant
+
+_encoder = JSONEncoder()
+
+
+def encode_datetime(value):
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+# 按类型查表, 不走 JSONEncoder.default 的 isinstance 判断链; 其余类型交给 DRF
+DEFAULT_ENCODERS = {
+    datetime.datetime: encode_datetime,
+    datetime.date: datetime.date.isoformat,
+    decimal.Decimal: float,
+    uuid.UUID: str,
+}
+
+
+def encode_default(value):
+    encoder = DEFAULT_ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    return _encoder.default(value)
+
+
+class StdlibJSONBackend(object):
+    name = 'stdlib'
+
+    def __init__(self):
+        self.encoder = json.JSONEncoder(ensure_ascii=not api_settings.UNICODE_JSON,
+                                        allow_nan=not api_settings.STRICT_JSON, separators=(',', ':'),
+                                        default=encode_default)
+
+    def dumps(self, data):
+        return self.encoder.encode(data).encode('utf-8')
+
+    @staticmethod
+    def loads(content):
+        return json.loads(content, parse_constant=strict_constant if api_settings.STRICT_JSON else None)
+
+
+class OrjsonJSONBackend(object):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # 与标准库一致: 非字符串的键转换为字符串
+        self.option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data):
+        return self.orjson.dumps(data, default=encode_default, option=self.option)
+
+    def loads(self, content):
+        return self.orjson.loads(content)
+
+
+JSON_BACKENDS = {'orjson': OrjsonJSONBackend, 'stdlib': StdlibJSONBackend}
+_backends = {}
+
+
+def get_available_json_backends():
+    return [name for name in ('orjson', 'stdlib') if name == 'stdlib' or importlib.util.find_spec(name) is not None]
+
+
+def get_json_backend(name=None):
+    """
+    name 为 None 时按 JSON_BACKEND 设置, 'auto' 选第一个已安装的
+    """
+    name = name or getattr(settings, 'JSON_BACKEND', 'auto')
+    if name == 'auto':
+        name = get_available_json_backends()[0]
+    backend = _backends.get(name)
+    if backend is None:
+        backend = _backends[name] = JSON_BACKENDS[name]()
+    return backend
+
+
+def clear_json_backends():
+    _backends.clear()
+
+
+class FastJSONRenderer(JSONRenderer):
+    # None: 按 JSON_BACKEND 设置
+    backend = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = get_json_backend(self.backend).dumps(data)
+        # 与 DRF 一样转义 U+2028/U+2029, 输出是 JavaScript 的子集
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # 带时区的 datetime 编码为 timestamp 扩展类型, 其余(包括 naive datetime)交给 encode_default
+        return self.msgpack.packb(data, use_bin_type=True, datetime=True, default=encode_default)
+
+
+class CBORRenderer(BaseRenderer):
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def __init__(self):
+        import cbor2
+        self.cbor2 = cbor2
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.cbor2.dumps(data, datetime_as_timestamp=True, timezone=datetime.timezone.utc,
+                                default=encode_cbor_default)
+
+
+def encode_cbor_default(encoder, value):
+    encoder.encode(encode_default(value))
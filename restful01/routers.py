@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# _*_ coding:utf8 _*_
+"""
+读副本路由
+
+REPLICA_ROUTING['APPS'] 中视图的安全请求(GET/HEAD/OPTIONS)从 REPLICA_ROUTING['REPLICAS']
+中随机选一个副本读取, 其余一律使用主库(REPLICA_ROUTING['PRIMARY']):
+    - 写请求的响应带签名 Cookie, PIN_SECONDS 秒内同一客户端的读请求仍走主库(读到自己的写入)
+    - 一个请求中发生写操作后, 这个请求余下的读也走主库
+    - 主库上的事务(transaction.atomic)中的读走主库
+被固定到主库的请求不使用 drones 响应缓存. 副本尚未配置(不在 DATABASES 中)时不做任何路由.
+
+本地试用: 设置 DJANGO_REPLICA_DB=db-replica.sqlite3, 用 python manage.py sync_replica 同步.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from restful01.metrics import registry
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE_SALT = 'restful01.routers.pin'
+
+registry.describe('replica_reads_total', 'Requests whose reads were routed to a replica')
+registry.describe('primary_pinned_reads_total', 'Safe requests kept on the primary after a write')
+
+_state = threading.local()
+
+
+def get_routing_options():
+    options = {'PRIMARY': DEFAULT_DB_ALIAS, 'REPLICAS': (), 'APPS': (), 'PIN_SECONDS': 5, 'COOKIE': 'db_pin'}
+    options.update(getattr(settings, 'REPLICA_ROUTING', {}))
+    return options
+
+
+def get_replicas():
+    """
+    已配置的副本别名
+    """
+    return [alias for alias in get_routing_options()['REPLICAS'] if alias in connections.databases]
+
+
+def use_replica(alias=None):
+    """
+    当前线程之后的读使用副本(alias 为 None 时随机选一个), 直到 end_request()
+    """
+    replicas = get_replicas()
+    if alias is None and replicas:
+        alias = random.choice(replicas)
+    _state.replica = alias
+    _state.pinned = False
+
+
+def pin_primary():
+    _state.replica = None
+    _state.pinned = True
+
+
+def end_request():
+    _state.replica = None
+    _state.pinned = False
+
+
+def current_replica():
+    return getattr(_state, 'replica', None)
+
+
+def pinned_to_primary():
+    return getattr(_state, 'pinned', False)
+
+
+class PrimaryReplicaRouter(object):
+    """
+    DATABASE_ROUTERS 中使用; 是否读副本由当前线程(请求)的状态决定
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = current_replica()
+        if replica is None:
+            return None
+        primary = get_routing_options()['PRIMARY']
+        if connections[primary].in_atomic_block:
+            return primary
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # 从副本读出的实例保存时也写主库
+        if get_replicas():
+            pin_primary()
+        return get_routing_options()['PRIMARY']
+
+    def allow_relation(self, obj1, obj2, **hints):
+        options = get_routing_options()
+        aliases = {options['PRIMARY']}.union(options['REPLICAS'])
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构和数据都从主库复制
+        if db in get_routing_options()['REPLICAS']:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+    按请求设置路由状态; 写请求后用签名 Cookie 把客户端固定在主库 PIN_SECONDS 秒
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request()
+        if request.method not in SAFE_METHODS and get_replicas():
+            options = get_routing_options()
+            response.set_signed_cookie(options['COOKIE'], '1', salt=PIN_COOKIE_SALT,
+                                       max_age=options['PIN_SECONDS'], httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        options = get_routing_options()
+        if request.method not in SAFE_METHODS or view_func.__module__.split('.')[0] not in options['APPS']:
+            return None
+        if not get_replicas():
+            return None
+        if self.pinned(request, options):
+            registry.inc('primary_pinned_reads_total')
+            pin_primary()
+            return None
+        use_replica()
+        registry.inc('replica_reads_total', alias=current_replica())
+        return None
+
+    @staticmethod
+    def pinned(request, options):
+        try:
+            request.get_signed_cookie(options['COOKIE'], salt=PIN_COOKIE_SALT, max_age=options['PIN_SECONDS'])
+        except (KeyError, signing.BadSignature):
+            return False
+        return True
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -54,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'restful01.middleware.QueryInstrumentationMiddleware',
+    'restful01.routers.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'restful01.urls'
@@ -80,13 +83,41 @@ WSGI_APPLICATION = 'restful01.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 
+# restful01.db.backends.* 在 Django 自带后端上加了连接池(restful01.db.pool), SQLite 另外在
+# 建立连接时设置 WAL 等 PRAGMA. CONN_MAX_AGE 按别名配置: 0 表示每个请求结束把连接还给池.
+# 生产环境 MySQL:
+#     'ENGINE': 'restful01.db.backends.mysql',
+#     'CONN_MAX_AGE': 60,
+#     'OPTIONS': {'pool': {'MIN_SIZE': 2, 'MAX_SIZE': 20, 'HEALTH_CHECK_INTERVAL': 10.0}},
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'restful01.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {'MAX_SIZE': 10, 'TIMEOUT': 10.0},
+            'pragmas': {'synchronous': 'NORMAL', 'mmap_size': 268435456, 'cache_size': -64000},
+        },
     }
 }
 
+# 本地用第二个 SQLite 文件模拟读副本, python manage.py sync_replica 从主库同步
+if os.environ.get('DJANGO_REPLICA_DB'):
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=os.path.join(BASE_DIR, os.environ['DJANGO_REPLICA_DB']),
+                                TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['restful01.routers.PrimaryReplicaRouter']
+
+# 读副本路由(restful01.routers): APPS 中视图的安全请求读 REPLICAS 中已配置的别名,
+# 写请求之后 PIN_SECONDS 秒内同一客户端(签名 Cookie COOKIE)仍读主库
+REPLICA_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': ('replica',),
+    'APPS': ('drones',),
+    'PIN_SECONDS': 5,
+    'COOKIE': 'db_pin',
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -123,8 +154,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# 二进制格式(restful01.renderers / restful01.parsers), 仅在装有对应的库时注册
+BINARY_FORMATS = tuple(name for module, name in (('msgpack', 'MessagePack'), ('cbor2', 'CBOR'))
+                       if importlib.util.find_spec(module) is not None)
+
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'drones.pagination.LimitOffsetCountPagination',
     'PAGE_SIZE': 1,
 
     'DEFAULT_FILTER_BACKENDS': (
@@ -134,13 +169,13 @@ REST_FRAMEWORK = {
 
     # 认证
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
+        'restful01.authentication.CachedBasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
 
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',),
+        'restful01.throttling.TokenBucketAnonRateThrottle',
+        'restful01.throttling.TokenBucketUserRateThrottle',),
 
     'DEFAULT_THROTTLE_RATES': {
         'anon': '300/hour',
@@ -149,5 +184,79 @@ REST_FRAMEWORK = {
         'pilots': '150/hour', },
     # 版本控制
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.NamespaceVersioning',
+
+    # JSON(及 BINARY_FORMATS)渲染/解析, datetime 原样交给渲染器编码
+    'DEFAULT_RENDERER_CLASSES': (
+        ('restful01.renderers.FastJSONRenderer',) +
+        tuple('restful01.renderers.{0}Renderer'.format(name) for name in BINARY_FORMATS) +
+        ('rest_framework.renderers.BrowsableAPIRenderer',)),
+    'DEFAULT_PARSER_CLASSES': (
+        ('restful01.parsers.FastJSONParser',) +
+        tuple('restful01.parsers.{0}Parser'.format(name) for name in BINARY_FORMATS) +
+        ('rest_framework.parsers.FormParser',
+         'rest_framework.parsers.MultiPartParser',)),
+    'DATETIME_FORMAT': None,
+}
+
+# JSON 编码/解码后端: 'auto' 装有 orjson 时使用 orjson, 否则标准库 json; 也可指定 'orjson' / 'stdlib'
+JSON_BACKEND = 'auto'
+
+# SQL 查询统计(Server-Timing 响应头 + /metrics/)
+QUERY_INSTRUMENTATION_APPS = ('drones', 'toys')
+# 超出视图声明的 query_budget 时抛出异常, 测试中开启(见 conftest.py)
+QUERY_BUDGET_RAISE = False
+
+# drones 列表/详情响应缓存(进程内 LRU, 写入时按模型失效);
+# 模型的代保存在 GENERATION_PATH(SQLite 文件, 同一台机器上的进程共享), ETag 也由它计算
+DRONES_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,
+    'TTL': 60,
+    'GENERATION_PATH': os.path.join(BASE_DIR, 'response_generations.sqlite3'),
+    'GENERATION_TIMEOUT': 1.0,
+}
+
+# 列表分页的 count 参数(drones.pagination): 默认模式, 缓存精确计数的秒数,
+# 表统计值小于 EXACT_BELOW 时不用统计值(小表统计信息误差大, 精确计数也便宜)
+PAGINATION_COUNT = {
+    'DEFAULT_MODE': 'exact',
+    'CACHE_TTL': 60,
+    'EXACT_BELOW': 1000,
 }
 
+# Token 认证缓存(restful01.authentication), key -> user 的进程内 LRU;
+# 失效用的代保存在 GENERATION_PATH(SQLite 文件, 同一台机器上的进程共享)
+TOKEN_AUTH_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,
+    'GENERATION_PATH': os.path.join(BASE_DIR, 'token_generations.sqlite3'),
+    'GENERATION_TIMEOUT': 1.0,
+}
+
+# Basic 认证缓存: 验证通过的(用户名, 密码, 密码哈希)的 HMAC, 命中时跳过 PBKDF2
+BASIC_AUTH_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1000,
+    'TTL': 60,
+}
+
+# ASGI 入口(restful01.asgi): 线程池大小, 进行中请求上限, 在事件循环中执行的无数据库视图
+# (声明了限流的视图仍交给线程池)
+ASGI = {
+    'MAX_WORKERS': 8,
+    'MAX_PENDING': 256,
+    'INLINE_VIEWS': ('v1:api-root',),
+}
+
+# 令牌桶限流状态(restful01.throttling), 同一台机器上的进程共享这个 SQLite 文件
+THROTTLE_STORE = {
+    'PATH': os.path.join(BASE_DIR, 'throttle.sqlite3'),
+    'TIMEOUT': 1.0,
+}
+
+# 嵌套关联(类别的无人机、驾驶员的比赛)最多内嵌的条数, 其余经 next 链接到过滤后的列表读取
+NESTED_RELATION_LIMIT = 10
+
+# 列表 GET 使用 values() 快速序列化(drones 的 fast_serializer_class, toys 的 ToyValuesSerializer)
+FAST_READ_SERIALIZERS = False
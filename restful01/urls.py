@@ -16,6 +16,8 @@ Including another URLconf
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from restful01.metrics import metrics_view
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
     url(r'^', include('toys.urls')),
@@ -26,6 +28,8 @@ urlpatterns = [
     url(r'^v2/', include('drones.v2.urls', namespace='v2')),
     url(r'^v2/api-auth/', include('rest_framework.urls', namespace='rest_framework_v2')),
 
-    url(r'^api-auth/', include('rest_framework.urls'))
+    url(r'^api-auth/', include('rest_framework.urls')),
+
+    url(r'^metrics/$', metrics_view, name='metrics'),
 
 ]
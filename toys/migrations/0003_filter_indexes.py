@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 10:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toys', '0002_auto_20180325_0657'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='toy',
+            name='name',
+            field=models.CharField(db_index=True, default='', max_length=150),
+        ),
+    ]
@@ -6,7 +6,7 @@ class Toy(models.Model):
     玩具
     """
     created = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
-    name = models.CharField(max_length=150, blank=False, default="")
+    name = models.CharField(max_length=150, blank=False, default="", db_index=True)
     description = models.CharField(max_length=250, blank=True, default="", verbose_name="描述详情")
     toy_category = models.CharField(max_length=200, blank=False, default='', verbose_name="分类")
     release_date = models.DateTimeField(verbose_name="发布时间"
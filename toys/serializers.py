@@ -4,6 +4,7 @@ __date__ = '2018/3/25 15:00'
 __author__ = 'zhourudong'
 from rest_framework import serializers
 
+from restful01.fastpath import DateTimeValue, ValuesSerializer
 from toys.models import Toy
 
 
@@ -20,3 +21,17 @@ class ToySerializer(serializers.ModelSerializer):
                   'release_date',
                   'toy_category',
                   'was_included_in_home')
+
+
+class ToyValuesSerializer(ValuesSerializer):
+    """
+    ToySerializer 的只读快速版本
+    """
+    fields = (
+        ('id', 'id'),
+        ('name', 'name'),
+        ('description', 'description'),
+        ('release_date', DateTimeValue('release_date')),
+        ('toy_category', 'toy_category'),
+        ('was_included_in_home', 'was_included_in_home'),
+    )
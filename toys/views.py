@@ -1,17 +1,24 @@
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import status
 from toys.models import Toy
 from toys.serializers import ToySerializer
+from toys.serializers import ToyValuesSerializer
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from restful01.middleware import query_budget
 
 
+@query_budget(3)
 @api_view(["GET","POST"])
 def toy_list(request):
     if request.method == 'GET':
         toys = Toy.objects.all()
 
-        toys_serializer = ToySerializer(toys, many=True)
+        if settings.FAST_READ_SERIALIZERS:
+            toys_serializer = ToyValuesSerializer(toys, many=True)
+        else:
+            toys_serializer = ToySerializer(toys, many=True)
         return Response(toys_serializer.data)
     if request.method == 'POST':
         toy_serializer = ToySerializer(data=request.data)
@@ -21,6 +28,7 @@ def toy_list(request):
         return Response(toy_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(3)
 @api_view(['GET', 'PUT', 'DELETE'])
 def toy_detail(request, pk):
     try: